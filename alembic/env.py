@@ -7,7 +7,7 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from app.models.base import Base
 from alembic import context
 from app.config import settings
-from app.models import user, image
+from app.models import user, image, stored_object, log, job, rendition
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
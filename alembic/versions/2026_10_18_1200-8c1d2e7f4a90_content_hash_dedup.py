@@ -0,0 +1,70 @@
+"""content hash dedup
+
+Revision ID: 8c1d2e7f4a90
+Revises: 3f56c9f44e60
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8c1d2e7f4a90"
+down_revision: Union[str, None] = "3f56c9f44e60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "storedobjectmodels",
+        sa.Column("object_name", sa.String(), nullable=False),
+        sa.Column("source_hash", sa.String(length=64), nullable=False),
+        sa.Column("params_key", sa.String(), nullable=False),
+        sa.Column("content_type", sa.String(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("object_name"),
+        sa.UniqueConstraint(
+            "source_hash", "params_key", name="uq_storedobjectmodels_source"
+        ),
+    )
+    op.create_index(
+        op.f("ix_storedobjectmodels_id"), "storedobjectmodels", ["id"], unique=False
+    )
+
+    op.add_column(
+        "imagemodels", sa.Column("source_hash", sa.String(length=64), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_imagemodels_source_hash"), "imagemodels", ["source_hash"], unique=False
+    )
+    # Несколько строк могут ссылаться на один объект
+    op.drop_constraint(
+        "imagemodels_minio_object_name_key", "imagemodels", type_="unique"
+    )
+    op.create_index(
+        op.f("ix_imagemodels_minio_object_name"),
+        "imagemodels",
+        ["minio_object_name"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_imagemodels_minio_object_name"), table_name="imagemodels")
+    op.create_unique_constraint(
+        "imagemodels_minio_object_name_key", "imagemodels", ["minio_object_name"]
+    )
+    op.drop_index(op.f("ix_imagemodels_source_hash"), table_name="imagemodels")
+    op.drop_column("imagemodels", "source_hash")
+    op.drop_index(op.f("ix_storedobjectmodels_id"), table_name="storedobjectmodels")
+    op.drop_table("storedobjectmodels")
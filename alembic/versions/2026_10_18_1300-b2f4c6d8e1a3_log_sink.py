@@ -0,0 +1,42 @@
+"""log sink
+
+Revision ID: b2f4c6d8e1a3
+Revises: 8c1d2e7f4a90
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b2f4c6d8e1a3"
+down_revision: Union[str, None] = "8c1d2e7f4a90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "logmodels",
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("route", sa.String(), nullable=False),
+        sa.Column("function_name", sa.String(), nullable=False),
+        sa.Column("level", sa.String(), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_logmodels_id"), "logmodels", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_logmodels_timestamp"), "logmodels", ["timestamp"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_logmodels_timestamp"), table_name="logmodels")
+    op.drop_index(op.f("ix_logmodels_id"), table_name="logmodels")
+    op.drop_table("logmodels")
@@ -0,0 +1,75 @@
+"""image owner and listing indexes
+
+Revision ID: d4a6e8f0b2c5
+Revises: b2f4c6d8e1a3
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a6e8f0b2c5"
+down_revision: Union[str, None] = "b2f4c6d8e1a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Колонка без значения по умолчанию - добавление не переписывает таблицу
+    op.add_column("imagemodels", sa.Column("owner_id", sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        "imagemodels_owner_id_fkey",
+        "imagemodels",
+        "usermodels",
+        ["owner_id"],
+        ["id"],
+        ondelete="SET NULL",
+        postgresql_not_valid=True,
+    )
+
+    # autocommit_block сначала фиксирует транзакцию миграции: ACCESS EXCLUSIVE
+    # от ADD COLUMN снимается, дальше каждая команда - в своей транзакции
+    with op.get_context().autocommit_block():
+        # Проверка существующих строк берет SHARE UPDATE EXCLUSIVE и не
+        # блокирует запись; в транзакции с ADD COLUMN она шла бы под
+        # ACCESS EXCLUSIVE до конца миграции
+        op.execute(
+            "ALTER TABLE imagemodels VALIDATE CONSTRAINT imagemodels_owner_id_fkey"
+        )
+        # CONCURRENTLY не блокирует запись в большую таблицу, но не работает
+        # в транзакции
+        op.create_index(
+            "ix_imagemodels_created_at_id",
+            "imagemodels",
+            ["created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_imagemodels_owner_id_created_at_id",
+            "imagemodels",
+            ["owner_id", "created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_imagemodels_owner_id_created_at_id",
+            table_name="imagemodels",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_imagemodels_created_at_id",
+            table_name="imagemodels",
+            postgresql_concurrently=True,
+        )
+    op.drop_constraint("imagemodels_owner_id_fkey", "imagemodels", type_="foreignkey")
+    op.drop_column("imagemodels", "owner_id")
@@ -0,0 +1,63 @@
+"""background job queue
+
+Revision ID: f1b3d5a7c9e2
+Revises: d4a6e8f0b2c5
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f1b3d5a7c9e2"
+down_revision: Union[str, None] = "d4a6e8f0b2c5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobmodels",
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=True),
+        sa.Column("raw_object_name", sa.String(), nullable=False),
+        sa.Column("original_filename", sa.String(), nullable=False),
+        sa.Column("compression_params", sa.String(), nullable=True),
+        sa.Column("source_hash", sa.String(length=64), nullable=True),
+        sa.Column("callback_url", sa.String(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("run_at", sa.DateTime(), nullable=False),
+        sa.Column("image_id", sa.Integer(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["usermodels.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(
+            ["image_id"], ["imagemodels.id"], ondelete="SET NULL"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_jobmodels_id"), "jobmodels", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_jobmodels_owner_id"), "jobmodels", ["owner_id"], unique=False
+    )
+    # Частичный индекс очереди: завершенные задачи в него не попадают
+    op.create_index(
+        "ix_jobmodels_run_at_pending",
+        "jobmodels",
+        ["run_at"],
+        unique=False,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobmodels_run_at_pending", table_name="jobmodels")
+    op.drop_index(op.f("ix_jobmodels_owner_id"), table_name="jobmodels")
+    op.drop_index(op.f("ix_jobmodels_id"), table_name="jobmodels")
+    op.drop_table("jobmodels")
@@ -0,0 +1,51 @@
+"""rendition presets
+
+Revision ID: a7c9e1b3d5f2
+Revises: f1b3d5a7c9e2
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c9e1b3d5f2"
+down_revision: Union[str, None] = "f1b3d5a7c9e2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "renditionmodels",
+        sa.Column("master_object_name", sa.String(), nullable=False),
+        sa.Column("preset", sa.String(length=64), nullable=False),
+        sa.Column("content_type", sa.String(), nullable=False),
+        sa.Column("object_name", sa.String(), nullable=False),
+        sa.Column("width", sa.Integer(), nullable=False),
+        sa.Column("height", sa.Integer(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("object_name"),
+        sa.UniqueConstraint(
+            "master_object_name",
+            "preset",
+            "content_type",
+            name="uq_renditionmodels_preset",
+        ),
+    )
+    op.create_index(
+        op.f("ix_renditionmodels_id"), "renditionmodels", ["id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_renditionmodels_id"), table_name="renditionmodels")
+    op.drop_table("renditionmodels")
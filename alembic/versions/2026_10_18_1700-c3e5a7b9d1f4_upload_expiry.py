@@ -0,0 +1,48 @@
+"""direct upload expiry
+
+Revision ID: c3e5a7b9d1f4
+Revises: a7c9e1b3d5f2
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c3e5a7b9d1f4"
+down_revision: Union[str, None] = "a7c9e1b3d5f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Существующие задачи uploading получают срок от текущего run_at
+    # (время создания): PRESIGNED_UPLOAD_EXPIRES + JOB_UPLOAD_GRACE по умолчанию
+    op.execute(
+        "UPDATE jobmodels SET run_at = run_at + interval '1200 seconds' "
+        "WHERE status = 'uploading'"
+    )
+    with op.get_context().autocommit_block():
+        # Частичный индекс для expire_uploads; CONCURRENTLY не блокирует
+        # запись в очередь, но не работает в транзакции
+        op.create_index(
+            "ix_jobmodels_run_at_uploading",
+            "jobmodels",
+            ["run_at"],
+            unique=False,
+            postgresql_where=sa.text("status = 'uploading'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_jobmodels_run_at_uploading",
+            table_name="jobmodels",
+            postgresql_concurrently=True,
+        )
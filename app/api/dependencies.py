@@ -1,34 +1,63 @@
 from aiohttp import web
 from services.image_service import ImageService
 from services.auth_service import AuthService
-from services.minio_service import MinioService
+from services.storage_base import Storage
+from services.rendition_service import RenditionService
+from services.job_service import JobService
 from repositories.image_repo import ImageRepository
+from repositories.job_repo import JobRepository
 from repositories.user_repo import UserRepository
-from database import async_session, get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+def get_db_session(request: web.Request) -> AsyncSession:
+    # Сессию открывает db_session_middleware, одна на запрос
+    return request["db_session"]
+
+
 async def get_image_repo(request: web.Request) -> ImageRepository:
-    session: AsyncSession = await async_session()
-    return ImageRepository(session)
+    return ImageRepository(get_db_session(request))
 
 
 async def get_user_repo(request: web.Request) -> UserRepository:
-    # session = await get_db_session(request)
-    session: AsyncSession = await async_session()
-    return UserRepository(session=session)
+    return UserRepository(session=get_db_session(request))
+
 
+async def get_storage(request: web.Request) -> Storage:
+    # Хранилище создается один раз в init_storage
+    return request.app["storage"]
 
-async def get_minio_service(request: web.Request) -> MinioService:
-    return MinioService()
+
+async def get_rendition_service(request: web.Request) -> RenditionService:
+    return request.app["rendition_service"]
 
 
 async def get_image_service(request: web.Request) -> ImageService:
     repo = await get_image_repo(request)
-    minio_service = await get_minio_service(request)
-    return ImageService(repo, minio_service)
+    storage = await get_storage(request)
+    return ImageService(
+        repo,
+        storage,
+        request.app["image_processor"],
+        request.app["image_cache"],
+        request.app.get("image_writer"),
+    )
+
+
+async def get_job_service(request: web.Request) -> JobService:
+    storage = await get_storage(request)
+    return JobService(
+        JobRepository(get_db_session(request)),
+        storage,
+        request.app["job_queue"],
+    )
 
 
 async def get_auth_service(request: web.Request) -> AuthService:
     user_repo = await get_user_repo(request)
-    return AuthService(user_repo)
+    return AuthService(
+        user_repo,
+        request.app["auth_cache"],
+        request.app["password_hasher"],
+        request.app["db_sessionmaker"],
+    )
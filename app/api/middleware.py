@@ -1,23 +1,90 @@
 from aiohttp import web
-from utils.logging import logger
-from jose import jwt, exceptions
-from config import settings
+from api.dependencies import get_auth_service
+from utils.metrics import registry
+import asyncio
+import time
 
+# Эндпоинты /api/, доступные без токена
+PUBLIC_PATHS = {"/api/login", "/api/register"}
 
-async def auth_middleware(app, handler):
-    async def middleware_handler(request):
-        if request.path.startswith("/api/"):
-            token = request.headers.get("Authorization", "").replace("Bearer ", "")
 
-            try:
-                payload = jwt.decode(
-                    token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-                )
-                request["user_id"] = payload.get("sub")
-            except Exception as e:
-                print(e)
-                return web.json_response({"error": "Invalid token"}, status=401)
+@web.middleware
+async def auth_middleware(request: web.Request, handler):
+    """
+    Единая точка аутентификации: проверяет токен (с кэшем проверенных JWT
+    и пользователей) и кладет пользователя в request["user"].
+    """
+    if request.path.startswith("/api/") and request.path not in PUBLIC_PATHS:
+        auth_service = await get_auth_service(request)
+        request["user"] = await auth_service.get_current_user(request)
 
-        return await handler(request)
+    return await handler(request)
 
-    return middleware_handler
+
+http_requests = registry.counter(
+    "http_requests_total", "Запросы по маршруту и статусу", ("method", "route", "status")
+)
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Время обработки запроса", ("method", "route")
+)
+http_in_flight = registry.gauge(
+    "http_requests_in_flight", "Запросы в обработке", ("route",)
+)
+http_bytes = registry.counter(
+    "http_bytes_total", "Байты запросов и ответов", ("route", "direction")
+)
+
+# Дочерние метрики маршрута создаются один раз, дальше - один поиск в словаре
+_route_metrics = {}
+
+
+def _metrics_for(method: str, route: str):
+    key = (method, route)
+    metrics = _route_metrics.get(key)
+    if metrics is None:
+        metrics = _route_metrics[key] = (
+            http_in_flight.labels(route),
+            http_request_seconds.labels(method, route),
+            http_bytes.labels(route, "in"),
+            http_bytes.labels(route, "out"),
+        )
+    return metrics
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler):
+    """
+    Время, число и объем запросов по шаблону маршрута ("/api/images/{id}"),
+    а не по фактическому пути - число рядов метрик не растет с числом id.
+    """
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource is not None else "unmatched"
+    in_flight, duration, bytes_in, bytes_out = _metrics_for(request.method, route)
+
+    in_flight.inc()
+    start = time.perf_counter()
+    status = 500
+    response = None
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    except asyncio.CancelledError:
+        # Клиент закрыл соединение
+        status = 499
+        raise
+    finally:
+        duration.observe(time.perf_counter() - start)
+        in_flight.dec()
+        http_requests.labels(request.method, route, str(status)).inc()
+        # total_bytes - фактически прочитанное тело, в том числе chunked
+        bytes_in.inc(getattr(request.content, "total_bytes", 0))
+        if response is not None:
+            # Потоковый ответ уже отправлен (body_length), обычный
+            # отправится после middleware - берем Content-Length
+            bytes_out.inc(response.body_length or response.content_length or 0)
+        # Тело, отправленное loop.sendfile (utils.http.send_file)
+        bytes_out.inc(request.get("sendfile_bytes", 0))
@@ -1,12 +1,26 @@
-from aiohttp import web
+from aiohttp import web, hdrs
 from aiohttp.web_request import Request
-from services.image_service import ImageService
-from services.auth_service import AuthService
-from api.dependencies import get_image_service, get_auth_service
+from services.rendition_service import RenditionService, rendition_presets
+from api.dependencies import (
+    get_image_service,
+    get_auth_service,
+    get_job_service,
+    get_rendition_service,
+)
 from schemas.user import UserCreate
-from schemas.image import ImageCompressionParams
+from schemas.image import (
+    ImageCompressionParams,
+    ImageMetadataRequest,
+    RenditionParams,
+)
+from schemas.job import DirectUploadRequest, DirectUploadResponse, JobResponse
 from utils.logging import logger
-import json
+from utils.streams import read_field_to_spool
+from utils.callbacks import validate_callback_url
+from utils.http import is_not_modified, resolve_range, send_file, to_http_datetime
+from utils.formats import BY_CONTENT_TYPE, JPEG, delivery_formats, negotiate_format
+from config import settings
+from typing import Optional
 
 
 async def login(request: Request) -> web.Response:
@@ -26,7 +40,8 @@ async def login(request: Request) -> web.Response:
     access_token = auth_service.create_access_token(user.id)
 
     logger.info(
-        f"User logged in: {username}",
+        "User logged in: %s",
+        username,
         extra={"route": "/login", "functionName": "login"},
     )
 
@@ -44,7 +59,8 @@ async def register(request: Request) -> web.Response:
     access_token = auth_service.create_access_token(user.id)
 
     logger.info(
-        f"User registered: {user.username}",
+        "User registered: %s",
+        user.username,
         extra={"route": "/register", "functionName": "register"},
     )
 
@@ -58,8 +74,8 @@ async def register(request: Request) -> web.Response:
 
 
 async def get_current_user(request: Request) -> web.Response:
-    auth_service = await get_auth_service(request)
-    user = await auth_service.get_current_user(request)
+    # Пользователя кладет auth_middleware
+    user = request["user"]
 
     return web.json_response(
         {
@@ -72,13 +88,26 @@ async def get_current_user(request: Request) -> web.Response:
     )
 
 
+def _wants_async(request: Request) -> bool:
+    # ?async=1 или Prefer: respond-async (RFC 7240)
+    if request.query.get("async", "").lower() in ("1", "true"):
+        return True
+    return "respond-async" in request.headers.get("Prefer", "")
+
+
+async def _callback_url_error(callback_url: Optional[str]) -> Optional[str]:
+    if not callback_url:
+        return None
+    try:
+        await validate_callback_url(callback_url)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
 # Обновленные эндпоинты для работы с изображениями
 async def upload_image(request: Request) -> web.Response:
     image_service = await get_image_service(request)
-    auth_service = await get_auth_service(request)
-
-    # Проверка авторизации
-    await auth_service.auth_required(request)
 
     # Чтение multipart данных
     reader = await request.multipart()
@@ -87,58 +116,488 @@ async def upload_image(request: Request) -> web.Response:
     file_data = None
     filename = None
     content_type = None
+    source_hash = None
+    size = 0
+    callback_url = None
+
+    try:
+        while True:
+            field = await reader.next()
+            if not field:
+                break
+
+            if field.name == "file":
+                if file_data is not None:
+                    file_data.close()
+                # Потоковое чтение с проверкой MAX_IMAGE_SIZE; тип - по сигнатуре
+                # файла, Content-Type клиента не учитывается
+                file_data, size, source_hash, header = await read_field_to_spool(
+                    field
+                )
+                filename = field.filename
+                content_type = header.content_type
+            elif field.name in ["quality", "x", "y"]:
+                value = await field.text()
+                if value.isdigit():
+                    compression_params[field.name] = int(value)
+            elif field.name == "callback_url":
+                callback_url = (await field.text()).strip() or None
+
+        if file_data is None:
+            raise web.HTTPBadRequest(reason="File is required")
+
+        # Валидация параметров компрессии
+        if compression_params:
+            try:
+                ImageCompressionParams(**compression_params)
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+
+        if _wants_async(request):
+            error = await _callback_url_error(callback_url)
+            if error is not None:
+                return web.json_response({"error": error}, status=400)
+            # Ответ сразу после сохранения исходника; обработка - в очереди
+            job_service = await get_job_service(request)
+            job = await job_service.enqueue(
+                file_data,
+                size,
+                filename,
+                compression_params or None,
+                source_hash=source_hash,
+                owner_id=request["user"].id,
+                callback_url=callback_url,
+            )
+            logger.info(
+                "Image upload queued: job %s",
+                job.id,
+                extra={"route": "/upload", "functionName": "upload_image"},
+            )
+            return web.json_response(
+                JobResponse.model_validate(job).model_dump(mode="json"),
+                status=202,
+                headers={hdrs.LOCATION: f"/api/jobs/{job.id}"},
+            )
+
+        # Обработка изображения
+        result = await image_service.process_and_save_image(
+            file_data,
+            filename,
+            content_type,
+            compression_params or None,
+            source_hash=source_hash,
+            owner_id=request["user"].id,
+        )
+    finally:
+        if file_data is not None:
+            file_data.close()
+
+    logger.info(
+        "Image uploaded successfully: %s",
+        result.minio_object_name,
+        extra={"route": "/upload", "functionName": "upload_image"},
+    )
 
-    while True:
-        field = await reader.next()
-        if not field:
-            break
+    return web.json_response(result.model_dump())
+
+
+async def upload_images_batch(request: Request) -> web.Response:
+    image_service = await get_image_service(request)
+
+    reader = await request.multipart()
+
+    compression_params = {}
+    batch = None
+    count = 0
+
+    try:
+        while True:
+            field = await reader.next()
+            if not field:
+                break
+
+            if field.name in ["quality", "x", "y"]:
+                if batch is not None:
+                    raise web.HTTPBadRequest(
+                        reason="Compression params must precede files"
+                    )
+                value = await field.text()
+                if value.isdigit():
+                    compression_params[field.name] = int(value)
+                continue
+
+            if field.name not in ["file", "files"]:
+                continue
+
+            if batch is None:
+                # Параметры компрессии общие для всех файлов пакета
+                if compression_params:
+                    try:
+                        ImageCompressionParams(**compression_params)
+                    except ValueError as e:
+                        return web.json_response({"error": str(e)}, status=400)
+                batch = image_service.start_batch(
+                    compression_params or None, request["user"].id
+                )
+
+            count += 1
+            if count > settings.BATCH_UPLOAD_MAX_FILES:
+                raise web.HTTPRequestEntityTooLarge(
+                    max_size=settings.BATCH_UPLOAD_MAX_FILES,
+                    actual_size=count,
+                    reason=f"Too many files, max {settings.BATCH_UPLOAD_MAX_FILES}",
+                )
 
-        if field.name == "file":
-            file_data = await field.read()
             filename = field.filename
-            content_type = field.headers.get("Content-Type")
-        elif field.name in ["quality", "x", "y"]:
-            value = await field.text()
-            if value.isdigit():
-                compression_params[field.name] = int(value)
-
-    # Валидация параметров компрессии
-    if compression_params:
-        try:
-            ImageCompressionParams(**compression_params)
-        except ValueError as e:
-            return web.json_response({"error": str(e)}, status=400)
+            try:
+                file_data, _, source_hash, _ = await read_field_to_spool(field)
+            except (
+                web.HTTPRequestEntityTooLarge,
+                web.HTTPUnsupportedMediaType,
+            ) as e:
+                # Остаток поля пропускается, остальные файлы обрабатываются
+                await field.release()
+                batch.add_error(filename, e)
+                continue
+            batch.add(file_data, filename, source_hash)
+
+        if batch is None:
+            raise web.HTTPBadRequest(reason="At least one file is required")
+
+        results = await batch.finish()
+        batch = None
+    finally:
+        if batch is not None:
+            # Прерванный запрос: дожидаемся фоновых задач, чтобы закрыть файлы
+            await batch.cancel()
+
+    succeeded = sum(1 for result in results if result["status"] == "ok")
 
-    # Обработка изображения
+    logger.info(
+        "Batch uploaded: %s of %s images",
+        succeeded,
+        len(results),
+        extra={"route": "/upload/batch", "functionName": "upload_images_batch"},
+    )
 
-    result = await image_service.process_and_save_image(
-        file_data, filename, content_type, compression_params or None
+    return web.json_response(
+        {
+            "results": results,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+        }
+    )
+
+
+async def create_direct_upload(request: Request) -> web.Response:
+    job_service = await get_job_service(request)
+
+    data = await request.json()
+    try:
+        payload = DirectUploadRequest(**data)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    error = await _callback_url_error(payload.callback_url)
+    if error is not None:
+        return web.json_response({"error": error}, status=400)
+
+    compression_params = payload.model_dump(
+        include={"quality", "x", "y"}, exclude_none=True
+    )
+    created = await job_service.create_direct_upload(
+        payload.filename,
+        compression_params or None,
+        owner_id=request["user"].id,
+        callback_url=payload.callback_url,
     )
+    if created is None:
+        raise web.HTTPNotImplemented(reason="Direct uploads require S3 storage")
+    job, url = created
 
     logger.info(
-        f"Image uploaded successfully: {result.minio_object_name}",
-        extra={"route": "/upload", "functionName": "upload_image"},
+        "Direct upload created: job %s",
+        job.id,
+        extra={"route": "/upload/presigned", "functionName": "create_direct_upload"},
+    )
+
+    response = DirectUploadResponse(
+        **JobResponse.model_validate(job).model_dump(),
+        upload_url=url,
+        expires_in=settings.PRESIGNED_UPLOAD_EXPIRES,
+    )
+    return web.json_response(
+        response.model_dump(mode="json"),
+        status=201,
+        headers={hdrs.LOCATION: f"/api/jobs/{job.id}"},
     )
 
-    return web.json_response(result.model_dump())
 
+def _owner_scope(request: Request):
+    # Суперпользователь видит изображения всех пользователей
+    user = request["user"]
+    return None if user.is_superuser else user.id
 
-async def get_image(request: Request) -> web.Response:
+
+async def list_images(request: Request) -> web.Response:
     image_service = await get_image_service(request)
-    auth_service = await get_auth_service(request)
 
-    # Проверка авторизации
-    await auth_service.auth_required(request)
+    try:
+        limit = int(request.query.get("limit", settings.IMAGE_LIST_DEFAULT_LIMIT))
+    except ValueError:
+        return web.json_response({"error": "limit must be an integer"}, status=400)
+    if not 1 <= limit <= settings.IMAGE_LIST_MAX_LIMIT:
+        return web.json_response(
+            {"error": f"limit must be between 1 and {settings.IMAGE_LIST_MAX_LIMIT}"},
+            status=400,
+        )
+
+    try:
+        page = await image_service.list_images(
+            limit, _owner_scope(request), request.query.get("cursor")
+        )
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+
+    return web.json_response(page.model_dump(mode="json"))
+
+
+async def get_images_metadata(request: Request) -> web.Response:
+    image_service = await get_image_service(request)
+
+    data = await request.json()
+    try:
+        payload = ImageMetadataRequest(**data)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    if len(payload.ids) > settings.IMAGE_METADATA_MAX_IDS:
+        return web.json_response(
+            {"error": f"At most {settings.IMAGE_METADATA_MAX_IDS} ids per request"},
+            status=400,
+        )
+
+    result = await image_service.get_images_metadata(
+        payload.ids, _owner_scope(request)
+    )
+
+    return web.json_response(result.model_dump(mode="json"))
+
+
+RENDITION_QUERY_PARAMS = ("w", "h", "q", "fit")
+
+
+async def get_image(request: Request) -> web.StreamResponse:
+    image_service = await get_image_service(request)
 
     image_id = int(request.match_info["id"])
-    image_data, content_type = await image_service.get_image(image_id)
 
-    if not image_data:
+    # Производная версия: ?w=&h=&q=&fit=
+    rendition = None
+    if any(name in request.query for name in RENDITION_QUERY_PARAMS):
+        try:
+            rendition = RenditionParams(
+                **{
+                    name: request.query[name]
+                    for name in RENDITION_QUERY_PARAMS
+                    if name in request.query
+                }
+            )
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+
+    # Пресет из IMAGE_PRESETS: ?preset=thumb
+    preset = request.query.get("preset")
+    if preset is not None:
+        if rendition is not None:
+            return web.json_response(
+                {"error": "preset cannot be combined with w, h, q or fit"},
+                status=400,
+            )
+        rendition = rendition_presets().get(preset)
+        if rendition is None:
+            return web.json_response({"error": f"Unknown preset: {preset}"}, status=400)
+
+    # Чужое изображение - 404, как и несуществующее: ни версий, ни ссылок
+    image = await image_service.get_image_metadata(image_id, _owner_scope(request))
+
+    if not image:
         return web.json_response({"error": "Image not found"}, status=404)
 
+    # Формат отдачи по Accept; мастер хранится в формате исходника
+    master = BY_CONTENT_TYPE.get(image.content_type, JPEG)
+    # Готовые версии пресета: формат выбирается только из них
+    ready = {}
+    if preset is not None:
+        ready = await image_service.get_preset_renditions(image, preset, rendition)
+    delivery = negotiate_format(request.headers.get(hdrs.ACCEPT), master, ready or None)
+    if rendition is None and delivery is not master:
+        rendition = RenditionParams()
+
+    if rendition is None:
+        object_name, content_type = image.minio_object_name, image.content_type
+    elif delivery in ready:
+        object_name = ready[delivery].object_name
+        content_type = delivery.content_type
+    else:
+        object_name = RenditionService.rendition_key(image, rendition, delivery)
+        content_type = delivery.content_type
+
+    # Режим redirect: байты отдает MinIO, приложение только проверяет доступ
+    if settings.IMAGE_DELIVERY_MODE == "redirect":
+        url = image_service.presigned_url(object_name)
+        if url is not None:
+            if rendition is not None and delivery not in ready:
+                rendition_service = await get_rendition_service(request)
+                await rendition_service.get_rendition(image, rendition, delivery)
+            # 307 сохраняет метод (HEAD); Range клиент передаст в MinIO сам.
+            # Сам редирект не кэшируется: ссылка действует ограниченное время
+            headers = {hdrs.LOCATION: url, hdrs.CACHE_CONTROL: "no-store"}
+            if delivery_formats():
+                headers[hdrs.VARY] = hdrs.ACCEPT
+            logger.info(
+                "Image redirected to storage: %s",
+                image_id,
+                extra={"route": "/images/{id}", "functionName": "get_image"},
+            )
+            return web.Response(status=307, headers=headers)
+
+    # Имя объекта уникально и неизменяемо, поэтому годится как ETag
+    etag = object_name
+    last_modified = to_http_datetime(image.updated_at)
+    headers = {
+        hdrs.CACHE_CONTROL: settings.IMAGE_CACHE_CONTROL,
+        hdrs.ACCEPT_RANGES: "bytes",
+    }
+    if delivery_formats():
+        headers[hdrs.VARY] = hdrs.ACCEPT
+
+    # Повторный запрос: 304 без обращения к хранилищу
+    if is_not_modified(request, etag, last_modified):
+        response = web.Response(status=304, headers=headers)
+        response.etag = etag
+        response.last_modified = last_modified
+        return response
+
+    baseline = None
+    if rendition is None:
+        size = image.size
+    else:
+        rendition_service = await get_rendition_service(request)
+        if delivery in ready:
+            # Пресет создан при загрузке: ни обработки, ни запроса к хранилищу
+            size = ready[delivery].size
+        else:
+            size = await rendition_service.get_rendition(image, rendition, delivery)
+        if delivery is not master:
+            # Размер того же ответа в формате мастера - для оценки экономии
+            if master in ready:
+                baseline = ready[master].size
+            else:
+                baseline = rendition_service.baseline_size(image, rendition, master)
+            if baseline is not None:
+                headers["X-Original-Size"] = str(baseline)
+
+    byte_range = resolve_range(request, size, etag, last_modified)
+    if byte_range is None:
+        status, offset, length = 200, 0, size
+        if baseline is not None and request.method != hdrs.METH_HEAD:
+            rendition_service.record_delivery(delivery, size, baseline)
+    else:
+        start, end = byte_range
+        status, offset, length = 206, start, end - start + 1
+        headers[hdrs.CONTENT_RANGE] = f"bytes {start}-{end}/{size}"
+
+    data = path = None
+    if request.method != hdrs.METH_HEAD:
+        # Файл на локальном диске - через sendfile; горячие объекты
+        # из MinIO - из кэша в памяти, без обращения к хранилищу
+        path = image_service.local_path(object_name)
+        if path is None:
+            data = await image_service.get_cached_payload(object_name, size)
+
+    response = web.StreamResponse(status=status, headers=headers)
+    response.content_type = content_type
+    response.content_length = length
+    response.etag = etag
+    response.last_modified = last_modified
+    await response.prepare(request)
+
+    if data is not None:
+        await response.write(memoryview(data)[offset : offset + length])
+        await response.write_eof()
+    elif path is not None:
+        await send_file(request, response, path, offset, length)
+        await response.write_eof()
+    elif request.method != hdrs.METH_HEAD:
+        chunks = image_service.stream_image(
+            object_name, offset=offset, length=length if status == 206 else 0
+        )
+        try:
+            async for chunk in chunks:
+                await response.write(chunk)
+        finally:
+            await chunks.aclose()
+        await response.write_eof()
+
     logger.info(
-        f"Image retrieved successfully: {image_id}",
+        "Image retrieved successfully: %s",
+        image_id,
         extra={"route": "/images/{id}", "functionName": "get_image"},
     )
 
-    return web.Response(body=image_data, content_type=content_type)
+    return response
+
+
+async def get_job(request: Request) -> web.Response:
+    job_service = await get_job_service(request)
+
+    job_id = int(request.match_info["id"])
+    job = await job_service.get_job(job_id, _owner_scope(request))
+    if job is None:
+        return web.json_response({"error": "Job not found"}, status=404)
+
+    return web.json_response(JobResponse.model_validate(job).model_dump(mode="json"))
+
+
+async def complete_upload(request: Request) -> web.Response:
+    job_service = await get_job_service(request)
+
+    job_id = int(request.match_info["id"])
+    job = await job_service.get_job(job_id, _owner_scope(request))
+    if job is None:
+        return web.json_response({"error": "Job not found"}, status=404)
+
+    job = await job_service.complete_upload(job)
+
+    logger.info(
+        "Direct upload completed: job %s",
+        job.id,
+        extra={"route": "/jobs/{id}/complete", "functionName": "complete_upload"},
+    )
+
+    return web.json_response(
+        JobResponse.model_validate(job).model_dump(mode="json"),
+        status=202,
+        headers={hdrs.LOCATION: f"/api/jobs/{job.id}"},
+    )
+
+
+async def delete_image(request: Request) -> web.Response:
+    image_service = await get_image_service(request)
+
+    image_id = int(request.match_info["id"])
+    if not await image_service.delete_image(image_id, _owner_scope(request)):
+        return web.json_response({"error": "Image not found"}, status=404)
+
+    logger.info(
+        "Image deleted: %s",
+        image_id,
+        extra={"route": "/images/{id}", "functionName": "delete_image"},
+    )
+
+    return web.Response(status=204)
+
+
+async def metrics(request: Request) -> web.Response:
+    # В режиме нескольких воркеров - сумма по всем процессам
+    text = await request.app["metrics_exporter"].render()
+    return web.Response(text=text, content_type="text/plain", charset="utf-8")
@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
+import os
 
 
 class Settings(BaseSettings):
@@ -14,21 +16,146 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> str:
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800  # секунды
+    DB_POOL_PRE_PING: bool = True
+    DB_QUERY_CACHE_SIZE: int = 500  # скомпилированные запросы SQLAlchemy
+    # Подготовленные запросы asyncpg на соединение (LRU); 0 - запрос
+    # подготавливается заново при каждом выполнении
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_TOKEN_CACHE_TTL: float = 300.0  # не дольше срока действия токена
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = 100_000
+    AUTH_USER_CACHE_TTL: float = 30.0
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 10_000
+    BCRYPT_ROUNDS: int = 12  # при расхождении хэш пересчитывается при входе
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    # Storage
+    STORAGE_BACKEND: str = "minio"  # "minio", "local" или "tiered" (диск + MinIO)
+    LOCAL_STORAGE_PATH: str = "data/storage"
+    LOCAL_STORAGE_WORKERS: int = 8
+    LOCAL_STORAGE_FSYNC: bool = False  # fsync файла и каталога перед rename
+
+    # MinIO (STORAGE_BACKEND=minio или tiered)
+    MINIO_ENDPOINT: str = "localhost:9000"
+    MINIO_ACCESS_KEY: str = ""
+    MINIO_SECRET_KEY: str = ""
+    MINIO_SECURE: bool = False
+    MINIO_BUCKET_NAME: str = "images"
+    MINIO_REGION: str = "us-east-1"  # задан явно, чтобы не запрашивать location
+    MINIO_MAX_WORKERS: int = 16  # потоки и размер пула HTTP-соединений
+    MINIO_TIMEOUT: float = 30.0
+    # Адрес MinIO для клиентов в presigned URL ("https://s3.example.com"),
+    # если он отличается от MINIO_ENDPOINT: хост входит в подпись
+    MINIO_PUBLIC_URL: Optional[str] = None
 
-    # MinIO
-    MINIO_ENDPOINT: str
-    MINIO_ACCESS_KEY: str
-    MINIO_SECRET_KEY: str
-    MINIO_SECURE: bool
-    MINIO_BUCKET_NAME: str
+    # Presigned URL (только MinIO/S3: STORAGE_BACKEND=minio или tiered)
+    IMAGE_DELIVERY_MODE: str = "proxy"  # "proxy" или "redirect" (307 на MinIO)
+    PRESIGNED_URL_EXPIRES: int = 900  # секунды
+    PRESIGNED_URL_MIN_TTL: int = 60  # ссылка из кэша действует не меньше
+    PRESIGNED_URL_CACHE_MAX_ENTRIES: int = 100_000
+    PRESIGNED_UPLOAD_EXPIRES: int = 900  # ссылка на прямую загрузку (PUT)
 
     # Application
-    ALLOWED_IMAGE_TYPES: set = {"image/jpeg", "image/png", "image/gif"}
+    # Проверяется по сигнатуре файла, а не по Content-Type клиента
+    ALLOWED_IMAGE_TYPES: set = {
+        "image/jpeg",
+        "image/png",
+        "image/gif",
+        "image/webp",
+        "image/avif",
+    }
     MAX_IMAGE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_IMAGE_PIXELS: int = 89_478_485  # ширина x высота, как в Pillow
+    UPLOAD_HEADER_MAX_BYTES: int = 256 * 1024  # заголовок изображения - в начале
+    UPLOAD_SPOOL_MAX_MEMORY: int = 1024 * 1024  # больше - буфер уходит на диск
+    IMAGE_STREAM_CHUNK_SIZE: int = 256 * 1024
+
+    # Image processing
+    IMAGE_EXECUTOR: str = "process"  # "process" или "thread"
+    IMAGE_WORKERS: int = 0  # 0 - по числу ядер
+    IMAGE_MAX_QUEUE: int = 32  # задач сверх числа воркеров, дальше 503
+    IMAGE_JOB_TIMEOUT: float = 30.0
+    RETRY_AFTER: int = 1  # секунды, заголовок Retry-After при перегрузке (503)
+    IMAGE_REDUCING_GAP: float = 3.0  # 0 - полное декодирование и точный LANCZOS
+    IMAGE_PROGRESSIVE_JPEG: bool = True
+    # Форматы отдачи по Accept в порядке предпочтения; остальным - формат мастера
+    IMAGE_DELIVERY_FORMATS: list = ["avif", "webp"]
+    RENDITION_KNOWN_KEYS: int = 100_000  # размер кэша ключей готовых версий
+    # Пресеты версий, создаваемые при загрузке: "ШxВ", "Шw" или "Вh",
+    # режим crop/cover, contain или fill (по умолчанию contain), "qN" - качество
+    IMAGE_PRESETS: dict = {"thumb": "150x150 crop", "card": "600w q70", "full": "2048w"}
+    # Форматы пресетов помимо формата мастера (AVIF кодируется заметно дольше)
+    IMAGE_PRESET_FORMATS: list = ["webp"]
+
+    # Hot image cache
+    IMAGE_CACHE_ENABLED: bool = True
+    IMAGE_CACHE_TTL: float = 300.0
+    IMAGE_CACHE_MAX_ENTRIES: int = 100_000  # метаданные
+    IMAGE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # содержимое
+    IMAGE_CACHE_MAX_ITEM_BYTES: int = 2 * 1024 * 1024  # крупнее - только потоком
+    # Сброс кэшей процесса по LISTEN/NOTIFY при изменениях в других воркерах
+    CACHE_INVALIDATION_ENABLED: bool = True
+    # Объекты неизменяемы (новое имя на каждую загрузку), поэтому immutable
+    IMAGE_CACHE_CONTROL: str = "private, max-age=86400, immutable"
+    BATCH_UPLOAD_MAX_FILES: int = 500
+    BATCH_UPLOAD_CONCURRENCY: int = 8  # одновременная обработка и загрузка в MinIO
+    IMAGE_LIST_DEFAULT_LIMIT: int = 50
+    IMAGE_LIST_MAX_LIMIT: int = 200
+    IMAGE_METADATA_MAX_IDS: int = 1000
+
+    # Групповой commit метаданных загрузок (services/image_writer.py)
+    IMAGE_WRITE_BATCHING: bool = False
+    IMAGE_WRITE_MAX_BATCH: int = 64
+    IMAGE_WRITE_MAX_DELAY: float = 0.002  # секунды; 0 - без ожидания соседей
+    IMAGE_WRITE_WORKERS: int = 2  # пачек в полете, по соединению БД на каждую
+
+    # Background jobs (асинхронная загрузка, таблица jobmodels)
+    JOB_WORKERS: int = 2  # задач на процесс; 0 - процесс не разбирает очередь
+    JOB_POLL_INTERVAL: float = 1.0  # секунды, при пустой очереди
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_DELAY: float = 2.0  # удваивается с каждой попыткой
+    JOB_RETRY_MAX_DELAY: float = 300.0
+    JOB_LEASE_TIMEOUT: float = 300.0  # после - задачу упавшего воркера берет другой
+    JOB_CALLBACK_TIMEOUT: float = 10.0
+    # Прямая загрузка отменяется, если не подтверждена за это время
+    # после истечения ссылки (PRESIGNED_UPLOAD_EXPIRES)
+    JOB_UPLOAD_GRACE: float = 300.0
+    # Хосты обратных вызовов во внутренней сети (и их поддомены); остальные
+    # должны разрешаться только в публичные адреса
+    JOB_CALLBACK_ALLOWED_HOSTS: list = []
+
+    # Log sink (таблица logmodels)
+    LOG_SINK_ENABLED: bool = True
+    LOG_SINK_LEVEL: str = "INFO"
+    LOG_SINK_QUEUE_SIZE: int = 10_000
+    LOG_SINK_BATCH_SIZE: int = 500
+    LOG_SINK_FLUSH_INTERVAL: float = 1.0  # секунды
+    LOG_SINK_DROP_POLICY: str = "newest"  # "newest" или "oldest"
+
+    # Server
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8080
+    WEB_WORKERS: int = 1  # 0 - по числу ядер
+    WEB_USE_UVLOOP: bool = True
+    WEB_SHUTDOWN_TIMEOUT: float = 30.0  # ожидание активных запросов при остановке
+    WEB_RESTART_DELAY: float = 1.0  # удваивается при повторных падениях
+    WEB_READY_TIMEOUT: float = 60.0  # запуск нового воркера при перезагрузке
+    METRICS_DIR: Optional[str] = None  # задается лаунчером для сводных метрик
+    METRICS_FLUSH_INTERVAL: float = 5.0
+
+    @property
+    def web_workers(self) -> int:
+        return self.WEB_WORKERS or os.cpu_count() or 1
 
     class Config:
         env_file = ".env"
@@ -1,73 +1,140 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import NullPool
-from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import event, exc
+from aiohttp import web
 from config import settings
+from utils.metrics import registry
 import logging
+import time
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-# Базовый класс для моделей
-Base = declarative_base()
-
-# Создание асинхронного движка
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=True,  # Логирование SQL-запросов (можно отключить в продакшене)
-    poolclass=NullPool,  # Отключаем пул соединений для asyncpg
-    future=True,  # Используем future-совместимый API
+pool_checkout_seconds = registry.histogram(
+    "db_pool_checkout_seconds",
+    "Время ожидания соединения из пула БД, без открытия нового",
 )
-
-# Создание фабрики сессий
-async_session = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,  # Отключаем expire после commit для работы с объектами после сессии
-    autoflush=False,
+pool_connect_seconds = registry.histogram(
+    "db_pool_connect_seconds", "Открытие нового соединения пулом БД"
+)
+pool_checked_out = registry.gauge(
+    "db_pool_checked_out", "Соединения, выданные из пула БД"
+)
+pool_checked_in = registry.gauge(
+    "db_pool_checked_in", "Свободные соединения в пуле БД"
+)
+pool_overflow = registry.gauge(
+    "db_pool_overflow", "Соединения сверх DB_POOL_SIZE"
 )
+pool_size = registry.gauge("db_pool_size", "Размер пула БД")
+query_seconds = registry.histogram(
+    "db_query_seconds", "Время выполнения запроса к БД", ("operation",)
+)
+QUERY_OPERATIONS = ("select", "insert", "update", "delete")
+query_histograms = {
+    operation: query_seconds.labels(operation)
+    for operation in QUERY_OPERATIONS + ("other",)
+}
 
 
-@asynccontextmanager
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+class InstrumentedPool(AsyncAdaptedQueuePool):
     """
-    Асинхронный контекстный менеджер для получения сессии БД.
-    Гарантирует корректное закрытие сессии даже при возникновении исключений.
+    Пул asyncpg-соединений: ожидание свободного соединения и открытие
+    нового (подключение и аутентификация в PostgreSQL) замеряются отдельно.
     """
-    session = async_session()
-    try:
-        yield session
-        await session.commit()
-    except Exception as e:
-        await session.rollback()
-        logger.error(f"Database error: {e}", exc_info=True)
-        raise
-    finally:
-        session.close()
-
-
-async def init_db() -> None:
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        record = super()._create_connection()
+        elapsed = time.perf_counter() - start
+        pool_connect_seconds.observe(elapsed)
+        # Вычитается из ожидания в _do_get
+        record.connect_seconds = elapsed
+        return record
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            # Пул исчерпан: все время - ожидание
+            pool_checkout_seconds.observe(time.perf_counter() - start)
+            raise
+        connect_seconds = record.__dict__.pop("connect_seconds", 0.0)
+        pool_checkout_seconds.observe(
+            time.perf_counter() - start - connect_seconds
+        )
+        return record
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Контекст создается на каждое выполнение, при ошибке ничего не остается
+    context.query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_start
+    operation = statement.lstrip()[:6].lower()
+    histogram = query_histograms.get(operation) or query_histograms["other"]
+    histogram.observe(elapsed)
+
+
+def create_engine():
+    engine = create_async_engine(
+        settings.DATABASE_URL,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        # Параметр DBAPI-адаптера asyncpg в SQLAlchemy, а не самого диалекта
+        connect_args={
+            "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+        },
+    )
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+
+async def init_db(app: web.Application) -> None:
     """
-    Инициализация базы данных - создание всех таблиц.
+    Хук on_startup: создает движок с пулом соединений и фабрику сессий.
     """
-    async with engine.begin() as conn:
-        # Создаем все таблицы
-        await conn.run_sync(Base.metadata.create_all)
-    logger.info("Database initialized successfully")
+    engine = create_engine()
+    app["db_engine"] = engine
+    app["db_sessionmaker"] = async_sessionmaker(
+        engine,
+        class_=AsyncSession,
+        expire_on_commit=False,  # Отключаем expire после commit для работы с объектами после сессии
+        autoflush=False,
+    )
+
+    pool = engine.pool
+    pool_checked_out.set_function(pool.checkedout)
+    pool_checked_in.set_function(pool.checkedin)
+    pool_overflow.set_function(lambda: max(pool.overflow(), 0))
+    pool_size.set_function(pool.size)
+    logger.info("Database engine initialized")
 
 
-async def close_db() -> None:
+async def close_db(app: web.Application) -> None:
     """
-    Корректное закрытие соединений с базой данных.
+    Хук on_cleanup: корректное закрытие соединений с базой данных.
     """
-    await engine.dispose()
+    await app["db_engine"].dispose()
     logger.info("Database connections closed")
 
 
-# Для удобства импорта
-async def async_session() -> AsyncSession:
+@web.middleware
+async def db_session_middleware(request: web.Request, handler):
     """
-    Функция для получения асинхронной сессии (альтернатива контекстному менеджеру).
+    Одна сессия на запрос, общая для всех репозиториев.
+    Соединение берется из пула только при первом обращении к БД.
     """
-    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)()
+    async with request.app["db_sessionmaker"]() as session:
+        request["db_session"] = session
+        return await handler(request)
@@ -1,14 +1,65 @@
 from aiohttp import web
-from api.routes import upload_image, get_image, login, register, get_current_user
-from api.middleware import auth_middleware
+from api.routes import (
+    upload_image,
+    upload_images_batch,
+    create_direct_upload,
+    list_images,
+    get_images_metadata,
+    get_image,
+    delete_image,
+    get_job,
+    complete_upload,
+    login,
+    register,
+    get_current_user,
+    metrics,
+)
+from api.middleware import auth_middleware, metrics_middleware
+from database import init_db, close_db, db_session_middleware
+from services.storage_service import init_storage, close_storage
+from utils.image_processor import init_image_processor, close_image_processor
+from services.rendition_service import init_renditions
+from services.cache_service import init_image_cache, init_auth_cache
+from services.cache_invalidation import (
+    init_cache_invalidation,
+    close_cache_invalidation,
+)
+from services.job_service import init_job_queue, close_job_queue
+from utils.passwords import init_password_hasher, close_password_hasher
+from services.log_service import init_log_sink, close_log_sink
+from services.image_writer import init_image_writer, close_image_writer
+from utils.metrics import init_metrics, close_metrics
 
-# from database import init_db, close_db
 # from config import settings
 
 
 async def create_app():
-    # app = web.Application(middlewares=[auth_middleware])
-    app = web.Application()
+    app = web.Application(
+        middlewares=[metrics_middleware, db_session_middleware, auth_middleware]
+    )
+
+    app.on_startup.append(init_metrics)
+    app.on_startup.append(init_db)
+    app.on_startup.append(init_log_sink)
+    app.on_startup.append(init_storage)
+    app.on_startup.append(init_image_processor)
+    app.on_startup.append(init_renditions)
+    app.on_startup.append(init_image_cache)
+    app.on_startup.append(init_image_writer)
+    app.on_startup.append(init_auth_cache)
+    app.on_startup.append(init_cache_invalidation)
+    app.on_startup.append(init_password_hasher)
+    app.on_startup.append(init_job_queue)
+    # Очередь останавливается первой: незавершенные задачи возвращаются в БД
+    app.on_cleanup.append(close_job_queue)
+    app.on_cleanup.append(close_image_writer)
+    app.on_cleanup.append(close_cache_invalidation)
+    app.on_cleanup.append(close_log_sink)
+    app.on_cleanup.append(close_db)
+    app.on_cleanup.append(close_storage)
+    app.on_cleanup.append(close_image_processor)
+    app.on_cleanup.append(close_password_hasher)
+    app.on_cleanup.append(close_metrics)
 
     # Роуты
     app.router.add_post("/api/login", login)
@@ -18,10 +69,21 @@ async def create_app():
     )
     app.router.add_get("/api/me", get_current_user)
     app.router.add_post("/api/upload", upload_image)
+    app.router.add_post("/api/upload/batch", upload_images_batch)
+    app.router.add_post("/api/upload/presigned", create_direct_upload)
+    app.router.add_get("/api/images", list_images)
+    app.router.add_post("/api/images/metadata", get_images_metadata)
     app.router.add_get("/api/images/{id}", get_image)
+    app.router.add_delete("/api/images/{id}", delete_image)
+    app.router.add_get("/api/jobs/{id}", get_job)
+    app.router.add_post("/api/jobs/{id}/complete", complete_upload)
+    app.router.add_get("/metrics", metrics)
 
     return app
 
 
 if __name__ == "__main__":
-    web.run_app(create_app(), port=8080)
+    # Число воркеров, uvloop и порт - см. WEB_* в config.py
+    from server import run
+
+    run()
@@ -1,14 +1,28 @@
-from sqlalchemy import String, Integer
+from sqlalchemy import String, Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
 from .base import Base, TimestampMixin
 
 
 class ImageModel(Base, TimestampMixin):
+    __table_args__ = (
+        # Keyset-пагинация: ORDER BY created_at DESC, id DESC
+        Index("ix_imagemodels_created_at_id", "created_at", "id"),
+        Index("ix_imagemodels_owner_id_created_at_id", "owner_id", "created_at", "id"),
+    )
 
     original_filename: Mapped[str] = mapped_column(String, nullable=False)
     content_type: Mapped[str] = mapped_column(String, nullable=False)
     size: Mapped[int] = mapped_column(Integer, nullable=False)
-    minio_object_name: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    # Один объект может принадлежать нескольким строкам (дедупликация)
+    minio_object_name: Mapped[str] = mapped_column(String, nullable=False, index=True)
     compression_params: Mapped[str] = mapped_column(
         String, nullable=True
     )  # JSON string
+    source_hash: Mapped[str] = mapped_column(
+        String(64), nullable=True, index=True
+    )  # sha256 исходных байт
+    # NULL у изображений, загруженных до появления владельца
+    owner_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("usermodels.id", ondelete="SET NULL"), nullable=True
+    )
@@ -0,0 +1,62 @@
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from typing import Optional
+from .base import Base, TimestampMixin
+
+# Прямая загрузка по presigned URL: в очередь задача попадает после
+# подтверждения клиентом, до этого ее не видит ни один воркер
+JOB_UPLOADING = "uploading"
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+# Условие частичного индекса; запросы очереди используют его же текст,
+# иначе планировщик не докажет, что индекс подходит
+JOB_PENDING = "status IN ('queued', 'running')"
+# То же для неподтвержденных прямых загрузок, см. expire_uploads
+JOB_AWAITING_UPLOAD = "status = 'uploading'"
+
+
+class JobModel(Base, TimestampMixin):
+    """
+    Задача фоновой обработки загруженного файла. Исходные байты лежат
+    в MinIO (raw_object_name) до завершения задачи.
+    run_at - время следующей попытки; у выполняемой задачи - срок аренды,
+    после которого задачу упавшего воркера заберет другой; у прямой
+    загрузки - срок подтверждения, после которого задача отменяется.
+    """
+
+    __table_args__ = (
+        # Выборка очереди: только незавершенные задачи, по времени запуска
+        Index(
+            "ix_jobmodels_run_at_pending",
+            "run_at",
+            postgresql_where=text(JOB_PENDING),
+        ),
+        Index(
+            "ix_jobmodels_run_at_uploading",
+            "run_at",
+            postgresql_where=text(JOB_AWAITING_UPLOAD),
+        ),
+    )
+
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default=JOB_QUEUED)
+    owner_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("usermodels.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    raw_object_name: Mapped[str] = mapped_column(String, nullable=False)
+    original_filename: Mapped[str] = mapped_column(String, nullable=False)
+    compression_params: Mapped[Optional[str]] = mapped_column(
+        String, nullable=True
+    )  # JSON string
+    source_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    callback_url: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    run_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )
+    image_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("imagemodels.id", ondelete="SET NULL"), nullable=True
+    )
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -6,7 +6,7 @@ from .base import Base
 
 class LogModel(Base):
 
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     route = Column(String, nullable=False)
     function_name = Column(String, nullable=False)
     level = Column(String, nullable=False)
@@ -0,0 +1,28 @@
+from sqlalchemy import String, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from .base import Base, TimestampMixin
+
+
+class RenditionModel(Base, TimestampMixin):
+    """
+    Версия-пресет, созданная при загрузке и сохраненная рядом с мастером.
+    Привязана к объекту мастера, а не к строке ImageModel: при дедупликации
+    один мастер и его версии общие для нескольких изображений.
+    """
+
+    __table_args__ = (
+        UniqueConstraint(
+            "master_object_name",
+            "preset",
+            "content_type",
+            name="uq_renditionmodels_preset",
+        ),
+    )
+
+    master_object_name: Mapped[str] = mapped_column(String, nullable=False)
+    preset: Mapped[str] = mapped_column(String(64), nullable=False)
+    content_type: Mapped[str] = mapped_column(String, nullable=False)
+    object_name: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    width: Mapped[int] = mapped_column(Integer, nullable=False)
+    height: Mapped[int] = mapped_column(Integer, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -0,0 +1,24 @@
+from sqlalchemy import String, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from .base import Base, TimestampMixin
+
+
+class StoredObjectModel(Base, TimestampMixin):
+    """
+    Обработанный объект в MinIO, общий для одинаковых загрузок.
+    Ключ дедупликации - (хэш исходных байт, параметры обработки).
+    ref_count - число строк ImageModel, ссылающихся на объект.
+    """
+
+    __table_args__ = (
+        UniqueConstraint(
+            "source_hash", "params_key", name="uq_storedobjectmodels_source"
+        ),
+    )
+
+    object_name: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    source_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    params_key: Mapped[str] = mapped_column(String, nullable=False, default="")
+    content_type: Mapped[str] = mapped_column(String, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
@@ -1,25 +1,297 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import (
+    Integer,
+    String,
+    Row,
+    select,
+    update,
+    delete,
+    func,
+    tuple_,
+    any_,
+    bindparam,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from models.image import ImageModel
+from models.stored_object import StoredObjectModel
+from models.rendition import RenditionModel
 from schemas.image import ImageCreate
-from typing import Optional
+from utils.invalidation import invalidation_notice
+from typing import Dict, List, Optional, Sequence, Tuple
+from datetime import datetime
 from dataclasses import dataclass
 
+# Запросы горячих путей собираются один раз: конструкция и ключ кэша
+# не пересчитываются на каждый вызов, SQL берется из кэша компиляции
+# движка (DB_QUERY_CACHE_SIZE), подготовленный запрос - из кэша
+# соединения asyncpg (DB_PREPARED_STATEMENT_CACHE_SIZE)
+_IMAGE_BY_ID = select(ImageModel).where(ImageModel.id == bindparam("image_id"))
+_OWNED_IMAGE_BY_ID = _IMAGE_BY_ID.where(ImageModel.owner_id == bindparam("owner_id"))
+_IMAGE_ROW_BY_ID = select(*ImageModel.__table__.c).where(
+    ImageModel.id == bindparam("image_id")
+)
+
 
 @dataclass
 class ImageRepository:
     session: AsyncSession
 
     async def create_image(self, image_data: ImageCreate) -> ImageModel:
-        image = ImageModel(**image_data.model_dump())
-        async with self.session:
-            self.session.add(image)
-            await self.session.commit()
-            await self.session.refresh(image)
-            return image
-
-    async def get_image_by_id(self, image_id: int) -> Optional[ImageModel]:
+        # id и created_at приходят из RETURNING, отдельный refresh не нужен
+        (image,) = await self.create_images([image_data])
+        await self.session.commit()
+        return image
+
+    async def create_images(self, images: List[ImageCreate]) -> List[ImageModel]:
+        """
+        Один многострочный INSERT ... RETURNING для всех строк, порядок
+        результата совпадает с порядком входных данных. Не делает commit.
+        """
+        result = await self.session.scalars(
+            insert(ImageModel).returning(ImageModel, sort_by_parameter_order=True),
+            [image.model_dump() for image in images],
+        )
+        return list(result)
+
+    async def get_image_by_id(
+        self, image_id: int, owner_id: Optional[int] = None
+    ) -> Optional[ImageModel]:
+        """owner_id=None - без проверки владельца (суперпользователь, сервисы)."""
+        if owner_id is None:
+            result = await self.session.execute(_IMAGE_BY_ID, {"image_id": image_id})
+        else:
+            result = await self.session.execute(
+                _OWNED_IMAGE_BY_ID, {"image_id": image_id, "owner_id": owner_id}
+            )
+        return result.scalar_one_or_none()
+
+    async def get_image_row(self, image_id: int) -> Optional[Row]:
+        """
+        Строка imagemodels без ORM: запрос выполняется на соединении сессии,
+        минуя ORM-обработку execute, экземпляр модели не создается.
+        Только для чтения - например, для ImageResponse.model_validate.
+        """
+        connection = await self.session.connection()
+        result = await connection.execute(_IMAGE_ROW_BY_ID, {"image_id": image_id})
+        return result.first()
+
+    async def find_uploaded_image(
+        self,
+        owner_id: Optional[int],
+        source_hash: str,
+        compression_params: Optional[str],
+        created_after: datetime,
+    ) -> Optional[ImageModel]:
+        """
+        Изображение, уже сохраненное из тех же байт с теми же параметрами
+        после created_after. Повтор задачи после сбоя между сохранением
+        изображения и отметкой задачи не создает вторую запись.
+        """
+        result = await self.session.scalars(
+            select(ImageModel)
+            .where(
+                ImageModel.source_hash == source_hash,
+                ImageModel.owner_id.is_not_distinct_from(owner_id),
+                ImageModel.compression_params.is_not_distinct_from(
+                    compression_params
+                ),
+                ImageModel.created_at >= created_after,
+            )
+            .order_by(ImageModel.id)
+            .limit(1)
+        )
+        return result.first()
+
+    async def list_images(
+        self,
+        limit: int,
+        owner_id: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> List[ImageModel]:
+        """
+        Страница от новых к старым. Keyset по (created_at, id) вместо OFFSET:
+        стоимость не зависит от номера страницы, индекс читается с позиции курсора.
+        owner_id=None - изображения всех пользователей.
+        """
+        query = select(ImageModel)
+        if owner_id is not None:
+            query = query.where(ImageModel.owner_id == owner_id)
+        if after is not None:
+            query = query.where(
+                tuple_(ImageModel.created_at, ImageModel.id) < tuple_(*after)
+            )
+        result = await self.session.scalars(
+            query.order_by(ImageModel.created_at.desc(), ImageModel.id.desc()).limit(
+                limit
+            )
+        )
+        return list(result)
+
+    async def get_images_by_ids(
+        self, ids: Sequence[int], owner_id: Optional[int] = None
+    ) -> List[ImageModel]:
+        """
+        Один запрос WHERE id = ANY(:ids): массив передается одним параметром,
+        поэтому текст запроса не зависит от числа id.
+        """
+        query = select(ImageModel).where(
+            ImageModel.id == any_(bindparam("ids", list(ids), type_=ARRAY(Integer)))
+        )
+        if owner_id is not None:
+            query = query.where(ImageModel.owner_id == owner_id)
+        result = await self.session.scalars(query)
+        return list(result)
+
+    async def find_stored_objects(
+        self, source_hashes: Sequence[str], params_key: str
+    ) -> Dict[str, StoredObjectModel]:
+        """
+        Уже обработанные объекты по хэшам исходников с одними параметрами:
+        один запрос source_hash = ANY(:hashes), как в get_images_by_ids.
+        Строки не блокируются - ссылку берет acquire_stored_object.
+        """
+        result = await self.session.scalars(
+            select(StoredObjectModel).where(
+                StoredObjectModel.source_hash
+                == any_(
+                    bindparam("hashes", list(source_hashes), type_=ARRAY(String))
+                ),
+                StoredObjectModel.params_key == params_key,
+                StoredObjectModel.ref_count > 0,
+            )
+        )
+        return {obj.source_hash: obj for obj in result}
+
+    async def acquire_stored_object(
+        self, source_hash: str, params_key: str, count: int = 1
+    ) -> Optional[StoredObjectModel]:
+        """
+        Увеличивает счетчик ссылок на уже обработанный объект на count.
+        Строка блокируется до commit, поэтому параллельное удаление
+        не освободит объект, который сейчас переиспользуется.
+        """
         result = await self.session.execute(
-            select(ImageModel).where(ImageModel.id == image_id)
+            update(StoredObjectModel)
+            .where(
+                StoredObjectModel.source_hash == source_hash,
+                StoredObjectModel.params_key == params_key,
+                StoredObjectModel.ref_count > 0,
+            )
+            .values(ref_count=StoredObjectModel.ref_count + count)
+            .returning(StoredObjectModel)
         )
         return result.scalar_one_or_none()
+
+    async def register_stored_object(
+        self,
+        object_name: str,
+        source_hash: str,
+        params_key: str,
+        content_type: str,
+        size: int,
+    ) -> StoredObjectModel:
+        """
+        Регистрирует новый объект. Если такую же загрузку параллельно
+        успели зарегистрировать, возвращает существующий объект
+        с увеличенным счетчиком - вызывающий код удалит свою копию.
+        """
+        result = await self.session.execute(
+            insert(StoredObjectModel)
+            .values(
+                object_name=object_name,
+                source_hash=source_hash,
+                params_key=params_key,
+                content_type=content_type,
+                size=size,
+                ref_count=1,
+            )
+            .on_conflict_do_update(
+                constraint="uq_storedobjectmodels_source",
+                set_={"ref_count": StoredObjectModel.ref_count + 1},
+            )
+            .returning(StoredObjectModel)
+        )
+        return result.scalar_one()
+
+    async def register_stored_objects(
+        self, objects: List[dict]
+    ) -> Dict[Tuple[str, str], StoredObjectModel]:
+        """
+        Пакетный вариант register_stored_object: ref_count каждой строки
+        прибавляется к существующему объекту при конфликте. Не делает commit.
+        """
+        if not objects:
+            return {}
+        stmt = insert(StoredObjectModel)
+        result = await self.session.scalars(
+            stmt.on_conflict_do_update(
+                constraint="uq_storedobjectmodels_source",
+                set_={"ref_count": StoredObjectModel.ref_count + stmt.excluded.ref_count},
+            ).returning(StoredObjectModel),
+            objects,
+        )
+        return {(obj.source_hash, obj.params_key): obj for obj in result}
+
+    async def create_renditions(self, renditions: List[dict]) -> None:
+        """Записи версий-пресетов мастера. Не делает commit."""
+        if renditions:
+            await self.session.execute(
+                insert(RenditionModel).on_conflict_do_nothing(), renditions
+            )
+
+    async def get_renditions(self, master_object_name: str) -> List[RenditionModel]:
+        result = await self.session.scalars(
+            select(RenditionModel).where(
+                RenditionModel.master_object_name == master_object_name
+            )
+        )
+        return list(result)
+
+    async def delete_image(self, image: ImageModel) -> int:
+        """
+        Удаляет строку и возвращает число оставшихся ссылок на ее объект.
+        0 - объект можно удалять из хранилища.
+        """
+        image_id, object_name = image.id, image.minio_object_name
+        await self.session.delete(image)
+
+        result = await self.session.execute(
+            update(StoredObjectModel)
+            .where(StoredObjectModel.object_name == object_name)
+            .values(ref_count=StoredObjectModel.ref_count - 1)
+            .returning(StoredObjectModel.ref_count)
+        )
+        remaining = result.scalar_one_or_none()
+        if remaining is None:
+            # Объект загружен до появления дедупликации - считаем строки
+            await self.session.flush()
+            remaining = await self.session.scalar(
+                select(func.count())
+                .select_from(ImageModel)
+                .where(ImageModel.minio_object_name == object_name)
+            )
+        elif remaining <= 0:
+            await self.session.execute(
+                delete(StoredObjectModel).where(
+                    StoredObjectModel.object_name == object_name,
+                    StoredObjectModel.ref_count <= 0,
+                )
+            )
+        if remaining <= 0:
+            await self.session.execute(
+                delete(RenditionModel).where(
+                    RenditionModel.master_object_name == object_name
+                )
+            )
+
+        # Кэши всех воркеров сбрасываются после commit удаления
+        await self.session.execute(
+            invalidation_notice(
+                "image",
+                id=image_id,
+                object_name=object_name,
+                object_deleted=remaining <= 0,
+            )
+        )
+        await self.session.commit()
+        return remaining
@@ -0,0 +1,183 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, text
+from models.job import (
+    JobModel,
+    JOB_AWAITING_UPLOAD,
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_UPLOADING,
+)
+from schemas.job import JobCreate
+from typing import List, Optional
+from datetime import timedelta
+from dataclasses import dataclass
+
+
+def _utc_now():
+    # Время БД, а не воркера: часы процессов на разных машинах расходятся
+    return func.timezone("utc", func.now())
+
+
+@dataclass
+class JobRepository:
+    session: AsyncSession
+
+    async def create_job(
+        self, job_data: JobCreate, status: str = JOB_QUEUED, delay: float = 0.0
+    ) -> JobModel:
+        job = JobModel(
+            **job_data.model_dump(),
+            status=status,
+            run_at=_utc_now() + timedelta(seconds=delay),
+        )
+        self.session.add(job)
+        await self.session.commit()
+        await self.session.refresh(job)
+        return job
+
+    async def get_job_by_id(self, job_id: int) -> Optional[JobModel]:
+        result = await self.session.execute(
+            select(JobModel).where(JobModel.id == job_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def claim_job(self, lease: float, max_attempts: int) -> Optional[JobModel]:
+        """
+        Забирает одну готовую к запуску задачу: UPDATE по подзапросу
+        FOR UPDATE SKIP LOCKED, поэтому воркеры не ждут друг друга
+        и не получают одну задачу дважды. Сразу делает commit - блокировка
+        не держится на время обработки, задачу защищает аренда (run_at).
+        Задачи, исчерпавшие max_attempts, не выдаются - их закрывает
+        fail_exhausted_jobs.
+        """
+        now = _utc_now()
+        candidate = (
+            select(JobModel.id)
+            .where(
+                text(JOB_PENDING),
+                JobModel.run_at <= now,
+                JobModel.attempts < max_attempts,
+            )
+            .order_by(JobModel.run_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await self.session.execute(
+            update(JobModel)
+            .where(JobModel.id == candidate)
+            .values(
+                status=JOB_RUNNING,
+                attempts=JobModel.attempts + 1,
+                run_at=now + timedelta(seconds=lease),
+            )
+            .returning(JobModel)
+        )
+        job = result.scalar_one_or_none()
+        await self.session.commit()
+        return job
+
+    async def fail_exhausted_jobs(self, max_attempts: int) -> List[JobModel]:
+        """
+        Переводит в failed задачи, у которых истекла аренда последней
+        попытки: воркер упал или завис, повторять задачу больше нельзя.
+        """
+        result = await self.session.execute(
+            update(JobModel)
+            .where(
+                text(JOB_PENDING),
+                JobModel.run_at <= _utc_now(),
+                JobModel.attempts >= max_attempts,
+            )
+            .values(
+                status=JOB_FAILED,
+                error=f"Job did not finish after {max_attempts} attempts",
+            )
+            .returning(JobModel)
+        )
+        jobs = list(result.scalars())
+        await self.session.commit()
+        return jobs
+
+    async def expire_uploads(self) -> List[JobModel]:
+        """
+        Переводит в failed прямые загрузки, не подтвержденные до run_at:
+        ссылка на загрузку истекла, клиент задачу уже не завершит.
+        """
+        result = await self.session.execute(
+            update(JobModel)
+            .where(text(JOB_AWAITING_UPLOAD), JobModel.run_at <= _utc_now())
+            .values(status=JOB_FAILED, error="Upload was not completed in time")
+            .returning(JobModel)
+        )
+        jobs = list(result.scalars())
+        await self.session.commit()
+        return jobs
+
+    async def _update_claimed(self, job: JobModel, **values) -> Optional[JobModel]:
+        # attempts отличает текущую аренду от повторной выдачи той же задачи:
+        # воркер, у которого истекла аренда, не перезапишет чужой результат
+        result = await self.session.execute(
+            update(JobModel)
+            .where(
+                JobModel.id == job.id,
+                JobModel.status == JOB_RUNNING,
+                JobModel.attempts == job.attempts,
+            )
+            .values(**values)
+            .returning(JobModel)
+        )
+        updated = result.scalar_one_or_none()
+        await self.session.commit()
+        return updated
+
+    async def finish_job(
+        self,
+        job: JobModel,
+        status: str,
+        image_id: Optional[int] = None,
+        error: Optional[str] = None,
+    ) -> Optional[JobModel]:
+        return await self._update_claimed(
+            job, status=status, image_id=image_id, error=error
+        )
+
+    async def retry_job(
+        self, job: JobModel, delay: float, error: Optional[str] = None
+    ) -> Optional[JobModel]:
+        return await self._update_claimed(
+            job,
+            status=JOB_QUEUED,
+            run_at=_utc_now() + timedelta(seconds=delay),
+            error=error,
+        )
+
+    async def release_job(self, job: JobModel) -> Optional[JobModel]:
+        """Возвращает прерванную задачу в очередь без учета попытки."""
+        return await self._update_claimed(
+            job,
+            status=JOB_QUEUED,
+            run_at=_utc_now(),
+            attempts=JobModel.attempts - 1,
+        )
+
+    async def _update_uploading(self, job: JobModel, **values) -> Optional[JobModel]:
+        # Повторное подтверждение той же загрузки ничего не меняет
+        result = await self.session.execute(
+            update(JobModel)
+            .where(JobModel.id == job.id, JobModel.status == JOB_UPLOADING)
+            .values(**values)
+            .returning(JobModel)
+        )
+        updated = result.scalar_one_or_none()
+        await self.session.commit()
+        return updated
+
+    async def queue_uploaded_job(self, job: JobModel) -> Optional[JobModel]:
+        """Прямая загрузка завершена: задача становится доступной воркерам."""
+        return await self._update_uploading(job, status=JOB_QUEUED, run_at=_utc_now())
+
+    async def reject_upload(self, job: JobModel, error: str) -> Optional[JobModel]:
+        return await self._update_uploading(job, status=JOB_FAILED, error=error)
@@ -0,0 +1,15 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert
+from models.log import LogModel
+from typing import List
+from dataclasses import dataclass
+
+
+@dataclass
+class LogRepository:
+    session: AsyncSession
+
+    async def bulk_insert(self, records: List[dict]) -> None:
+        # Один многострочный INSERT на пачку (executemany asyncpg)
+        await self.session.execute(insert(LogModel), records)
+        await self.session.commit()
@@ -1,39 +1,58 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import Row, bindparam, select
 from models.user import UserModel
 from schemas.user import UserCreate
 from typing import Optional
 from dataclasses import dataclass
 
+# Собираются один раз, см. image_repo
+_USER_BY_ID = select(UserModel).where(UserModel.id == bindparam("user_id"))
+_USER_BY_USERNAME = select(UserModel).where(
+    UserModel.username == bindparam("username")
+)
+_USER_BY_EMAIL = select(UserModel).where(UserModel.email == bindparam("email"))
+_USER_ROW_BY_ID = select(*UserModel.__table__.c).where(
+    UserModel.id == bindparam("user_id")
+)
+
 
 @dataclass
 class UserRepository:
     session: AsyncSession
 
     async def get_by_id(self, user_id: int) -> Optional[UserModel]:
-        result = await self.session.execute(
-            select(UserModel).where(UserModel.id == user_id)
-        )
+        result = await self.session.execute(_USER_BY_ID, {"user_id": user_id})
         return result.scalar_one_or_none()
 
+    async def get_user_row(self, user_id: int) -> Optional[Row]:
+        """Строка usermodels без ORM, только для чтения, см. get_image_row."""
+        connection = await self.session.connection()
+        result = await connection.execute(_USER_ROW_BY_ID, {"user_id": user_id})
+        return result.first()
+
     async def get_by_username(self, username: str) -> Optional[UserModel]:
-        # async with self.session() as session:
-        result = await self.session.execute(
-            select(UserModel).where(UserModel.username == username)
-        )
+        result = await self.session.execute(_USER_BY_USERNAME, {"username": username})
         return result.scalar_one_or_none()
 
     async def get_by_email(self, email: str) -> Optional[UserModel]:
-        result = await self.session.execute(
-            select(UserModel).where(UserModel.email == email)
-        )
+        result = await self.session.execute(_USER_BY_EMAIL, {"email": email})
         return result.scalar_one_or_none()
 
-    async def create(self, user_data: UserCreate) -> UserModel:
-        user = UserModel(username=user_data.username, email=user_data.email)
-        user.set_password(user_data.password)
+    async def create(self, user_data: UserCreate, hashed_password: str) -> UserModel:
+        # Пароль хэшируется заранее, вне event loop
+        user = UserModel(
+            username=user_data.username,
+            email=user_data.email,
+            hashed_password=hashed_password,
+        )
 
         self.session.add(user)
         await self.session.commit()
         await self.session.refresh(user)
         return user
+
+    async def update_password_hash(self, user: UserModel, hashed_password: str) -> None:
+        # UPDATE ... WHERE id через ORM: событие after_update сбрасывает
+        # кэши пользователя, в том числе в других воркерах
+        user.hashed_password = hashed_password
+        await self.session.commit()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -9,12 +9,62 @@ class ImageCompressionParams(BaseModel):
     y: Optional[int] = Field(None, gt=0)
 
 
+PRESET_FITS = {"crop": "cover", "cover": "cover", "contain": "contain", "fill": "fill"}
+
+
+class RenditionParams(BaseModel):
+    w: Optional[int] = Field(None, gt=0, le=4096)
+    h: Optional[int] = Field(None, gt=0, le=4096)
+    q: int = Field(85, ge=1, le=100)
+    fit: Literal["contain", "cover", "fill"] = "contain"
+
+    def to_processing_params(self) -> dict:
+        params = {"quality": self.q, "fit": self.fit}
+        if self.w:
+            params["x"] = self.w
+        if self.h:
+            params["y"] = self.h
+        return params
+
+    def resizes(self) -> bool:
+        return bool(self.w or self.h)
+
+    @classmethod
+    def from_spec(cls, spec: str) -> "RenditionParams":
+        """
+        Разбор пресета из настроек: "150x150 crop", "600w q70", "400h".
+        Неизвестные части - ValueError.
+        """
+        values = {}
+        for part in spec.lower().split():
+            if part in PRESET_FITS:
+                values["fit"] = PRESET_FITS[part]
+            elif part.startswith("q") and part[1:].isdigit():
+                values["q"] = int(part[1:])
+            elif part.endswith("w") and part[:-1].isdigit():
+                values["w"] = int(part[:-1])
+            elif part.endswith("h") and part[:-1].isdigit():
+                values["h"] = int(part[:-1])
+            elif "x" in part and part.replace("x", "", 1).isdigit():
+                width, height = part.split("x")
+                values["w"], values["h"] = int(width), int(height)
+            else:
+                raise ValueError(f"Invalid preset part {part!r} in {spec!r}")
+        return cls(**values)
+
+    def object_suffix(self) -> str:
+        # Детерминированная часть ключа: одинаковые параметры - один объект
+        return f"{self.w or 0}x{self.h or 0}_q{self.q}_{self.fit}"
+
+
 class ImageCreate(BaseModel):
     original_filename: str
     content_type: str
     size: int
     minio_object_name: str
     compression_params: Optional[str] = None
+    source_hash: Optional[str] = None
+    owner_id: Optional[int] = None
 
 
 class ImageResponse(BaseModel):
@@ -24,6 +74,8 @@ class ImageResponse(BaseModel):
     size: int
     minio_object_name: str
     compression_params: Optional[str] = None
+    source_hash: Optional[str] = None
+    owner_id: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
@@ -31,7 +83,33 @@ class ImageResponse(BaseModel):
         from_attributes = True
 
 
+class RenditionInfo(BaseModel):
+    preset: str
+    content_type: str
+    object_name: str
+    width: int
+    height: int
+    size: int
+
+    class Config:
+        from_attributes = True
+
+
 class ImageUploadResponse(BaseModel):
     id: int
     message: str
     minio_object_name: str
+
+
+class ImageListResponse(BaseModel):
+    items: List[ImageResponse]
+    next_cursor: Optional[str] = None
+
+
+class ImageMetadataRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1)
+
+
+class ImageMetadataResponse(BaseModel):
+    items: List[ImageResponse]
+    missing: List[int]
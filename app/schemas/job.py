@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field
+from schemas.image import ImageCompressionParams
+from typing import Optional
+from datetime import datetime
+
+
+class JobCreate(BaseModel):
+    owner_id: Optional[int] = None
+    raw_object_name: str
+    original_filename: str
+    compression_params: Optional[str] = None
+    source_hash: Optional[str] = None
+    callback_url: Optional[str] = None
+
+
+class JobResponse(BaseModel):
+    id: int
+    status: str
+    attempts: int
+    image_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class DirectUploadRequest(ImageCompressionParams):
+    filename: str = Field(..., min_length=1)
+    callback_url: Optional[str] = None
+
+
+class DirectUploadResponse(JobResponse):
+    # Клиент загружает файл PUT-запросом по upload_url, затем вызывает
+    # POST /api/jobs/{id}/complete
+    upload_url: str
+    upload_method: str = "PUT"
+    expires_in: int
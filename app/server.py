@@ -0,0 +1,238 @@
+"""
+Запуск сервера: один процесс или лаунчер с несколькими воркерами.
+
+Воркеры слушают один порт через SO_REUSEPORT, ядро распределяет между
+ними соединения. Каждый воркер сам создает пул БД, клиент хранилища и
+пул обработки изображений в хуках on_startup.
+
+Сигналы лаунчеру:
+    SIGTERM, SIGINT - плавная остановка всех воркеров;
+    SIGHUP - поочередная перезагрузка: новый воркер запускается до
+    остановки старого, поэтому порт не остается без обработчиков.
+"""
+
+from aiohttp import web
+from config import settings
+from multiprocessing.connection import wait
+from typing import Dict, List, Optional
+from utils.logging import logger
+from utils.metrics import retire_snapshot
+import asyncio
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import time
+
+# Воркер запускается в чистом интерпретаторе: у лаунчера есть потоки
+# (логирование), а fork с потоками небезопасен
+mp = multiprocessing.get_context("spawn")
+
+MAX_RESTART_DELAY = 30.0
+
+
+def install_uvloop() -> None:
+    if not settings.WEB_USE_UVLOOP:
+        return
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("uvloop is not installed, using default event loop")
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+async def serve(reuse_port: bool = False, ready=None) -> None:
+    """Запускает приложение в текущем процессе до SIGTERM/SIGINT."""
+    from main import create_app
+
+    app = await create_app()
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    site = web.TCPSite(
+        runner,
+        settings.WEB_HOST,
+        settings.WEB_PORT,
+        reuse_port=reuse_port or None,
+        shutdown_timeout=settings.WEB_SHUTDOWN_TIMEOUT,
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    if ready is None:
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+
+    try:
+        await site.start()
+        logger.info(
+            f"Worker {os.getpid()} listening on {settings.WEB_HOST}:{settings.WEB_PORT}"
+        )
+        if ready is not None:
+            ready.set()
+        await stop.wait()
+    finally:
+        # Новые соединения не принимаются, активные запросы дорабатывают
+        await runner.cleanup()
+        logger.info(f"Worker {os.getpid()} stopped")
+
+
+def worker_main(ready) -> None:
+    # Ctrl+C получает вся группа процессов, остановкой управляет лаунчер
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    install_uvloop()
+    asyncio.run(serve(reuse_port=True, ready=ready))
+
+
+class Launcher:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.restart_delay = settings.WEB_RESTART_DELAY
+        self.stopping = False
+        self.reload_requested = False
+        self.last_restart: Optional[float] = None
+        self.metrics_dir: Optional[str] = None
+        self.own_metrics_dir = False
+
+    def _setup_metrics_dir(self) -> None:
+        if settings.METRICS_DIR:
+            self.metrics_dir = settings.METRICS_DIR
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            # Снимки прошлого запуска не относятся к текущим процессам
+            for name in os.listdir(self.metrics_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.metrics_dir, name))
+        else:
+            self.metrics_dir = tempfile.mkdtemp(prefix="metrics-")
+            self.own_metrics_dir = True
+        # Воркеры читают настройки из окружения при запуске
+        os.environ["METRICS_DIR"] = self.metrics_dir
+
+    def spawn(self) -> multiprocessing.Process:
+        ready = mp.Event()
+        process = mp.Process(target=worker_main, args=(ready,), daemon=False)
+        process.start()
+        process.ready = ready
+        self.processes[process.sentinel] = process
+        return process
+
+    def _reap(self, process: multiprocessing.Process) -> None:
+        process.join()
+        self.processes.pop(process.sentinel, None)
+        try:
+            retire_snapshot(self.metrics_dir, process.pid)
+        except OSError as e:
+            logger.warning(f"Failed to retire metrics of worker {process.pid}: {e}")
+
+    def stop_worker(self, process: multiprocessing.Process) -> None:
+        if process.is_alive():
+            process.terminate()  # SIGTERM - плавная остановка
+        process.join(settings.WEB_SHUTDOWN_TIMEOUT + 5)
+        if process.is_alive():
+            logger.warning(f"Worker {process.pid} did not stop in time, killing")
+            process.kill()
+        self._reap(process)
+
+    def reload(self) -> None:
+        """Поочередная замена воркеров: сначала новый готов, затем старый уходит."""
+        logger.info("Rolling reload started")
+        for old in list(self.processes.values()):
+            if self.stopping:
+                return
+            new = self.spawn()
+            if not self._wait_ready(new):
+                # Новый код не стартует - старые воркеры продолжают работу
+                logger.error(f"Worker {new.pid} failed to start, reload aborted")
+                self.stop_worker(new)
+                return
+            self.stop_worker(old)
+        logger.info("Rolling reload finished")
+
+    def _wait_ready(self, process: multiprocessing.Process) -> bool:
+        deadline = time.monotonic() + settings.WEB_READY_TIMEOUT
+        while time.monotonic() < deadline and process.is_alive():
+            if process.ready.wait(0.5):
+                return True
+        return False
+
+    def _sleep(self, delay: float) -> None:
+        deadline = time.monotonic() + delay
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+    def _handle_exit(self, signum, frame) -> None:
+        self.stopping = True
+
+    def _handle_reload(self, signum, frame) -> None:
+        self.reload_requested = True
+
+    def _wait_for_workers(self, timeout: float) -> List[multiprocessing.Process]:
+        try:
+            sentinels = wait(list(self.processes), timeout)
+        except InterruptedError:
+            return []
+        return [self.processes[sentinel] for sentinel in sentinels]
+
+    def run(self) -> None:
+        self._setup_metrics_dir()
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        signal.signal(signal.SIGINT, self._handle_exit)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        logger.info(f"Starting {self.workers} workers, launcher pid {os.getpid()}")
+        for _ in range(self.workers):
+            self.spawn()
+
+        try:
+            while not self.stopping:
+                if self.reload_requested:
+                    self.reload_requested = False
+                    self.reload()
+                    continue
+
+                for process in self._wait_for_workers(timeout=1.0):
+                    self._reap(process)
+                    if self.stopping:
+                        break
+                    logger.error(
+                        f"Worker {process.pid} exited with code {process.exitcode}, "
+                        f"restarting in {self.restart_delay:.1f}s"
+                    )
+                    self._sleep(self.restart_delay)
+                    if self.stopping:
+                        break
+                    self.spawn()
+                    # Частые падения - пауза растет, после стабильной работы сбрасывается
+                    self.restart_delay = min(self.restart_delay * 2, MAX_RESTART_DELAY)
+                    self.last_restart = time.monotonic()
+
+                if (
+                    self.last_restart is not None
+                    and time.monotonic() - self.last_restart > MAX_RESTART_DELAY
+                ):
+                    self.restart_delay = settings.WEB_RESTART_DELAY
+                    self.last_restart = None
+        finally:
+            logger.info("Stopping workers")
+            for process in list(self.processes.values()):
+                if process.is_alive():
+                    process.terminate()
+            for process in list(self.processes.values()):
+                self.stop_worker(process)
+            if self.own_metrics_dir:
+                shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+
+def run() -> None:
+    workers = settings.web_workers
+    if workers == 1:
+        install_uvloop()
+        asyncio.run(serve())
+    else:
+        Launcher(workers).run()
+
+
+if __name__ == "__main__":
+    run()
@@ -1,22 +1,26 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from repositories.user_repo import UserRepository
-from schemas.user import UserCreate
+from services.cache_service import AuthCache
+from utils.passwords import PasswordHasher
+from schemas.user import UserCreate, UserInDB
 from models.user import UserModel
 from schemas.token import TokenPayload
 from config import settings
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from aiohttp import web
-import aiohttp
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+import hashlib
+import time
 
 
 @dataclass
 class AuthService:
     user_repo: UserRepository
+    cache: Optional[AuthCache] = None
+    hasher: PasswordHasher = field(default_factory=PasswordHasher)
+    # Фабрика коротких сессий для загрузки пользователя при промахе кэша
+    sessionmaker: Optional[object] = None
 
     def create_access_token(
         self, subject: int, expires_delta: Optional[timedelta] = None
@@ -38,26 +42,79 @@ class AuthService:
         self, username: str, password: str
     ) -> Optional[UserModel]:
         user = await self.user_repo.get_by_username(username)
-        if not user or not user.verify_password(password):
+        # Чтение закончено: соединение возвращается в пул на время bcrypt
+        # (expire_on_commit=False - атрибуты user остаются доступны)
+        await self.user_repo.session.commit()
+        if not user:
+            await self.hasher.dummy_verify()
             return None
-        return user
 
-    async def get_current_user(self, request: web.Request) -> UserModel:
-        token = self.extract_token_from_request(request)
-        if not token:
-            raise web.HTTPUnauthorized(reason="Not authenticated")
+        valid, new_hash = await self.hasher.verify_and_update(
+            password, user.hashed_password
+        )
+        if not valid:
+            return None
+        if new_hash:
+            # Стоимость хэша отличается от BCRYPT_ROUNDS - пересчитываем прозрачно,
+            # отдельной короткой транзакцией UPDATE по id
+            await self.user_repo.update_password_hash(user, new_hash)
+        return user
 
+    def _decode_token(self, token: str) -> Tuple[int, Optional[int]]:
         try:
             payload = jwt.decode(
                 token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
             )
             token_data = TokenPayload(**payload)
-        except JWTError:
+        except (JWTError, ValueError):
+            raise web.HTTPUnauthorized(reason="Invalid token")
+        if token_data.sub is None:
             raise web.HTTPUnauthorized(reason="Invalid token")
+        return token_data.sub, payload.get("exp")
 
-        user = await self.user_repo.get_by_id(int(token_data.sub))
-        if not user:
-            raise web.HTTPUnauthorized(reason="User not found")
+    async def _get_user_id(self, token: str) -> int:
+        if self.cache is None:
+            user_id, _ = self._decode_token(token)
+            return user_id
+
+        digest = hashlib.sha256(token.encode()).digest()
+        user_id = self.cache.tokens.get(digest)
+        if user_id is None:
+            user_id, expires_at = self._decode_token(token)
+            ttl = settings.AUTH_TOKEN_CACHE_TTL
+            if expires_at is not None:
+                # Токен не должен пережить свой exp в кэше
+                ttl = min(ttl, expires_at - time.time())
+            self.cache.tokens.set(digest, user_id, ttl=ttl)
+        return user_id
+
+    async def _load_user_row(self, user_id: int):
+        if self.sessionmaker is None:
+            return await self.user_repo.get_user_row(user_id)
+        # Собственная сессия, как в ImageCache: транзакция сессии запроса
+        # не остается открытой на все время обработчика
+        async with self.sessionmaker() as session:
+            return await UserRepository(session=session).get_user_row(user_id)
+
+    async def get_current_user(self, request: web.Request) -> UserInDB:
+        # Пользователя уже проверил auth_middleware
+        if "user" in request:
+            return request["user"]
+
+        token = self.extract_token_from_request(request)
+        if not token:
+            raise web.HTTPUnauthorized(reason="Not authenticated")
+
+        user_id = await self._get_user_id(token)
+
+        user = self.cache.users.get(user_id) if self.cache is not None else None
+        if user is None:
+            row = await self._load_user_row(user_id)
+            if not row:
+                raise web.HTTPUnauthorized(reason="User not found")
+            user = UserInDB.model_validate(row)
+            if self.cache is not None:
+                self.cache.users.set(user_id, user)
 
         return user
 
@@ -80,4 +137,5 @@ class AuthService:
         if existing_email:
             raise web.HTTPConflict(reason="Email already registered")
 
-        return await self.user_repo.create(user_data)
+        hashed_password = await self.hasher.hash(user_data.password)
+        return await self.user_repo.create(user_data, hashed_password)
@@ -0,0 +1,138 @@
+from services.cache_service import AuthCache, ImageCache
+from services.rendition_service import RenditionService
+from utils.invalidation import CHANNEL
+from utils.logging import logger
+from utils.metrics import registry
+from config import settings
+from aiohttp import web
+from typing import Optional
+import asyncio
+import asyncpg
+import json
+
+invalidations = registry.counter(
+    "cache_invalidations_total",
+    "Уведомления о сбросе кэшей, полученные из PostgreSQL",
+    ("kind",),
+)
+listener_reconnects = registry.counter(
+    "cache_invalidation_reconnects_total",
+    "Переподключения слушателя уведомлений; кэши при этом очищаются",
+)
+
+RECONNECT_MAX_DELAY = 30.0
+
+
+class CacheInvalidationListener:
+    """
+    Сброс кэшей процесса по изменениям, сделанным в других воркерах и на
+    других узлах: изменение публикует pg_notify в своей транзакции
+    (utils/invalidation.py), каждый процесс слушает канал на отдельном
+    соединении вне пула. Уведомления, пришедшие без соединения, теряются,
+    поэтому после каждого (пере)подключения кэши очищаются целиком.
+    """
+
+    def __init__(
+        self,
+        image_cache: Optional[ImageCache],
+        renditions: Optional[RenditionService],
+        auth_cache: Optional[AuthCache] = None,
+    ):
+        self.image_cache = image_cache
+        self.renditions = renditions
+        self.auth_cache = auth_cache
+        self._task: Optional[asyncio.Task] = None
+
+    def clear(self) -> None:
+        if self.image_cache is not None:
+            self.image_cache.clear()
+        if self.renditions is not None:
+            self.renditions.clear()
+        if self.auth_cache is not None:
+            # Токены не зависят от изменений пользователя, только записи users
+            self.auth_cache.users.clear()
+
+    def apply(self, message: dict) -> None:
+        kind = message.get("kind")
+        if kind == "image":
+            object_name = message["object_name"]
+            if self.image_cache is not None:
+                self.image_cache.invalidate_metadata(message["id"])
+            if message.get("object_deleted"):
+                if self.image_cache is not None:
+                    self.image_cache.invalidate_payload(object_name)
+                    self.image_cache.invalidate_renditions(object_name)
+                if self.renditions is not None:
+                    self.renditions.forget(object_name)
+        elif kind == "user":
+            if self.auth_cache is not None:
+                self.auth_cache.invalidate_user(message["id"])
+        else:
+            return
+        invalidations.labels(kind).inc()
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            self.apply(json.loads(payload))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(
+                f"Malformed cache invalidation {payload!r}: {e}",
+                extra={"route": "cache", "functionName": "_on_notify"},
+            )
+
+    async def _listen(self) -> None:
+        connection = await asyncpg.connect(
+            host=settings.DB_HOST,
+            port=int(settings.DB_PORT),
+            user=settings.DB_USER,
+            password=settings.DB_PASSWORD,
+            database=settings.DB_NAME,
+        )
+        try:
+            lost = asyncio.get_running_loop().create_future()
+            connection.add_termination_listener(
+                lambda _: lost.done() or lost.set_result(None)
+            )
+            await connection.add_listener(CHANNEL, self._on_notify)
+            # Изменения, сделанные до подписки, могли не дойти
+            self.clear()
+            await lost
+        finally:
+            await connection.close()
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                await self._listen()
+                delay = 1.0
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning(
+                    f"Cache invalidation listener failed: {e}",
+                    extra={"route": "cache", "functionName": "_run"},
+                )
+            listener_reconnects.inc()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def start(self) -> "CacheInvalidationListener":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+async def init_cache_invalidation(app: web.Application) -> None:
+    if settings.CACHE_INVALIDATION_ENABLED:
+        app["cache_invalidation"] = CacheInvalidationListener(
+            app["image_cache"], app["rendition_service"], app["auth_cache"]
+        ).start()
+
+
+async def close_cache_invalidation(app: web.Application) -> None:
+    if "cache_invalidation" in app:
+        await app["cache_invalidation"].close()
@@ -0,0 +1,167 @@
+from repositories.image_repo import ImageRepository
+from services.storage_base import Storage
+from schemas.image import ImageResponse, RenditionInfo
+from models.user import UserModel
+from utils.cache import LRUCache
+from utils.singleflight import SingleFlight
+from utils.invalidation import invalidation_notice
+from config import settings
+from dataclasses import dataclass, field
+from aiohttp import web
+from typing import List, Optional
+from sqlalchemy import event
+import weakref
+
+
+@dataclass
+class ImageCache:
+    """
+    Горячий кэш перед БД и хранилищем: метаданные изображений и содержимое
+    небольших объектов. Одновременные промахи по одному ключу выполняют
+    одну загрузку. Один экземпляр на приложение.
+    """
+
+    sessionmaker: object
+    storage: Storage
+    metadata: LRUCache = field(
+        default_factory=lambda: LRUCache(
+            "image_metadata",
+            ttl=settings.IMAGE_CACHE_TTL,
+            max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+        )
+    )
+    payload: LRUCache = field(
+        default_factory=lambda: LRUCache(
+            "image_payload",
+            ttl=settings.IMAGE_CACHE_TTL,
+            max_bytes=settings.IMAGE_CACHE_MAX_BYTES,
+        )
+    )
+    # Версии-пресеты по имени объекта мастера; неизменяемы, пока жив мастер
+    renditions: LRUCache = field(
+        default_factory=lambda: LRUCache(
+            "image_renditions",
+            ttl=settings.IMAGE_CACHE_TTL,
+            max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+        )
+    )
+    flight: SingleFlight = field(default_factory=SingleFlight)
+
+    async def _load_metadata(self, image_id: int) -> Optional[ImageResponse]:
+        # Собственная сессия: результат делят запросы с разным временем жизни
+        async with self.sessionmaker() as session:
+            image = await ImageRepository(session).get_image_row(image_id)
+        if image is None:
+            return None
+        metadata = ImageResponse.model_validate(image)
+        self.metadata.set(image_id, metadata)
+        return metadata
+
+    async def get_metadata(self, image_id: int) -> Optional[ImageResponse]:
+        metadata = self.metadata.get(image_id)
+        if metadata is not None:
+            return metadata
+        return await self.flight.do(
+            ("metadata", image_id), lambda: self._load_metadata(image_id)
+        )
+
+    def invalidate_metadata(self, image_id: int) -> None:
+        self.metadata.delete(image_id)
+
+    async def _load_renditions(self, object_name: str) -> List[RenditionInfo]:
+        async with self.sessionmaker() as session:
+            renditions = await ImageRepository(session).get_renditions(object_name)
+        result = [RenditionInfo.model_validate(rendition) for rendition in renditions]
+        self.renditions.set(object_name, result)
+        return result
+
+    async def get_renditions(self, object_name: str) -> List[RenditionInfo]:
+        renditions = self.renditions.get(object_name)
+        if renditions is not None:
+            return renditions
+        return await self.flight.do(
+            ("renditions", object_name), lambda: self._load_renditions(object_name)
+        )
+
+    def invalidate_renditions(self, object_name: str) -> None:
+        self.renditions.delete(object_name)
+
+    def is_cacheable(self, size: int) -> bool:
+        return size <= settings.IMAGE_CACHE_MAX_ITEM_BYTES
+
+    async def _load_payload(self, object_name: str) -> bytes:
+        data = await self.storage.get_image(object_name)
+        self.payload.set(object_name, data, size=len(data))
+        return data
+
+    async def get_payload(self, object_name: str) -> bytes:
+        data = self.payload.get(object_name)
+        if data is not None:
+            return data
+        return await self.flight.do(
+            ("payload", object_name), lambda: self._load_payload(object_name)
+        )
+
+    def invalidate_payload(self, object_name: str) -> None:
+        self.payload.delete(object_name)
+
+    def clear(self) -> None:
+        self.metadata.clear()
+        self.payload.clear()
+        self.renditions.clear()
+
+
+async def init_image_cache(app: web.Application) -> None:
+    app["image_cache"] = (
+        ImageCache(app["db_sessionmaker"], app["storage"])
+        if settings.IMAGE_CACHE_ENABLED
+        else None
+    )
+
+
+@dataclass(eq=False)
+class AuthCache:
+    """
+    Кэш проверенных JWT (sha256 токена -> id пользователя, не дольше exp)
+    и пользователей с коротким TTL. Записи пользователей сбрасываются
+    при изменении UserModel через ORM - в этом процессе сразу, в остальных
+    после commit (services/cache_invalidation.py).
+    """
+
+    tokens: LRUCache = field(
+        default_factory=lambda: LRUCache(
+            "auth_tokens",
+            ttl=settings.AUTH_TOKEN_CACHE_TTL,
+            max_entries=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES,
+        )
+    )
+    users: LRUCache = field(
+        default_factory=lambda: LRUCache(
+            "auth_users",
+            ttl=settings.AUTH_USER_CACHE_TTL,
+            max_entries=settings.AUTH_USER_CACHE_MAX_ENTRIES,
+        )
+    )
+
+    def __post_init__(self):
+        _auth_caches.add(self)
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.users.delete(user_id)
+
+
+_auth_caches: "weakref.WeakSet[AuthCache]" = weakref.WeakSet()
+
+
+@event.listens_for(UserModel, "after_update")
+@event.listens_for(UserModel, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: UserModel) -> None:
+    for cache in _auth_caches:
+        cache.invalidate_user(target.id)
+    # Другие воркеры: уведомление уходит вместе с commit изменения
+    if connection.dialect.name == "postgresql":
+        connection.execute(invalidation_notice("user", id=target.id))
+
+
+async def init_auth_cache(app: web.Application) -> None:
+    app["auth_cache"] = AuthCache()
@@ -1,53 +1,135 @@
 from repositories.image_repo import ImageRepository
-from services.minio_service import MinioService
-from utils.image_processor import ImageProcessor
+from services.storage_base import Storage
+from services.cache_service import ImageCache
+from services.image_writer import ImageWriter
+from services.rendition_service import rendition_object_name, rendition_presets
+from utils.image_processor import ImageProcessor, PresetOutput
+from utils.formats import (
+    BY_CONTENT_TYPE,
+    FORMATS,
+    ImageFormat,
+    preset_formats,
+    sniff_format,
+)
 from utils.logging import logger
-from schemas.image import ImageCreate, ImageResponse, ImageUploadResponse
+from schemas.image import (
+    ImageCreate,
+    ImageListResponse,
+    ImageMetadataResponse,
+    ImageResponse,
+    ImageUploadResponse,
+    RenditionInfo,
+    RenditionParams,
+)
+from utils.pagination import decode_cursor, encode_cursor
 from config import settings
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from models.image import ImageModel
+from models.stored_object import StoredObjectModel
+from typing import (
+    AsyncIterator,
+    BinaryIO,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+from aiohttp import web
+from io import BytesIO
+import asyncio
 import uuid
 import json
 
 
+class StoredUpload(NamedTuple):
+    object_name: str
+    size: int
+    content_type: str
+    renditions: List[dict]  # строки RenditionModel для версий-пресетов
+
+
 @dataclass
 class ImageService:
     image_repo: ImageRepository
-    minio_service: MinioService
-    processor: ImageProcessor = ImageProcessor()
+    storage: Storage
+    processor: ImageProcessor
+    cache: Optional[ImageCache] = None
+    writer: Optional[ImageWriter] = None
 
     async def process_and_save_image(
         self,
-        file_data: bytes,
+        file_data: BinaryIO,
         filename: str,
         content_type: str,
         compression_params: Optional[dict] = None,
+        source_hash: Optional[str] = None,
+        owner_id: Optional[int] = None,
     ) -> ImageUploadResponse:
         try:
-            # Генерация уникального имени файла
-            file_extension = "jpg"
-            object_name = f"{uuid.uuid4().hex}.{file_extension}"
+            params_json = (
+                json.dumps(compression_params, sort_keys=True)
+                if compression_params
+                else None
+            )
+            params_key = params_json or ""
+
+            # Те же байты с теми же параметрами уже обработаны - только ссылка
+            if source_hash:
+                stored = await self.image_repo.acquire_stored_object(
+                    source_hash, params_key
+                )
+                if stored is not None:
+                    image = await self.image_repo.create_image(
+                        ImageCreate(
+                            original_filename=filename,
+                            content_type=stored.content_type,
+                            size=stored.size,
+                            minio_object_name=stored.object_name,
+                            compression_params=params_json,
+                            source_hash=source_hash,
+                            owner_id=owner_id,
+                        )
+                    )
+                    return ImageUploadResponse(
+                        id=image.id,
+                        message="Image already stored, existing object reused",
+                        minio_object_name=stored.object_name,
+                    )
+
+            # Промах оставил открытую транзакцию: соединение возвращается
+            # в пул на время обработки и загрузки в хранилище, итоговая
+            # запись идет новой короткой транзакцией
+            await self.image_repo.session.rollback()
 
-            # Обработка изображения
-            processed_image = await self.processor.process_image(
+            # Обработка изображения (мастер остается в формате исходника)
+            # вместе с версиями-пресетами
+            object_name, size, content_type, renditions = await self.process_and_store(
                 file_data, compression_params
             )
 
-            # Загрузка в MinIO
-            await self.minio_service.upload_image(processed_image, object_name)
-
-            # Сохранение метаданных в БД
             image_data = ImageCreate(
                 original_filename=filename,
-                content_type="image/jpeg",
-                size=len(processed_image),
+                content_type=content_type,
+                size=size,
                 minio_object_name=object_name,
-                compression_params=(
-                    json.dumps(compression_params) if compression_params else None
-                ),
+                compression_params=params_json,
+                source_hash=source_hash,
+                owner_id=owner_id,
             )
+            if self.writer is not None:
+                # Общий commit с параллельными загрузками
+                image = await self.writer.write(image_data, renditions)
+            else:
+                image = await self.save_upload(image_data, renditions)
 
-            image = await self.image_repo.create_image(image_data)
+            if image.minio_object_name != object_name:
+                # Такую же загрузку успели сохранить параллельно
+                await self.storage.delete_image(object_name)
+                object_name = image.minio_object_name
 
             return ImageUploadResponse(
                 id=image.id,
@@ -62,18 +144,495 @@ class ImageService:
             )
             raise
 
-    async def get_image(self, image_id: int) -> Optional[tuple[bytes, str]]:
+    async def save_upload(
+        self, image_data: ImageCreate, renditions: Sequence[dict] = ()
+    ) -> ImageModel:
+        """
+        Объект, версии-пресеты и изображение одной транзакцией. Если
+        объект с тем же source_hash уже сохранен, строка ссылается на него.
+        """
+        if image_data.source_hash:
+            stored = await self.image_repo.register_stored_object(
+                image_data.minio_object_name,
+                image_data.source_hash,
+                image_data.compression_params or "",
+                image_data.content_type,
+                image_data.size,
+            )
+            if stored.object_name != image_data.minio_object_name:
+                image_data = image_data.model_copy(
+                    update={
+                        "minio_object_name": stored.object_name,
+                        "content_type": stored.content_type,
+                        "size": stored.size,
+                    }
+                )
+                renditions = []
+
+        # Версии записываются в той же транзакции, что и изображение
+        await self.image_repo.create_renditions(list(renditions))
+        return await self.image_repo.create_image(image_data)
+
+    async def process_and_store(
+        self, file_data: BinaryIO, compression_params: Optional[dict] = None
+    ) -> StoredUpload:
+        """
+        Обработка загрузки и сохранение результата. Пресеты IMAGE_PRESETS
+        создаются той же задачей воркера из уже декодированного кадра.
+        """
+        presets = rendition_presets()
+        if not presets:
+            processed = await self.processor.process_image(
+                file_data, compression_params
+            )
+            return await self.store_processed(processed)
+
+        processed, outputs = await self.processor.process_upload(
+            file_data,
+            compression_params,
+            {name: params.to_processing_params() for name, params in presets.items()},
+            [image_format.name for image_format in preset_formats()],
+        )
+        return await self.store_processed(processed, outputs)
+
+    async def store_processed(
+        self, processed: BytesIO, outputs: Sequence[PresetOutput] = ()
+    ) -> StoredUpload:
+        """
+        Загружает результат обработки в хранилище прямо из буфера под новым
+        уникальным именем, версии-пресеты - рядом с ним, параллельно.
+        """
+        image_format = sniff_format(processed.read(12))
+        processed.seek(0)
+        object_name = f"{uuid.uuid4().hex}.{image_format.extension}"
+        size = processed.getbuffer().nbytes
+        uploads = [
+            self.storage.upload_image(
+                processed, object_name, image_format.content_type, length=size
+            )
+        ]
+        renditions = []
+        presets = rendition_presets()
+        for output in outputs:
+            output_format = FORMATS[output.format]
+            key = rendition_object_name(
+                object_name, presets[output.preset], output_format
+            )
+            length = output.data.getbuffer().nbytes
+            uploads.append(
+                self.storage.upload_image(
+                    output.data, key, output_format.content_type, length=length
+                )
+            )
+            renditions.append(
+                {
+                    "master_object_name": object_name,
+                    "preset": output.preset,
+                    "content_type": output_format.content_type,
+                    "object_name": key,
+                    "width": output.size[0],
+                    "height": output.size[1],
+                    "size": length,
+                }
+            )
+
+        results = await asyncio.gather(*uploads, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            if outputs:
+                # Часть объектов могла загрузиться: мастер удаляется вместе
+                # с каталогом версий
+                try:
+                    await self.storage.delete_image(object_name)
+                except Exception as e:
+                    logger.error(
+                        f"Error deleting partial upload {object_name}: {e}",
+                        extra={"route": "/upload", "functionName": "store_processed"},
+                    )
+            raise errors[0]
+        return StoredUpload(object_name, size, image_format.content_type, renditions)
+
+    def start_batch(
+        self, compression_params: Optional[dict] = None, owner_id: Optional[int] = None
+    ) -> "ImageBatch":
+        return ImageBatch(self, compression_params, owner_id)
+
+    async def list_images(
+        self,
+        limit: int,
+        owner_id: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> ImageListResponse:
+        after = decode_cursor(cursor) if cursor else None
+        # Лишняя строка показывает, есть ли следующая страница
+        images = await self.image_repo.list_images(limit + 1, owner_id, after)
+        next_cursor = None
+        if len(images) > limit:
+            images = images[:limit]
+            next_cursor = encode_cursor(images[-1].created_at, images[-1].id)
+        return ImageListResponse(
+            items=[ImageResponse.model_validate(image) for image in images],
+            next_cursor=next_cursor,
+        )
+
+    async def get_images_metadata(
+        self, ids: List[int], owner_id: Optional[int] = None
+    ) -> ImageMetadataResponse:
+        ids = list(dict.fromkeys(ids))
+        found = {
+            image.id: image
+            for image in await self.image_repo.get_images_by_ids(ids, owner_id)
+        }
+        # Порядок ответа совпадает с порядком запроса
+        return ImageMetadataResponse(
+            items=[ImageResponse.model_validate(found[i]) for i in ids if i in found],
+            missing=[i for i in ids if i not in found],
+        )
+
+    async def delete_image(self, image_id: int, owner_id: Optional[int] = None) -> bool:
+        # Чужое изображение не отличается от несуществующего
+        image = await self.image_repo.get_image_by_id(image_id, owner_id)
+        if not image:
+            return False
+
+        object_name = image.minio_object_name
+        remaining = await self.image_repo.delete_image(image)
+        if self.cache is not None:
+            self.cache.invalidate_metadata(image_id)
+
+        # Объект удаляется только когда на него не осталось ссылок
+        if remaining == 0:
+            await self.storage.delete_image(object_name)
+            if self.cache is not None:
+                self.cache.invalidate_payload(object_name)
+                self.cache.invalidate_renditions(object_name)
+        return True
+
+    async def get_image_metadata(
+        self, image_id: int, owner_id: Optional[int] = None
+    ) -> Optional[Union[ImageModel, ImageResponse]]:
+        """owner_id - только изображение этого владельца, как в list_images."""
+        if self.cache is None:
+            return await self.image_repo.get_image_by_id(image_id, owner_id)
+        # Кэш общий для всех пользователей, владелец проверяется после
+        image = await self.cache.get_metadata(image_id)
+        if image is None or (owner_id is not None and image.owner_id != owner_id):
+            return None
+        return image
+
+    async def get_renditions(self, object_name: str) -> List[RenditionInfo]:
+        if self.cache is not None:
+            return await self.cache.get_renditions(object_name)
+        renditions = await self.image_repo.get_renditions(object_name)
+        return [RenditionInfo.model_validate(rendition) for rendition in renditions]
+
+    async def get_preset_renditions(
+        self,
+        image: Union[ImageModel, ImageResponse],
+        preset: str,
+        params: RenditionParams,
+    ) -> Dict[ImageFormat, RenditionInfo]:
+        """
+        Готовые версии пресета по форматам. Версии, созданные по прежнему
+        определению пресета, не подходят: их ключ не совпадает с текущим.
+        """
+        ready = {}
+        for rendition in await self.get_renditions(image.minio_object_name):
+            image_format = BY_CONTENT_TYPE.get(rendition.content_type)
+            if (
+                rendition.preset == preset
+                and image_format is not None
+                and rendition.object_name
+                == rendition_object_name(image.minio_object_name, params, image_format)
+            ):
+                ready[image_format] = rendition
+        return ready
+
+    async def get_cached_payload(self, object_name: str, size: int) -> Optional[bytes]:
+        """Содержимое из кэша (с загрузкой при промахе) или None для крупных объектов."""
+        if self.cache is None or not self.cache.is_cacheable(size):
+            return None
+        return await self.cache.get_payload(object_name)
+
+    def local_path(self, object_name: str) -> Optional[str]:
+        """Файл объекта на локальном диске, если хранилище его дает (sendfile)."""
+        return self.storage.local_path(object_name)
+
+    def presigned_url(self, object_name: str) -> Optional[str]:
+        """Ссылка для редиректа клиента прямо в хранилище, если оно их дает."""
+        return self.storage.presigned_get_url(object_name)
+
+    def stream_image(
+        self, object_name: str, offset: int = 0, length: int = 0
+    ) -> AsyncIterator[bytes]:
+        return self.storage.stream_image(
+            object_name, offset=offset, length=length
+        )
+
+
+def _error_message(error: BaseException) -> str:
+    if isinstance(error, web.HTTPException):
+        return error.reason
+    return str(error) or error.__class__.__name__
+
+
+@dataclass
+class ImageBatch:
+    """
+    Пакетная загрузка: файлы обрабатываются и загружаются в хранилище
+    параллельно (не больше BATCH_UPLOAD_CONCURRENCY), метаданные пишутся
+    в конце одним INSERT ... RETURNING в одной транзакции.
+    Одинаковые файлы внутри пакета обрабатываются один раз, файлы, уже
+    сохраненные раньше с теми же параметрами, - не обрабатываются.
+    Ошибка одного файла не прерывает пакет.
+    """
+
+    service: ImageService
+    compression_params: Optional[dict] = None
+    owner_id: Optional[int] = None
+    semaphore: asyncio.Semaphore = field(
+        default_factory=lambda: asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+    )
+    jobs: Dict[Tuple[str, str], asyncio.Task] = field(default_factory=dict)
+    items: List[dict] = field(default_factory=list)
+    # Хэши, ждущие проверки в БД, и хэши уже сохраненных объектов
+    unchecked: List[str] = field(default_factory=list)
+    existing: Set[str] = field(default_factory=set)
+    lookup_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Файлы сохраненных объектов: нужны, если объект удалят до finish
+    reused: Dict[str, BinaryIO] = field(default_factory=dict)
+
+    @property
+    def params_json(self) -> Optional[str]:
+        if not self.compression_params:
+            return None
+        return json.dumps(self.compression_params, sort_keys=True)
+
+    async def _is_stored(self, source_hash: str) -> bool:
+        """
+        Проверка до обработки. Хэши, добавленные за время предыдущего
+        запроса, проверяются следующим одним запросом ANY(), а не по одному.
+        """
+        self.unchecked.append(source_hash)
+        async with self.lookup_lock:
+            if self.unchecked:
+                hashes, self.unchecked = self.unchecked, []
+                repo = self.service.image_repo
+                try:
+                    found = await repo.find_stored_objects(
+                        hashes, self.params_json or ""
+                    )
+                finally:
+                    # Соединение возвращается в пул до начала обработки
+                    await repo.session.rollback()
+                self.existing.update(found)
+        return source_hash in self.existing
+
+    async def _store(self, file_data: BinaryIO) -> StoredUpload:
+        async with self.semaphore:
+            return await self.service.process_and_store(
+                file_data, self.compression_params
+            )
+
+    async def _process(
+        self, file_data: BinaryIO, source_hash: str
+    ) -> Optional[StoredUpload]:
+        """None - объект уже сохранен, ссылку на него берет finish."""
         try:
-            image = await self.image_repo.get_image_by_id(image_id)
-            if not image:
-                return None, None
+            if await self._is_stored(source_hash):
+                self.reused[source_hash] = file_data
+                return None
+            return await self._store(file_data)
+        finally:
+            if source_hash not in self.reused:
+                file_data.close()
+
+    def add(self, file_data: BinaryIO, filename: str, source_hash: str) -> None:
+        key = (source_hash, self.params_json or "")
+        if key in self.jobs:
+            file_data.close()
+        else:
+            self.jobs[key] = asyncio.ensure_future(
+                self._process(file_data, source_hash)
+            )
+        self.items.append({"filename": filename, "key": key})
 
-            image_data = await self.minio_service.get_image(image.minio_object_name)
-            return image_data, image.content_type
+    def add_error(self, filename: str, error: BaseException) -> None:
+        self.items.append({"filename": filename, "error": _error_message(error)})
 
-        except Exception as e:
-            logger.error(
-                f"Error retrieving image: {e}",
-                extra={"route": "/images/{id}", "functionName": "get_image"},
+    def _fail(self, key: Tuple[str, str], error: BaseException) -> None:
+        for item in self.items:
+            if item.get("key") == key:
+                item["error"] = _error_message(error)
+
+    def _close_reused(self) -> None:
+        for file_data in self.reused.values():
+            file_data.close()
+        self.reused.clear()
+
+    async def _discard(self, object_names: List[str]) -> None:
+        for object_name in object_names:
+            try:
+                await self.service.storage.delete_image(object_name)
+            except Exception as e:
+                logger.error(
+                    f"Error deleting batch object {object_name}: {e}",
+                    extra={"route": "/upload/batch", "functionName": "finish"},
+                )
+
+    async def cancel(self) -> None:
+        """Отмена пакета: останавливает задачи и удаляет уже загруженные объекты."""
+        for job in self.jobs.values():
+            job.cancel()
+        outcomes = await asyncio.gather(*self.jobs.values(), return_exceptions=True)
+        self._close_reused()
+        await self._discard(
+            [
+                outcome.object_name
+                for outcome in outcomes
+                if outcome is not None and not isinstance(outcome, BaseException)
+            ]
+        )
+
+    async def _acquire_reused(
+        self, processed: Dict[Tuple[str, str], Optional[StoredUpload]]
+    ) -> Dict[Tuple[str, str], StoredObjectModel]:
+        """
+        Ссылки на объекты, найденные _is_stored, в транзакции finish: строки
+        блокируются до commit. Объект, удаленный после проверки, обрабатывается
+        из сохраненного файла, и ссылки берутся заново.
+        """
+        repo = self.service.image_repo
+        while True:
+            acquired, missing = {}, []
+            for key, upload in processed.items():
+                if upload is not None:
+                    continue
+                count = sum(1 for item in self.items if item.get("key") == key)
+                stored = await repo.acquire_stored_object(*key, count=count)
+                if stored is None:
+                    missing.append(key)
+                else:
+                    acquired[key] = stored
+            if not missing:
+                return acquired
+
+            # Взятые ссылки снимаются: обработка идет без открытой транзакции
+            await repo.session.rollback()
+            for key in missing:
+                file_data = self.reused.pop(key[0])
+                try:
+                    processed[key] = await self._store(file_data)
+                except Exception as e:
+                    del processed[key]
+                    self._fail(key, e)
+                finally:
+                    file_data.close()
+
+    async def finish(self) -> List[dict]:
+        try:
+            return await self._finish()
+        finally:
+            self._close_reused()
+
+    async def _finish(self) -> List[dict]:
+        keys = list(self.jobs)
+        outcomes = await asyncio.gather(
+            *(self.jobs[key] for key in keys), return_exceptions=True
+        )
+        processed: Dict[Tuple[str, str], Optional[StoredUpload]] = {}
+        for key, outcome in zip(keys, outcomes):
+            if isinstance(outcome, BaseException):
+                self._fail(key, outcome)
+            else:
+                processed[key] = outcome
+
+        repo = self.service.image_repo
+        try:
+            stored = await self._acquire_reused(processed)
+            pending = [item for item in self.items if "error" not in item]
+            if not pending:
+                return self._results()
+
+            references: Dict[Tuple[str, str], int] = {}
+            for item in pending:
+                references[item["key"]] = references.get(item["key"], 0) + 1
+            uploaded = [key for key in references if processed[key] is not None]
+
+            stored.update(
+                await repo.register_stored_objects(
+                    [
+                        {
+                            "object_name": processed[key].object_name,
+                            "source_hash": key[0],
+                            "params_key": key[1],
+                            "content_type": processed[key].content_type,
+                            "size": processed[key].size,
+                            "ref_count": references[key],
+                        }
+                        for key in uploaded
+                    ]
+                )
+            )
+            # Версии только тех объектов, что не заменены существующими
+            await repo.create_renditions(
+                [
+                    rendition
+                    for key in uploaded
+                    if stored[key].object_name == processed[key].object_name
+                    for rendition in processed[key].renditions
+                ]
+            )
+            images = await repo.create_images(
+                [
+                    ImageCreate(
+                        original_filename=item["filename"],
+                        content_type=stored[item["key"]].content_type,
+                        size=stored[item["key"]].size,
+                        minio_object_name=stored[item["key"]].object_name,
+                        compression_params=self.params_json,
+                        source_hash=item["key"][0],
+                        owner_id=self.owner_id,
+                    )
+                    for item in pending
+                ]
+            )
+            await repo.session.commit()
+        except Exception:
+            await repo.session.rollback()
+            await self._discard(
+                [
+                    upload.object_name
+                    for upload in processed.values()
+                    if upload is not None
+                ]
             )
             raise
+
+        # Объекты, которые уже были в хранилище, заменены существующими
+        await self._discard(
+            [
+                processed[key].object_name
+                for key in uploaded
+                if stored[key].object_name != processed[key].object_name
+            ]
+        )
+        for item, image in zip(pending, images):
+            item["id"] = image.id
+            item["minio_object_name"] = image.minio_object_name
+        return self._results()
+
+    def _results(self) -> List[dict]:
+        results = []
+        for item in self.items:
+            result = {"filename": item["filename"]}
+            if "error" in item:
+                result.update(status="error", error=item["error"])
+            else:
+                result.update(
+                    status="ok",
+                    id=item["id"],
+                    minio_object_name=item["minio_object_name"],
+                )
+            results.append(result)
+        return results
@@ -0,0 +1,212 @@
+from repositories.image_repo import ImageRepository
+from models.image import ImageModel
+from schemas.image import ImageCreate
+from utils.logging import logger
+from utils.metrics import registry
+from config import settings
+from aiohttp import web
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import asyncio
+
+write_batch_size = registry.histogram(
+    "image_write_batch_size",
+    "Загрузки, записанные одним commit",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+write_fallbacks = registry.counter(
+    "image_write_fallback_total",
+    "Пачки, записанные по одной строке после ошибки общего commit",
+)
+write_queue_depth = registry.gauge(
+    "image_write_queue_depth", "Загрузки, ожидающие записи в БД"
+)
+
+
+class PendingWrite(NamedTuple):
+    image: ImageCreate
+    renditions: Sequence[dict]
+    future: "asyncio.Future[ImageModel]"
+
+
+def _source_key(image: ImageCreate) -> Tuple[str, str]:
+    return image.source_hash, image.compression_params or ""
+
+
+class ImageWriter:
+    """
+    Групповой commit метаданных загрузок: параллельные записи копятся
+    до IMAGE_WRITE_MAX_BATCH штук или IMAGE_WRITE_MAX_DELAY секунд,
+    что наступит раньше, и пишутся одной транзакцией - многострочными
+    INSERT ... RETURNING для объектов, версий и изображений. Каждый
+    вызывающий получает свою строку; ожидание fsync на commit делится
+    на всю пачку.
+    """
+
+    def __init__(
+        self,
+        sessionmaker,
+        max_batch: Optional[int] = None,
+        max_delay: Optional[float] = None,
+        workers: Optional[int] = None,
+    ):
+        self.sessionmaker = sessionmaker
+        self.max_batch = max_batch or settings.IMAGE_WRITE_MAX_BATCH
+        self.max_delay = (
+            settings.IMAGE_WRITE_MAX_DELAY if max_delay is None else max_delay
+        )
+        self.workers = workers or settings.IMAGE_WRITE_WORKERS
+        self.queue: "asyncio.Queue[PendingWrite]" = asyncio.Queue()
+        self._batch_ready = asyncio.Event()
+        # Пачку собирает один воркер за раз, остальные пишут свои
+        self._collecting = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._closed = False
+
+    async def write(
+        self, image: ImageCreate, renditions: Sequence[dict] = ()
+    ) -> ImageModel:
+        """
+        Регистрирует объект (при source_hash), версии-пресеты и строку
+        изображения. Если такой же объект уже сохранен, строка ссылается
+        на него, версии не записываются - вызывающий удаляет свою копию.
+        """
+        future = asyncio.get_running_loop().create_future()
+        item = PendingWrite(image, renditions, future)
+        if self._closed:
+            await self._write([item])
+        else:
+            self.queue.put_nowait(item)
+            if self.queue.qsize() >= self.max_batch:
+                self._batch_ready.set()
+        return await future
+
+    async def _insert(self, batch: List[PendingWrite]) -> List[ImageModel]:
+        async with self.sessionmaker() as session:
+            repo = ImageRepository(session)
+            # Одинаковые загрузки в пачке - одна строка объекта со счетчиком
+            references: Dict[Tuple[str, str], dict] = {}
+            for item in batch:
+                image = item.image
+                if not image.source_hash:
+                    continue
+                reference = references.get(_source_key(image))
+                if reference is None:
+                    references[_source_key(image)] = {
+                        "object_name": image.minio_object_name,
+                        "source_hash": image.source_hash,
+                        "params_key": image.compression_params or "",
+                        "content_type": image.content_type,
+                        "size": image.size,
+                        "ref_count": 1,
+                    }
+                else:
+                    reference["ref_count"] += 1
+            stored = (
+                await repo.register_stored_objects(list(references.values()))
+                if references
+                else {}
+            )
+
+            rows = []
+            renditions = []
+            for item in batch:
+                image = item.image
+                existing = stored.get(_source_key(image)) if image.source_hash else None
+                if existing is None or existing.object_name == image.minio_object_name:
+                    renditions.extend(item.renditions)
+                else:
+                    image = image.model_copy(
+                        update={
+                            "minio_object_name": existing.object_name,
+                            "content_type": existing.content_type,
+                            "size": existing.size,
+                        }
+                    )
+                rows.append(image)
+
+            await repo.create_renditions(renditions)
+            images = await repo.create_images(rows)
+            await session.commit()
+            return images
+
+    async def _write(self, batch: List[PendingWrite]) -> None:
+        try:
+            images = await self._insert(batch)
+        except Exception as e:
+            if len(batch) > 1:
+                # Одна ошибочная строка (например, удаленный владелец)
+                # не должна отменять соседние загрузки
+                write_fallbacks.inc()
+                logger.warning(
+                    f"Group write of {len(batch)} images failed, "
+                    f"writing one by one: {e}",
+                    extra={"route": "/upload", "functionName": "ImageWriter._write"},
+                )
+                for item in batch:
+                    await self._write([item])
+                return
+            images = None
+            error = e
+
+        for index, item in enumerate(batch):
+            # Запрос клиента мог быть отменен, пока пачка писалась
+            if item.future.done():
+                continue
+            if images is None:
+                item.future.set_exception(error)
+            else:
+                item.future.set_result(images[index])
+
+    def _drain(self, first: PendingWrite) -> List[PendingWrite]:
+        batch = [first]
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _collect(self) -> List[PendingWrite]:
+        async with self._collecting:
+            first = await self.queue.get()
+            if self.max_delay > 0 and self.queue.qsize() + 1 < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_ready.clear()
+            return self._drain(first)
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            write_batch_size.observe(len(batch))
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def start(self) -> "ImageWriter":
+        write_queue_depth.set_function(self.queue.qsize)
+        # Несколько пачек в полете: следующая копится, пока идет commit
+        self._tasks = [
+            asyncio.create_task(self._run()) for _ in range(self.workers)
+        ]
+        return self
+
+    async def close(self) -> None:
+        """Дописывает очередь; прерванный commit оставил бы запросы без ответа."""
+        self._closed = True
+        self._batch_ready.set()
+        await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def init_image_writer(app: web.Application) -> None:
+    if settings.IMAGE_WRITE_BATCHING:
+        app["image_writer"] = ImageWriter(app["db_sessionmaker"]).start()
+
+
+async def close_image_writer(app: web.Application) -> None:
+    if "image_writer" in app:
+        await app["image_writer"].close()
@@ -0,0 +1,456 @@
+from repositories.job_repo import JobRepository
+from repositories.image_repo import ImageRepository
+from services.image_service import ImageService
+from services.storage_base import Storage
+from services.cache_service import ImageCache
+from services.image_writer import ImageWriter
+from models.job import JobModel, JOB_DONE, JOB_FAILED, JOB_UPLOADING
+from schemas.job import JobCreate, JobResponse
+from utils.image_processor import ImageProcessor
+from utils.image_header import ImageHeaderReader, uploads_rejected
+from utils.callbacks import PublicResolver, validate_callback_url
+from utils.logging import logger
+from utils.metrics import registry
+from config import settings
+from dataclasses import dataclass
+from typing import BinaryIO, Awaitable, Callable, List, Optional, Tuple
+from aiohttp import web
+from io import BytesIO
+from PIL import Image, UnidentifiedImageError
+import aiohttp
+import asyncio
+import json
+import time
+import uuid
+
+jobs_finished = registry.counter(
+    "jobs_finished_total", "Попытки фоновых задач по результату", ("outcome",)
+)
+job_run_seconds = registry.histogram(
+    "job_run_seconds", "Время выполнения попытки фоновой задачи"
+)
+jobs_running = registry.gauge("jobs_running", "Фоновые задачи в работе в процессе")
+
+# Повтор не поможет: файл не изображение или слишком велик. Параметры
+# проверяются при постановке задачи, прочие ошибки повторяются
+PERMANENT_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError)
+
+
+def _raw_object_name() -> str:
+    return f"uploads/{uuid.uuid4().hex}"
+
+
+def _job_create(
+    raw_object_name: str,
+    filename: str,
+    compression_params: Optional[dict],
+    source_hash: Optional[str],
+    owner_id: Optional[int],
+    callback_url: Optional[str],
+) -> JobCreate:
+    return JobCreate(
+        owner_id=owner_id,
+        raw_object_name=raw_object_name,
+        original_filename=filename,
+        compression_params=(
+            json.dumps(compression_params, sort_keys=True)
+            if compression_params
+            else None
+        ),
+        source_hash=source_hash,
+        callback_url=callback_url,
+    )
+
+
+@dataclass
+class JobService:
+    """Постановка загрузок в очередь и статус задач (на запрос)."""
+
+    job_repo: JobRepository
+    storage: Storage
+    queue: Optional["JobQueue"] = None
+
+    async def enqueue(
+        self,
+        file_data: BinaryIO,
+        size: int,
+        filename: str,
+        compression_params: Optional[dict] = None,
+        source_hash: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        callback_url: Optional[str] = None,
+    ) -> JobModel:
+        # Исходные байты хранятся до завершения задачи, обработка - в воркере
+        raw_object_name = _raw_object_name()
+        await self.storage.upload_image(
+            file_data, raw_object_name, "application/octet-stream", length=size
+        )
+        try:
+            job = await self.job_repo.create_job(
+                _job_create(
+                    raw_object_name,
+                    filename,
+                    compression_params,
+                    source_hash,
+                    owner_id,
+                    callback_url,
+                )
+            )
+        except Exception:
+            await self.storage.delete_object(raw_object_name)
+            raise
+        if self.queue is not None:
+            self.queue.notify()
+        return job
+
+    async def create_direct_upload(
+        self,
+        filename: str,
+        compression_params: Optional[dict] = None,
+        owner_id: Optional[int] = None,
+        callback_url: Optional[str] = None,
+    ) -> Optional[Tuple[JobModel, str]]:
+        """
+        Задача и presigned URL, по которому клиент загрузит исходник прямо
+        в хранилище, минуя приложение. None - хранилище не дает ссылок.
+        """
+        raw_object_name = _raw_object_name()
+        url = self.storage.presigned_put_url(raw_object_name)
+        if url is None:
+            return None
+        job = await self.job_repo.create_job(
+            _job_create(
+                raw_object_name,
+                filename,
+                compression_params,
+                None,
+                owner_id,
+                callback_url,
+            ),
+            status=JOB_UPLOADING,
+            # Срок подтверждения: ссылка действует PRESIGNED_UPLOAD_EXPIRES,
+            # начатая до истечения загрузка успевает за JOB_UPLOAD_GRACE
+            delay=settings.PRESIGNED_UPLOAD_EXPIRES + settings.JOB_UPLOAD_GRACE,
+        )
+        return job, url
+
+    async def _check_header(self, object_name: str) -> None:
+        # Как при загрузке через приложение: формат и размеры по началу файла
+        header_reader = ImageHeaderReader()
+        chunks = self.storage.stream_image(
+            object_name, length=header_reader.max_bytes
+        )
+        try:
+            async for chunk in chunks:
+                if header_reader.feed(chunk) is not None:
+                    break
+            header_reader.finish()
+        finally:
+            await chunks.aclose()
+
+    async def complete_upload(self, job: JobModel) -> JobModel:
+        """
+        Клиент сообщил о завершении прямой загрузки. Presigned PUT ничего
+        не проверяет, поэтому MAX_IMAGE_SIZE и заголовок изображения
+        проверяются здесь; отклоненный файл удаляется.
+        Повторное подтверждение возвращает задачу без изменений.
+        """
+        if job.status != JOB_UPLOADING:
+            return job
+        size = await self.storage.stat_image(job.raw_object_name)
+        if size is None:
+            raise web.HTTPConflict(reason="Upload is not complete")
+        try:
+            if size > settings.MAX_IMAGE_SIZE:
+                uploads_rejected.labels("size").inc()
+                raise web.HTTPRequestEntityTooLarge(
+                    max_size=settings.MAX_IMAGE_SIZE, actual_size=size
+                )
+            await self._check_header(job.raw_object_name)
+        except web.HTTPClientError as e:
+            await self.storage.delete_object(job.raw_object_name)
+            await self.job_repo.reject_upload(job, e.reason)
+            raise
+        queued = await self.job_repo.queue_uploaded_job(job)
+        if queued is None:
+            # Параллельное подтверждение успело раньше
+            return await self.job_repo.get_job_by_id(job.id)
+        if self.queue is not None:
+            self.queue.notify()
+        return queued
+
+    async def get_job(
+        self, job_id: int, owner_id: Optional[int] = None
+    ) -> Optional[JobModel]:
+        job = await self.job_repo.get_job_by_id(job_id)
+        if job is None or (owner_id is not None and job.owner_id != owner_id):
+            return None
+        return job
+
+
+class JobQueue:
+    """
+    Разбор очереди jobmodels фоновыми задачами процесса. Задачи выдаются
+    через FOR UPDATE SKIP LOCKED, поэтому несколько процессов и машин
+    разбирают одну очередь без координации. Ошибки повторяются
+    с экспоненциальной задержкой до JOB_MAX_ATTEMPTS.
+    """
+
+    def __init__(
+        self,
+        sessionmaker,
+        storage: Storage,
+        processor: ImageProcessor,
+        cache: Optional[ImageCache] = None,
+        workers: Optional[int] = None,
+        writer: Optional[ImageWriter] = None,
+    ):
+        self.sessionmaker = sessionmaker
+        self.storage = storage
+        self.processor = processor
+        self.cache = cache
+        self.writer = writer
+        self.workers = settings.JOB_WORKERS if workers is None else workers
+        self.running = 0
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._next_sweep = 0.0
+
+    def notify(self) -> None:
+        """Задача поставлена этим процессом - не ждать интервала опроса."""
+        self._wakeup.set()
+
+    async def _wait(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _claim(self) -> Optional[JobModel]:
+        async with self.sessionmaker() as session:
+            return await JobRepository(session).claim_job(
+                settings.JOB_LEASE_TIMEOUT, settings.JOB_MAX_ATTEMPTS
+            )
+
+    async def _sweep(self) -> None:
+        """Закрытие зависших задач, не чаще раза в JOB_POLL_INTERVAL."""
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + settings.JOB_POLL_INTERVAL
+        await self._fail_exhausted()
+        await self._expire_uploads()
+
+    async def _fail_exhausted(self) -> None:
+        """Задачи, чья последняя попытка не завершилась до конца аренды."""
+        async with self.sessionmaker() as session:
+            jobs = await JobRepository(session).fail_exhausted_jobs(
+                settings.JOB_MAX_ATTEMPTS
+            )
+        for job in jobs:
+            jobs_finished.labels("failed").inc()
+            logger.error(
+                f"Job {job.id} failed: lease expired after {job.attempts} attempts",
+                extra={"route": "jobs", "functionName": "_fail_exhausted"},
+            )
+            await self._finish(job)
+
+    async def _expire_uploads(self) -> None:
+        """Прямые загрузки, не подтвержденные клиентом до срока."""
+        async with self.sessionmaker() as session:
+            jobs = await JobRepository(session).expire_uploads()
+        for job in jobs:
+            jobs_finished.labels("failed").inc()
+            logger.warning(
+                f"Job {job.id} failed: upload was not completed in time",
+                extra={"route": "jobs", "functionName": "_expire_uploads"},
+            )
+            # Исходник мог успеть загрузиться частично или целиком
+            await self._finish(job)
+
+    async def _update(
+        self, call: Callable[[JobRepository], Awaitable[Optional[JobModel]]]
+    ) -> Optional[JobModel]:
+        # При ошибке задача вернется в очередь по истечении аренды
+        try:
+            async with self.sessionmaker() as session:
+                return await call(JobRepository(session))
+        except Exception as e:
+            logger.error(
+                f"Error updating job: {e}",
+                extra={"route": "jobs", "functionName": "_update"},
+            )
+            return None
+
+    async def _process(self, job: JobModel) -> int:
+        if job.attempts > 1 and job.source_hash:
+            # Прошлая попытка могла сохранить изображение и не успеть
+            # отметить задачу. Отдельная сессия: соединение не держится
+            # на время скачивания и обработки
+            async with self.sessionmaker() as session:
+                image = await ImageRepository(session).find_uploaded_image(
+                    job.owner_id,
+                    job.source_hash,
+                    job.compression_params,
+                    job.created_at,
+                )
+            if image is not None:
+                return image.id
+
+        raw = await self.storage.get_image(job.raw_object_name)
+        async with self.sessionmaker() as session:
+            # process_and_save_image освобождает соединение после проверки
+            # дедупликации и до обработки
+            service = ImageService(
+                ImageRepository(session),
+                self.storage,
+                self.processor,
+                self.cache,
+                self.writer,
+            )
+            result = await service.process_and_save_image(
+                BytesIO(raw),
+                job.original_filename,
+                None,
+                json.loads(job.compression_params) if job.compression_params else None,
+                source_hash=job.source_hash,
+                owner_id=job.owner_id,
+            )
+            return result.id
+
+    async def _finish(self, job: Optional[JobModel]) -> None:
+        """Задача завершена окончательно: исходник больше не нужен."""
+        if job is None:
+            # Аренду успел получить другой воркер - он и завершит задачу
+            return
+        try:
+            await self.storage.delete_object(job.raw_object_name)
+        except Exception as e:
+            logger.error(
+                f"Error deleting raw upload {job.raw_object_name}: {e}",
+                extra={"route": "jobs", "functionName": "_finish"},
+            )
+        if job.callback_url:
+            await self._callback(job)
+
+    async def _callback(self, job: JobModel) -> None:
+        payload = JobResponse.model_validate(job).model_dump(mode="json")
+        try:
+            # Повторная проверка: адрес мог смениться с момента постановки.
+            # IP-литералы aiohttp не передает резолверу, DNS-имена
+            # проверяет еще и PublicResolver при соединении
+            await validate_callback_url(job.callback_url)
+            async with self._http.post(
+                job.callback_url, json=payload, allow_redirects=False
+            ) as response:
+                if response.status >= 400:
+                    raise aiohttp.ClientError(f"status {response.status}")
+        except (ValueError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(
+                f"Job {job.id} callback failed: {e}",
+                extra={"route": "jobs", "functionName": "_callback"},
+            )
+
+    async def _fail(self, job: JobModel, error: Exception) -> None:
+        message = str(error) or error.__class__.__name__
+        if (
+            isinstance(error, PERMANENT_ERRORS)
+            or job.attempts >= settings.JOB_MAX_ATTEMPTS
+        ):
+            jobs_finished.labels("failed").inc()
+            logger.error(
+                f"Job {job.id} failed after {job.attempts} attempts: {message}",
+                extra={"route": "jobs", "functionName": "_run"},
+            )
+            await self._finish(
+                await self._update(
+                    lambda repo: repo.finish_job(job, JOB_FAILED, error=message)
+                )
+            )
+            return
+
+        delay = min(
+            settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1),
+            settings.JOB_RETRY_MAX_DELAY,
+        )
+        jobs_finished.labels("retried").inc()
+        logger.warning(
+            f"Job {job.id} attempt {job.attempts} failed, retry in {delay:.0f}s: "
+            f"{message}",
+            extra={"route": "jobs", "functionName": "_run"},
+        )
+        await self._update(lambda repo: repo.retry_job(job, delay, message))
+
+    async def _run(self, job: JobModel) -> None:
+        self.running += 1
+        start = time.perf_counter()
+        try:
+            image_id = await self._process(job)
+        except asyncio.CancelledError:
+            # Остановка процесса: задача сразу возвращается в очередь
+            await self._update(lambda repo: repo.release_job(job))
+            raise
+        except Exception as e:
+            await self._fail(job, e)
+        else:
+            jobs_finished.labels("done").inc()
+            await self._finish(
+                await self._update(
+                    lambda repo: repo.finish_job(job, JOB_DONE, image_id=image_id)
+                )
+            )
+        finally:
+            self.running -= 1
+            job_run_seconds.observe(time.perf_counter() - start)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                await self._sweep()
+                job = await self._claim()
+            except Exception as e:
+                logger.error(
+                    f"Error claiming job: {e}",
+                    extra={"route": "jobs", "functionName": "_worker"},
+                )
+                job = None
+            if job is None:
+                await self._wait()
+                continue
+            await self._run(job)
+
+    def start(self) -> "JobQueue":
+        jobs_running.set_function(lambda: self.running)
+        if self.workers:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(resolver=PublicResolver()),
+                timeout=aiohttp.ClientTimeout(total=settings.JOB_CALLBACK_TIMEOUT),
+            )
+            self._tasks = [
+                asyncio.create_task(self._worker()) for _ in range(self.workers)
+            ]
+        return self
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._http is not None:
+            await self._http.close()
+
+
+async def init_job_queue(app: web.Application) -> None:
+    app["job_queue"] = JobQueue(
+        app["db_sessionmaker"],
+        app["storage"],
+        app["image_processor"],
+        app["image_cache"],
+        writer=app.get("image_writer"),
+    ).start()
+
+
+async def close_job_queue(app: web.Application) -> None:
+    await app["job_queue"].close()
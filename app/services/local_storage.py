@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+from services.storage_base import (
+    BlockingStorage,
+    storage_bytes_in,
+    storage_bytes_out,
+)
+from dataclasses import dataclass, field
+from typing import AsyncIterator, BinaryIO, Iterable, Optional, Union
+import shutil
+import tempfile
+import os
+
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class LocalStorage(BlockingStorage):
+    """
+    Хранилище на локальном диске: ключ объекта - путь относительно root.
+    Запись атомарна (временный файл в том же каталоге и rename), читатели
+    не видят недописанных файлов. Отдача клиенту - через sendfile
+    по local_path, без копирования данных в процесс.
+    """
+
+    root: str = field(default_factory=lambda: settings.LOCAL_STORAGE_PATH)
+    executor: ThreadPoolExecutor = None
+
+    def __post_init__(self):
+        self.root = os.path.abspath(self.root)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=settings.LOCAL_STORAGE_WORKERS,
+                thread_name_prefix="storage",
+            )
+
+    def _path(self, object_name: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, object_name))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid object name: {object_name}")
+        return path
+
+    async def start(self) -> None:
+        await self._run(os.makedirs, self.root, exist_ok=True)
+
+    def _write_sync(self, path: str, chunks: Iterable[bytes]) -> int:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "wb") as file:
+                for chunk in chunks:
+                    file.write(chunk)
+                size = file.tell()
+                if settings.LOCAL_STORAGE_FSYNC:
+                    file.flush()
+                    os.fsync(file.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        if settings.LOCAL_STORAGE_FSYNC:
+            # Сам rename становится надежным только после fsync каталога
+            directory_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(directory_fd)
+            finally:
+                os.close(directory_fd)
+        return size
+
+    async def upload_image(
+        self,
+        image_data: Union[bytes, BinaryIO],
+        object_name: str,
+        content_type: str = "image/jpeg",
+        length: Optional[int] = None,
+    ) -> str:
+        # content_type хранится в БД; на диске тип определяет расширение ключа
+        if isinstance(image_data, (bytes, bytearray, memoryview)):
+            chunks = [image_data]
+        else:
+            chunks = iter(lambda: image_data.read(WRITE_CHUNK_SIZE), b"")
+        size = await self._run_timed(
+            "put", self._write_sync, self._path(object_name), chunks
+        )
+        storage_bytes_out.inc(size)
+        return object_name
+
+    @staticmethod
+    def _read_sync(path: str) -> bytes:
+        with open(path, "rb") as file:
+            return file.read()
+
+    async def get_image(self, object_name: str) -> bytes:
+        data = await self._run_timed("get", self._read_sync, self._path(object_name))
+        storage_bytes_in.inc(len(data))
+        return data
+
+    @staticmethod
+    def _open_sync(path: str, offset: int) -> BinaryIO:
+        file = open(path, "rb")
+        file.seek(offset)
+        return file
+
+    async def stream_image(
+        self,
+        object_name: str,
+        offset: int = 0,
+        length: int = 0,
+        chunk_size: int = None,
+    ) -> AsyncIterator[bytes]:
+        """Отдает файл кусками; length=0 - до конца файла."""
+        chunk_size = chunk_size or settings.IMAGE_STREAM_CHUNK_SIZE
+        file = await self._run_timed(
+            "stream", self._open_sync, self._path(object_name), offset
+        )
+        try:
+            remaining = length or None
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await self._run(file.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                storage_bytes_in.inc(len(chunk))
+                yield chunk
+        finally:
+            await self._run(file.close)
+
+    async def stat_image(self, object_name: str) -> Optional[int]:
+        try:
+            stat = await self._run_timed("stat", os.stat, self._path(object_name))
+        except FileNotFoundError:
+            return None
+        return stat.st_size
+
+    @staticmethod
+    def _remove_sync(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def delete_object(self, object_name: str) -> None:
+        await self._run_timed("delete", self._remove_sync, self._path(object_name))
+
+    def _delete_image_sync(self, object_name: str) -> None:
+        self._remove_sync(self._path(object_name))
+        # Производные версии хранятся рядом с мастером
+        stem = object_name.rsplit(".", 1)[0]
+        shutil.rmtree(self._path(f"renditions/{stem}"), ignore_errors=True)
+
+    async def delete_image(self, object_name: str) -> None:
+        await self._run_timed("delete", self._delete_image_sync, object_name)
+
+    def local_path(self, object_name: str) -> Optional[str]:
+        # stat без пула потоков: метаданные каталога почти всегда в кэше ОС
+        path = self._path(object_name)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,145 @@
+from repositories.log_repo import LogRepository
+from utils.logging import logger as app_logger, SinkHandler, formatter
+from utils.metrics import registry
+from config import settings
+from datetime import datetime
+from aiohttp import web
+from typing import List, Optional
+import asyncio
+import logging
+import threading
+
+# Ошибки самого приемника не должны попадать обратно в приемник
+logger = logging.getLogger(__name__)
+
+records_enqueued = registry.counter(
+    "log_sink_enqueued_total", "Записи лога, поставленные в очередь приемника"
+)
+records_dropped = registry.counter(
+    "log_sink_dropped_total", "Записи лога, отброшенные при полной очереди"
+)
+records_written = registry.counter(
+    "log_sink_written_total", "Записи лога, сохраненные в БД"
+)
+flush_errors = registry.counter(
+    "log_sink_flush_errors_total", "Неудачные сохранения пачек лога"
+)
+queue_depth = registry.gauge("log_sink_queue_depth", "Записи лога в очереди")
+
+
+class LogSink:
+    """
+    Асинхронный приемник логов: записи копятся в ограниченной очереди,
+    фоновая задача пишет их в таблицу logmodels пачками - по размеру
+    пачки или по интервалу, что наступит раньше.
+    """
+
+    def __init__(
+        self,
+        sessionmaker,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        drop_policy: Optional[str] = None,
+    ):
+        self.sessionmaker = sessionmaker
+        self.batch_size = batch_size or settings.LOG_SINK_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.LOG_SINK_FLUSH_INTERVAL
+        self.drop_policy = drop_policy or settings.LOG_SINK_DROP_POLICY
+        self.queue: "asyncio.Queue[logging.LogRecord]" = asyncio.Queue(
+            maxsize=queue_size or settings.LOG_SINK_QUEUE_SIZE
+        )
+        self._batch_ready = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(self, record: logging.LogRecord) -> None:
+        """Вызывается из logging.Handler; из других потоков - через loop."""
+        if threading.get_ident() == self._loop_thread:
+            self._enqueue(record)
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, record)
+
+    def _enqueue(self, record: logging.LogRecord) -> None:
+        if self.queue.full():
+            records_dropped.inc()
+            if self.drop_policy != "oldest":
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(record)
+        records_enqueued.inc()
+        if self.queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+
+    @staticmethod
+    def _to_row(record: logging.LogRecord) -> dict:
+        message = record.getMessage()
+        if record.exc_info:
+            message = f"{message}\n{formatter.formatException(record.exc_info)}"
+        return {
+            "timestamp": datetime.utcfromtimestamp(record.created),
+            "route": getattr(record, "route", "N/A"),
+            "function_name": getattr(record, "functionName", "N/A"),
+            "level": record.levelname,
+            "message": message,
+        }
+
+    def _drain(self) -> List[dict]:
+        rows = []
+        while len(rows) < self.batch_size and not self.queue.empty():
+            rows.append(self._to_row(self.queue.get_nowait()))
+        return rows
+
+    async def _write(self, rows: List[dict]) -> None:
+        try:
+            async with self.sessionmaker() as session:
+                await LogRepository(session).bulk_insert(rows)
+            records_written.inc(len(rows))
+        except Exception as e:
+            flush_errors.inc()
+            logger.warning("Failed to write %s log records: %s", len(rows), e)
+
+    async def flush(self) -> None:
+        while not self.queue.empty():
+            await self._write(self._drain())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+    def start(self) -> "LogSink":
+        queue_depth.set_function(self.queue.qsize)
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+
+async def init_log_sink(app: web.Application) -> None:
+    if not settings.LOG_SINK_ENABLED:
+        return
+    sink = LogSink(app["db_sessionmaker"]).start()
+    sink_handler = SinkHandler(sink, level=settings.LOG_SINK_LEVEL)
+    app_logger.addHandler(sink_handler)
+    app["log_sink"] = sink
+    app["log_sink_handler"] = sink_handler
+
+
+async def close_log_sink(app: web.Application) -> None:
+    if "log_sink" not in app:
+        return
+    app_logger.removeHandler(app["log_sink_handler"])
+    await app["log_sink"].close()
@@ -1,55 +1,260 @@
 from minio import Minio
 from minio.error import S3Error
+from minio.deleteobjects import DeleteObject
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from config import settings
+from services.storage_base import (
+    BlockingStorage,
+    storage_bytes_in,
+    storage_bytes_out,
+)
+from utils.cache import LRUCache
 from utils.logging import logger
-from dataclasses import dataclass
+from datetime import timedelta
+from urllib.parse import urlsplit
+from dataclasses import dataclass, field
+from typing import AsyncIterator, BinaryIO, Optional, Union
+from urllib3.util import Retry, Timeout
+import urllib3
+import certifi
+import os
+
+
+def create_http_client() -> urllib3.PoolManager:
+    # Keep-alive пул, рассчитанный на все потоки executor'а
+    return urllib3.PoolManager(
+        timeout=Timeout(connect=settings.MINIO_TIMEOUT, read=settings.MINIO_TIMEOUT),
+        maxsize=settings.MINIO_MAX_WORKERS,
+        block=True,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=Retry(
+            total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]
+        ),
+    )
 
 
 @dataclass
-class MinioService:
+class MinioService(BlockingStorage):
+    """
+    Хранилище в MinIO/S3: асинхронная обертка над minio.Minio.
+    Блокирующие вызовы выполняются в отдельном ограниченном пуле потоков,
+    event loop не блокируется. Создается один раз при старте приложения.
+    """
+
     client: Minio = None
+    http_client: urllib3.PoolManager = None
+    executor: ThreadPoolExecutor = None
+    bucket_name: str = field(default_factory=lambda: settings.MINIO_BUCKET_NAME)
+    # Подпись presigned URL для адреса, по которому MinIO видят клиенты
+    public_client: Minio = None
+    presigned: LRUCache = None
 
     def __post_init__(self):
-        self.client = Minio(
-            settings.MINIO_ENDPOINT,
-            access_key=settings.MINIO_ACCESS_KEY,
-            secret_key=settings.MINIO_SECRET_KEY,
-            secure=settings.MINIO_SECURE,
-        )
-        self._ensure_bucket_exists()
+        if self.http_client is None:
+            self.http_client = create_http_client()
+        if self.client is None:
+            self.client = Minio(
+                settings.MINIO_ENDPOINT,
+                access_key=settings.MINIO_ACCESS_KEY,
+                secret_key=settings.MINIO_SECRET_KEY,
+                secure=settings.MINIO_SECURE,
+                region=settings.MINIO_REGION,
+                http_client=self.http_client,
+            )
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=settings.MINIO_MAX_WORKERS, thread_name_prefix="minio"
+            )
+        if self.public_client is None:
+            self.public_client = self.client
+            if settings.MINIO_PUBLIC_URL:
+                url = urlsplit(settings.MINIO_PUBLIC_URL)
+                self.public_client = Minio(
+                    url.netloc,
+                    access_key=settings.MINIO_ACCESS_KEY,
+                    secret_key=settings.MINIO_SECRET_KEY,
+                    secure=url.scheme == "https",
+                    region=settings.MINIO_REGION,
+                    http_client=self.http_client,
+                )
+        if self.presigned is None:
+            # Из кэша отдается ссылка, которая действует еще PRESIGNED_URL_MIN_TTL
+            self.presigned = LRUCache(
+                "presigned_urls",
+                ttl=settings.PRESIGNED_URL_EXPIRES - settings.PRESIGNED_URL_MIN_TTL,
+                max_entries=settings.PRESIGNED_URL_CACHE_MAX_ENTRIES,
+            )
 
-    def _ensure_bucket_exists(self):
+    async def ensure_bucket_exists(self) -> None:
         try:
-            if not self.client.bucket_exists(settings.MINIO_BUCKET_NAME):
-                self.client.make_bucket(settings.MINIO_BUCKET_NAME)
-                logger.info(f"Created bucket: {settings.MINIO_BUCKET_NAME}")
+            if not await self._run(self.client.bucket_exists, self.bucket_name):
+                await self._run(self.client.make_bucket, self.bucket_name)
+                logger.info(f"Created bucket: {self.bucket_name}")
         except S3Error as e:
             logger.error(f"Error creating bucket: {e}")
             raise
 
-    async def upload_image(self, image_data: bytes, object_name: str) -> str:
+    async def start(self) -> None:
+        await self.ensure_bucket_exists()
+
+    async def upload_image(
+        self,
+        image_data: Union[bytes, BinaryIO],
+        object_name: str,
+        content_type: str = "image/jpeg",
+        length: Optional[int] = None,
+    ) -> str:
+        if isinstance(image_data, (bytes, bytearray, memoryview)):
+            length = len(image_data)
+            image_data = BytesIO(image_data)
         try:
-            data = BytesIO(image_data)
-            self.client.put_object(
-                settings.MINIO_BUCKET_NAME,
+            await self._run_timed(
+                "put",
+                self.client.put_object,
+                self.bucket_name,
                 object_name,
-                data,
-                len(image_data),
-                content_type="image/jpeg",
+                image_data,
+                length,
+                content_type=content_type,
             )
+            if length is not None:
+                storage_bytes_out.inc(length)
             return object_name
         except S3Error as e:
             logger.error(f"Error uploading to MinIO: {e}")
             raise
 
-    async def get_image(self, object_name: str) -> bytes:
+    def _get_object_sync(self, object_name: str) -> bytes:
+        response = self.client.get_object(self.bucket_name, object_name)
         try:
-            response = self.client.get_object(settings.MINIO_BUCKET_NAME, object_name)
             return response.read()
+        finally:
+            self._release(response)
+
+    async def get_image(self, object_name: str) -> bytes:
+        try:
+            data = await self._run_timed("get", self._get_object_sync, object_name)
+            storage_bytes_in.inc(len(data))
+            return data
+        except S3Error as e:
+            logger.error(f"Error retrieving from MinIO: {e}")
+            raise
+
+    async def delete_object(self, object_name: str) -> None:
+        """Удаление одного объекта, без поиска производных версий."""
+        self.presigned.delete(object_name)
+        try:
+            await self._run_timed(
+                "delete", self.client.remove_object, self.bucket_name, object_name
+            )
+        except S3Error as e:
+            logger.error(f"Error deleting from MinIO: {e}")
+            raise
+
+    def _delete_object_sync(self, object_name: str) -> None:
+        self.client.remove_object(self.bucket_name, object_name)
+        # Производные версии хранятся рядом с мастером
+        stem = object_name.rsplit(".", 1)[0]
+        renditions = [
+            DeleteObject(obj.object_name)
+            for obj in self.client.list_objects(
+                self.bucket_name, prefix=f"renditions/{stem}/", recursive=True
+            )
+        ]
+        if renditions:
+            for error in self.client.remove_objects(self.bucket_name, renditions):
+                logger.error(f"Error deleting from MinIO: {error}")
+
+    async def delete_image(self, object_name: str) -> None:
+        self.presigned.delete(object_name)
+        try:
+            await self._run_timed("delete", self._delete_object_sync, object_name)
+        except S3Error as e:
+            logger.error(f"Error deleting from MinIO: {e}")
+            raise
+
+    async def stat_image(self, object_name: str) -> Optional[int]:
+        """Размер объекта или None, если его нет."""
+        try:
+            stat = await self._run_timed(
+                "stat", self.client.stat_object, self.bucket_name, object_name
+            )
+            return stat.size
         except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+                return None
             logger.error(f"Error retrieving from MinIO: {e}")
             raise
+
+    @staticmethod
+    def _release(response) -> None:
+        response.close()
+        response.release_conn()
+
+    async def stream_image(
+        self,
+        object_name: str,
+        offset: int = 0,
+        length: int = 0,
+        chunk_size: int = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Отдает объект кусками; length=0 - до конца объекта.
+        Каждое чтение из сокета выполняется в пуле потоков.
+        """
+        chunk_size = chunk_size or settings.IMAGE_STREAM_CHUNK_SIZE
+        try:
+            # Время до заголовков ответа; чтение тела идет по мере отдачи клиенту
+            response = await self._run_timed(
+                "stream",
+                self.client.get_object,
+                self.bucket_name,
+                object_name,
+                offset=offset,
+                length=length,
+            )
+        except S3Error as e:
+            logger.error(f"Error retrieving from MinIO: {e}")
+            raise
+
+        try:
+            while True:
+                chunk = await self._run(response.read, chunk_size)
+                if not chunk:
+                    break
+                storage_bytes_in.inc(len(chunk))
+                yield chunk
         finally:
-            response.close()
-            response.release_conn()
+            await self._run(self._release, response)
+
+    def presigned_get_url(self, object_name: str) -> Optional[str]:
+        """
+        Ссылка на чтение, общая для всех запросов объекта, пока действует:
+        браузер кэширует ответ MinIO по URL. Подпись считается локально
+        (регион задан), обращения к MinIO нет.
+        """
+        url = self.presigned.get(object_name)
+        if url is None:
+            url = self.public_client.presigned_get_object(
+                self.bucket_name,
+                object_name,
+                expires=timedelta(seconds=settings.PRESIGNED_URL_EXPIRES),
+                response_headers={
+                    "response-cache-control": settings.IMAGE_CACHE_CONTROL
+                },
+            )
+            self.presigned.set(object_name, url)
+        return url
+
+    def presigned_put_url(self, object_name: str) -> Optional[str]:
+        return self.public_client.presigned_put_object(
+            self.bucket_name,
+            object_name,
+            expires=timedelta(seconds=settings.PRESIGNED_UPLOAD_EXPIRES),
+        )
+
+    def close(self) -> None:
+        super().close()
+        self.http_client.clear()
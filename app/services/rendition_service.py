@@ -0,0 +1,173 @@
+from services.storage_base import Storage
+from utils.image_processor import ImageProcessor
+from utils.singleflight import SingleFlight
+from utils.formats import ImageFormat
+from utils.logging import logger
+from utils.metrics import registry
+from models.image import ImageModel
+from schemas.image import RenditionParams
+from config import settings
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from aiohttp import web
+from typing import Dict, Optional, Set
+
+variant_bytes = registry.counter(
+    "image_variant_bytes_total",
+    "Отданные версии в другом формате, для которых известен размер в формате мастера",
+    ("format",),
+)
+variant_baseline_bytes = registry.counter(
+    "image_variant_baseline_bytes_total",
+    "Размер тех же ответов в формате мастера",
+    ("format",),
+)
+
+
+@lru_cache()
+def rendition_presets() -> Dict[str, RenditionParams]:
+    """IMAGE_PRESETS, разобранные один раз; ошибка в настройке - ValueError."""
+    return {
+        name: RenditionParams.from_spec(spec)
+        for name, spec in settings.IMAGE_PRESETS.items()
+    }
+
+
+def _stem(master_object_name: str) -> str:
+    return master_object_name.rsplit(".", 1)[0]
+
+
+def rendition_object_name(
+    master_object_name: str, params: RenditionParams, image_format: ImageFormat
+) -> str:
+    # Каждый формат - отдельный объект с собственным расширением
+    stem = _stem(master_object_name)
+    return f"renditions/{stem}/{params.object_suffix()}.{image_format.extension}"
+
+
+@dataclass
+class RenditionService:
+    """
+    Производные версии изображений (w/h/q/fit и формат), создаваемые
+    по запросу. Результат сохраняется в хранилище под детерминированным ключом,
+    поэтому обработка выполняется один раз; одновременные запросы одной
+    версии объединяются в одну задачу. Один экземпляр на приложение.
+    Пресеты из IMAGE_PRESETS создаются заранее при загрузке (ImageService)
+    под теми же ключами.
+    """
+
+    storage: Storage
+    processor: ImageProcessor
+    flight: SingleFlight = field(default_factory=SingleFlight)
+    # Ключ -> размер уже существующих версий, чтобы не делать HEAD в хранилище
+    known: "OrderedDict[str, int]" = field(default_factory=OrderedDict)
+    # Мастер (имя без расширения) -> его ключи в known, для forget
+    known_by_master: Dict[str, Set[str]] = field(default_factory=dict)
+
+    @staticmethod
+    def rendition_key(
+        image: ImageModel, params: RenditionParams, image_format: ImageFormat
+    ) -> str:
+        return rendition_object_name(image.minio_object_name, params, image_format)
+
+    def _remember(self, key: str, size: int) -> None:
+        self.known[key] = size
+        self.known.move_to_end(key)
+        # renditions/{stem}/{suffix}.{ext}
+        self.known_by_master.setdefault(key.split("/", 2)[1], set()).add(key)
+        while len(self.known) > settings.RENDITION_KNOWN_KEYS:
+            evicted, _ = self.known.popitem(last=False)
+            stem = evicted.split("/", 2)[1]
+            keys = self.known_by_master.get(stem)
+            if keys is not None:
+                keys.discard(evicted)
+                if not keys:
+                    del self.known_by_master[stem]
+
+    def forget(self, master_object_name: str) -> None:
+        """Сбрасывает известные размеры версий удаленного мастера."""
+        for key in self.known_by_master.pop(_stem(master_object_name), ()):
+            self.known.pop(key, None)
+
+    def clear(self) -> None:
+        self.known.clear()
+        self.known_by_master.clear()
+
+    async def _lookup(self, key: str) -> Optional[int]:
+        size = self.known.get(key)
+        if size is not None:
+            self.known.move_to_end(key)
+            return size
+        size = await self.storage.stat_image(key)
+        if size is not None:
+            self._remember(key, size)
+        return size
+
+    async def _render(
+        self,
+        image: ImageModel,
+        params: RenditionParams,
+        image_format: ImageFormat,
+        key: str,
+    ) -> int:
+        # Повторная проверка: объект мог появиться, пока ждали своей очереди
+        size = await self._lookup(key)
+        if size is not None:
+            return size
+
+        master = await self.storage.get_image(image.minio_object_name)
+        processed = await self.processor.process_image(
+            master, {**params.to_processing_params(), "format": image_format.name}
+        )
+        size = processed.getbuffer().nbytes
+        await self.storage.upload_image(
+            processed, key, image_format.content_type, length=size
+        )
+        self._remember(key, size)
+
+        logger.info(
+            "Rendition created: %s",
+            key,
+            extra={"route": "/images/{id}", "functionName": "get_rendition"},
+        )
+        return size
+
+    async def get_rendition(
+        self, image: ImageModel, params: RenditionParams, image_format: ImageFormat
+    ) -> int:
+        """Гарантирует наличие версии в хранилище и возвращает ее размер."""
+        key = self.rendition_key(image, params, image_format)
+        size = await self._lookup(key)
+        if size is not None:
+            return size
+        return await self.flight.do(
+            key, lambda: self._render(image, params, image_format, key)
+        )
+
+    def baseline_size(
+        self, image: ImageModel, params: RenditionParams, master: ImageFormat
+    ) -> Optional[int]:
+        """
+        Размер той же версии в формате мастера, если он известен без
+        обращения к хранилищу: для версии без resize - размер мастера.
+        """
+        if not params.resizes():
+            return image.size
+        return self.known.get(self.rendition_key(image, params, master))
+
+    def record_delivery(
+        self, image_format: ImageFormat, size: int, baseline: Optional[int]
+    ) -> None:
+        # Экономия по формату: baseline_bytes - bytes
+        if baseline is not None:
+            variant_bytes.labels(image_format.extension).inc(size)
+            variant_baseline_bytes.labels(image_format.extension).inc(baseline)
+
+
+async def init_renditions(app: web.Application) -> None:
+    # Ошибка в IMAGE_PRESETS обнаруживается при запуске, а не при загрузке
+    rendition_presets()
+    app["rendition_service"] = RenditionService(
+        app["storage"], app["image_processor"]
+    )
@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor
+from utils.metrics import registry
+from typing import AsyncIterator, BinaryIO, Optional, Protocol, Union
+import asyncio
+import functools
+import time
+
+storage_seconds = registry.histogram(
+    "storage_operation_seconds",
+    "Время вызова хранилища без ожидания в очереди пула",
+    ("operation",),
+)
+storage_pending = registry.gauge(
+    "storage_pending", "Вызовы хранилища в работе и в очереди пула потоков"
+)
+storage_bytes = registry.counter(
+    "storage_bytes_total", "Байты, переданные в хранилище и из него", ("direction",)
+)
+storage_bytes_in = storage_bytes.labels("in")
+storage_bytes_out = storage_bytes.labels("out")
+
+
+class Storage(Protocol):
+    """
+    Хранилище объектов (мастера, версии, исходники задач). Реализации:
+    MinioService (MinIO/S3), LocalStorage (локальный диск) и TieredStorage
+    (локальный ярус со сквозной записью в S3), выбор - STORAGE_BACKEND.
+    """
+
+    async def start(self) -> None:
+        ...
+
+    async def upload_image(
+        self,
+        image_data: Union[bytes, BinaryIO],
+        object_name: str,
+        content_type: str = "image/jpeg",
+        length: Optional[int] = None,
+    ) -> str:
+        ...
+
+    async def get_image(self, object_name: str) -> bytes:
+        ...
+
+    def stream_image(
+        self,
+        object_name: str,
+        offset: int = 0,
+        length: int = 0,
+        chunk_size: int = None,
+    ) -> AsyncIterator[bytes]:
+        ...
+
+    async def stat_image(self, object_name: str) -> Optional[int]:
+        """Размер объекта или None, если его нет."""
+        ...
+
+    async def delete_object(self, object_name: str) -> None:
+        """Удаление одного объекта, без поиска производных версий."""
+        ...
+
+    async def delete_image(self, object_name: str) -> None:
+        """Удаление мастера вместе с производными версиями (renditions/<stem>/)."""
+        ...
+
+    def local_path(self, object_name: str) -> Optional[str]:
+        """Путь к файлу объекта на локальном диске (для sendfile) или None."""
+        ...
+
+    def presigned_get_url(self, object_name: str) -> Optional[str]:
+        """Временная ссылка на чтение объекта клиентом напрямую или None."""
+        ...
+
+    def presigned_put_url(self, object_name: str) -> Optional[str]:
+        """Временная ссылка на загрузку объекта клиентом напрямую или None."""
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+def _timed(func):
+    # Замер внутри потока: очередь пула не входит во время операции
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+class BlockingStorage:
+    """
+    Общая часть хранилищ с блокирующим API: вызовы выполняются
+    в собственном ограниченном пуле потоков, event loop не блокируется.
+    """
+
+    executor: ThreadPoolExecutor
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        storage_pending.inc()
+        try:
+            return await loop.run_in_executor(
+                self.executor, functools.partial(func, *args, **kwargs)
+            )
+        finally:
+            storage_pending.dec()
+
+    async def _run_timed(self, operation: str, func, *args, **kwargs):
+        result, seconds = await self._run(
+            _timed, functools.partial(func, *args, **kwargs)
+        )
+        storage_seconds.labels(operation).observe(seconds)
+        return result
+
+    def local_path(self, object_name: str) -> Optional[str]:
+        return None
+
+    def presigned_get_url(self, object_name: str) -> Optional[str]:
+        return None
+
+    def presigned_put_url(self, object_name: str) -> Optional[str]:
+        return None
+
+    def close(self) -> None:
+        # Вызывается при остановке, когда новых задач уже нет
+        self.executor.shutdown(wait=True)
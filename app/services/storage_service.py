@@ -0,0 +1,136 @@
+from services.storage_base import Storage
+from services.local_storage import LocalStorage
+from services.minio_service import MinioService
+from utils.singleflight import SingleFlight
+from utils.logging import logger
+from config import settings
+from dataclasses import dataclass, field
+from typing import AsyncIterator, BinaryIO, Optional, Union
+from aiohttp import web
+
+
+@dataclass
+class TieredStorage:
+    """
+    Локальный диск перед удаленным хранилищем (MinIO/S3). Запись сквозная:
+    загрузка завершается, когда объект есть и на диске, и в remote.
+    Чтение - с диска; промах (объект записан другим узлом или до включения
+    яруса) один раз заполняет диск из remote.
+    """
+
+    local: LocalStorage
+    remote: Storage
+    flight: SingleFlight = field(default_factory=SingleFlight)
+
+    async def start(self) -> None:
+        await self.local.start()
+        await self.remote.start()
+
+    async def upload_image(
+        self,
+        image_data: Union[bytes, BinaryIO],
+        object_name: str,
+        content_type: str = "image/jpeg",
+        length: Optional[int] = None,
+    ) -> str:
+        is_bytes = isinstance(image_data, (bytes, bytearray, memoryview))
+        seekable = not is_bytes and image_data.seekable()
+        start = image_data.tell() if seekable else 0
+        await self.local.upload_image(image_data, object_name, content_type, length)
+        try:
+            if seekable:
+                length = image_data.tell() - start
+                image_data.seek(start)
+            elif not is_bytes:
+                # Поток уже прочитан: в remote - из записанного файла
+                image_data = await self.local.get_image(object_name)
+            await self.remote.upload_image(
+                image_data, object_name, content_type, length=length
+            )
+        except BaseException:
+            await self.local.delete_object(object_name)
+            raise
+        return object_name
+
+    async def _fill(self, object_name: str) -> None:
+        data = await self.remote.get_image(object_name)
+        await self.local.upload_image(data, object_name)
+
+    async def _ensure_local(self, object_name: str) -> None:
+        if self.local.local_path(object_name) is None:
+            await self.flight.do(object_name, lambda: self._fill(object_name))
+
+    async def get_image(self, object_name: str) -> bytes:
+        if self.local.local_path(object_name) is not None:
+            return await self.local.get_image(object_name)
+        data = await self.remote.get_image(object_name)
+        try:
+            await self.local.upload_image(data, object_name)
+        except Exception as e:
+            logger.error(f"Error filling local storage tier: {e}")
+        return data
+
+    async def stream_image(
+        self,
+        object_name: str,
+        offset: int = 0,
+        length: int = 0,
+        chunk_size: int = None,
+    ) -> AsyncIterator[bytes]:
+        await self._ensure_local(object_name)
+        chunks = self.local.stream_image(object_name, offset, length, chunk_size)
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    async def stat_image(self, object_name: str) -> Optional[int]:
+        size = await self.local.stat_image(object_name)
+        if size is None:
+            size = await self.remote.stat_image(object_name)
+        return size
+
+    async def delete_object(self, object_name: str) -> None:
+        await self.remote.delete_object(object_name)
+        await self.local.delete_object(object_name)
+
+    async def delete_image(self, object_name: str) -> None:
+        await self.remote.delete_image(object_name)
+        await self.local.delete_image(object_name)
+
+    def local_path(self, object_name: str) -> Optional[str]:
+        return self.local.local_path(object_name)
+
+    def presigned_get_url(self, object_name: str) -> Optional[str]:
+        return self.remote.presigned_get_url(object_name)
+
+    def presigned_put_url(self, object_name: str) -> Optional[str]:
+        # Объект появится только в remote; диск заполнится при первом чтении
+        return self.remote.presigned_put_url(object_name)
+
+    def close(self) -> None:
+        self.local.close()
+        self.remote.close()
+
+
+def create_storage(backend: Optional[str] = None) -> Storage:
+    backend = backend or settings.STORAGE_BACKEND
+    if backend == "minio":
+        return MinioService()
+    if backend == "local":
+        return LocalStorage()
+    if backend == "tiered":
+        return TieredStorage(LocalStorage(), MinioService())
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+async def init_storage(app: web.Application) -> None:
+    """Хук on_startup: одно хранилище на приложение, bucket проверяется один раз."""
+    storage = create_storage()
+    await storage.start()
+    app["storage"] = storage
+
+
+async def close_storage(app: web.Application) -> None:
+    app["storage"].close()
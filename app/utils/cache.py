@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from utils.metrics import registry
+import time
+
+cache_hits = registry.counter("cache_hits_total", "Попадания в кэш", ("cache",))
+cache_misses = registry.counter("cache_misses_total", "Промахи кэша", ("cache",))
+cache_evictions = registry.counter(
+    "cache_evictions_total", "Вытеснения из кэша", ("cache",)
+)
+cache_bytes = registry.gauge("cache_bytes", "Объем данных в кэше", ("cache",))
+cache_entries = registry.gauge("cache_entries", "Число записей в кэше", ("cache",))
+
+
+class LRUCache:
+    """
+    LRU-кэш в памяти процесса с TTL на запись и ограничением
+    по объему (max_bytes) и/или числу записей (max_entries).
+    Не потокобезопасен: используется только из event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._hits = cache_hits.labels(name)
+        self._misses = cache_misses.labels(name)
+        self._evictions = cache_evictions.labels(name)
+        self._bytes = cache_bytes.labels(name)
+        self._entries = cache_entries.labels(name)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[2] > time.monotonic()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self._misses.inc()
+            return None
+        value, _, expires = entry
+        if expires <= time.monotonic():
+            self._remove(key)
+            self._misses.inc()
+            return None
+        self._data.move_to_end(key)
+        self._hits.inc()
+        return value
+
+    def set(
+        self, key: Hashable, value: Any, size: int = 0, ttl: Optional[float] = None
+    ) -> None:
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, size, expires)
+        self.size += size
+        self._evict()
+        self._update_gauges()
+
+    def delete(self, key: Hashable) -> None:
+        if key in self._data:
+            self._remove(key)
+            self._update_gauges()
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+        self._update_gauges()
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self.size -= size
+
+    def _evict(self) -> None:
+        while self._data and (
+            (self.max_bytes is not None and self.size > self.max_bytes)
+            or (self.max_entries is not None and len(self._data) > self.max_entries)
+        ):
+            _, (_, size, _) = self._data.popitem(last=False)
+            self.size -= size
+            self._evictions.inc()
+
+    def _update_gauges(self) -> None:
+        self._bytes.set(self.size)
+        self._entries.set(len(self._data))
@@ -0,0 +1,86 @@
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+from config import settings
+from typing import Any, Dict, Iterable, List
+from urllib.parse import urlsplit
+import asyncio
+import errno
+import ipaddress
+import socket
+
+
+def _is_public(address: str) -> bool:
+    # Зона IPv6 ("fe80::1%eth0") не входит в адрес
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    # is_global исключает loopback, частные, link-local (169.254.169.254),
+    # зарезервированные и CGNAT-сети
+    return ip.is_global and not ip.is_multicast
+
+
+def _host_allowed(host: str) -> bool:
+    """Хост из JOB_CALLBACK_ALLOWED_HOSTS: доверенный, адрес не проверяется."""
+    host = host.lower().rstrip(".")
+    for allowed in settings.JOB_CALLBACK_ALLOWED_HOSTS:
+        allowed = allowed.lower().rstrip(".")
+        if host == allowed or host.endswith(f".{allowed}"):
+            return True
+    return False
+
+
+def _check_addresses(host: str, addresses: Iterable[str]) -> None:
+    blocked = sorted({address for address in addresses if not _is_public(address)})
+    if blocked:
+        raise ValueError(
+            f"callback_url host {host} resolves to a non-public address "
+            f"{blocked[0]}"
+        )
+
+
+async def validate_callback_url(url: str) -> None:
+    """
+    Адрес обратного вызова задачи: только http(s) и только публичные
+    адреса, иначе воркер можно направить на сервисы внутренней сети
+    (127.0.0.1, метаданные облака, MinIO, PostgreSQL). ValueError - отказ.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    host = parts.hostname
+    if _host_allowed(host):
+        return
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+    except (OSError, ValueError):
+        raise ValueError(f"callback_url host {host} cannot be resolved")
+    _check_addresses(host, (info[4][0] for info in infos))
+
+
+class PublicResolver(AbstractResolver):
+    """
+    Резолвер клиента обратных вызовов: адреса проверяются в момент
+    соединения, поэтому DNS, сменивший ответ после validate_callback_url,
+    не приведет запрос во внутреннюю сеть.
+    """
+
+    def __init__(self, resolver: AbstractResolver = None):
+        self._resolver = resolver or DefaultResolver()
+
+    async def resolve(
+        self, host: str, port: int = 0, family: int = socket.AF_INET
+    ) -> List[Dict[str, Any]]:
+        hosts = await self._resolver.resolve(host, port, family)
+        if not _host_allowed(host):
+            try:
+                _check_addresses(host, (entry["host"] for entry in hosts))
+            except ValueError as e:
+                # Ошибка соединения aiohttp (ClientConnectorError)
+                raise OSError(errno.EACCES, str(e))
+        return hosts
+
+    async def close(self) -> None:
+        await self._resolver.close()
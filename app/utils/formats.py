@@ -0,0 +1,115 @@
+from PIL import Image
+from config import settings
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Collection, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ImageFormat:
+    name: str  # имя формата в Pillow
+    content_type: str
+    extension: str
+    alpha: bool
+    # Режимы, которые формат сохраняет без конвертации
+    modes: Tuple[str, ...]
+
+
+JPEG = ImageFormat("JPEG", "image/jpeg", "jpg", False, ("L", "RGB", "CMYK"))
+PNG = ImageFormat(
+    "PNG", "image/png", "png", True, ("1", "L", "LA", "P", "RGB", "RGBA")
+)
+# RGB и RGBA плагин GIF сам переводит в палитру
+GIF = ImageFormat("GIF", "image/gif", "gif", True, ("L", "P", "RGB", "RGBA"))
+WEBP = ImageFormat("WEBP", "image/webp", "webp", True, ("RGB", "RGBA"))
+AVIF = ImageFormat("AVIF", "image/avif", "avif", True, ("RGB", "RGBA"))
+
+FORMATS = {f.name: f for f in (JPEG, PNG, GIF, WEBP, AVIF)}
+BY_CONTENT_TYPE = {f.content_type: f for f in FORMATS.values()}
+
+
+def sniff_format(head: bytes) -> Optional[ImageFormat]:
+    """Формат по сигнатуре в первых 12 байтах, без декодирования."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return JPEG
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return PNG
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return GIF
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return WEBP
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+        return AVIF
+    return None
+
+
+@lru_cache()
+def is_supported(name: str) -> bool:
+    """Может ли установленный Pillow сохранять формат (AVIF - не везде)."""
+    Image.init()
+    return name in Image.SAVE
+
+
+def master_format(source_format: Optional[str]) -> ImageFormat:
+    """
+    Формат хранения мастера: исходный, если он из FORMATS и Pillow умеет
+    его сохранять, иначе PNG без потерь (BMP, TIFF и т.п.).
+    """
+    image_format = FORMATS.get(source_format or "")
+    if image_format is None or not is_supported(image_format.name):
+        return PNG
+    return image_format
+
+
+@lru_cache()
+def delivery_formats() -> Tuple[ImageFormat, ...]:
+    """IMAGE_DELIVERY_FORMATS в порядке предпочтения, без недоступных форматов."""
+    formats = (FORMATS.get(name.upper()) for name in settings.IMAGE_DELIVERY_FORMATS)
+    return tuple(f for f in formats if f is not None and is_supported(f.name))
+
+
+@lru_cache()
+def preset_formats() -> Tuple[ImageFormat, ...]:
+    """IMAGE_PRESET_FORMATS без недоступных форматов."""
+    formats = (FORMATS.get(name.upper()) for name in settings.IMAGE_PRESET_FORMATS)
+    return tuple(f for f in formats if f is not None and is_supported(f.name))
+
+
+def _accepted_types(accept: str) -> dict:
+    accepted = {}
+    for part in accept.split(","):
+        media_type, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[media_type.strip().lower()] = quality
+    return accepted
+
+
+def negotiate_format(
+    accept: Optional[str],
+    fallback: ImageFormat,
+    available: Optional[Collection[ImageFormat]] = None,
+) -> ImageFormat:
+    """
+    Формат отдачи по заголовку Accept. Учитываются только явно названные
+    типы: */* и image/* присылают и клиенты, не умеющие WebP и AVIF.
+    Если ни один из IMAGE_DELIVERY_FORMATS не подходит - fallback (мастер).
+    available - только уже готовые форматы (пресеты), без обработки.
+    """
+    if not accept:
+        return fallback
+    accepted = _accepted_types(accept)
+    for image_format in delivery_formats():
+        if image_format is fallback:
+            break
+        if available is not None and image_format not in available:
+            continue
+        if accepted.get(image_format.content_type, 0.0) > 0:
+            return image_format
+    return fallback
@@ -0,0 +1,121 @@
+from aiohttp import web, hdrs
+from config import settings
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+import asyncio
+
+
+def to_http_datetime(value: datetime) -> datetime:
+    # В БД хранится naive UTC (datetime.utcnow), в HTTP - с точностью до секунд
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def is_not_modified(
+    request: web.Request, etag: str, last_modified: Optional[datetime]
+) -> bool:
+    """
+    Условный GET: If-None-Match имеет приоритет над If-Modified-Since (RFC 7232).
+    """
+    if_none_match = request.if_none_match
+    if if_none_match is not None:
+        return any(tag.value in (etag, "*") for tag in if_none_match)
+
+    if_modified_since = request.if_modified_since
+    if if_modified_since is not None and last_modified is not None:
+        return to_http_datetime(last_modified) <= if_modified_since
+
+    return False
+
+
+def _if_range_matches(
+    request: web.Request, etag: str, last_modified: Optional[datetime]
+) -> bool:
+    raw = request.headers.get(hdrs.IF_RANGE)
+    if raw is None:
+        return True
+    if raw.startswith('"'):
+        return raw == f'"{etag}"'
+    if raw.startswith("W/"):
+        # Слабые ETag не подходят для If-Range
+        return False
+    if_range = request.if_range
+    return (
+        if_range is not None
+        and last_modified is not None
+        and to_http_datetime(last_modified) == if_range
+    )
+
+
+def resolve_range(
+    request: web.Request,
+    size: int,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+) -> Optional[Tuple[int, int]]:
+    """
+    Возвращает (start, end) включительно для одиночного Range или None,
+    если нужно отдать объект целиком. Несколько диапазонов и некорректные
+    заголовки игнорируются, как допускает RFC 7233.
+    """
+    if hdrs.RANGE not in request.headers:
+        return None
+    if not _if_range_matches(request, etag, last_modified):
+        return None
+
+    try:
+        rng = request.http_range
+    except ValueError:
+        return None
+
+    start, stop = rng.start, rng.stop
+    if start is not None and start < 0:
+        # bytes=-N: последние N байт
+        start = max(size + start, 0)
+    if start is None:
+        start = 0
+    stop = size if stop is None else min(stop, size)
+
+    if size == 0 or start >= size:
+        raise web.HTTPRequestRangeNotSatisfiable(
+            headers={hdrs.CONTENT_RANGE: f"bytes */{size}"}
+        )
+    return start, stop - 1
+
+
+async def send_file(
+    request: web.Request,
+    response: web.StreamResponse,
+    path: str,
+    offset: int,
+    length: int,
+) -> None:
+    """
+    Тело уже подготовленного ответа из файла через loop.sendfile: данные
+    идут из page cache в сокет без копирования в процесс. Для TLS asyncio
+    сам переходит на обычную запись; без поддержки в loop (uvloop) -
+    чтение кусками в пуле потоков.
+    """
+    loop = asyncio.get_running_loop()
+    file = await loop.run_in_executor(None, open, path, "rb")
+    try:
+        try:
+            sent = await loop.sendfile(request.transport, file, offset, length)
+            # Мимо writer ответа: body_length этих байт не видит
+            request["sendfile_bytes"] = request.get("sendfile_bytes", 0) + sent
+            return
+        except NotImplementedError:
+            pass
+        await loop.run_in_executor(None, file.seek, offset)
+        remaining = length
+        while remaining > 0:
+            chunk = await loop.run_in_executor(
+                None, file.read, min(settings.IMAGE_STREAM_CHUNK_SIZE, remaining)
+            )
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            await response.write(chunk)
+    finally:
+        await loop.run_in_executor(None, file.close)
@@ -0,0 +1,205 @@
+from PIL import Image, UnidentifiedImageError
+from aiohttp import web
+from config import settings
+from utils.formats import AVIF, FORMATS, WEBP, sniff_format
+from utils.metrics import registry
+from functools import lru_cache
+from io import BytesIO
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+import struct
+import warnings
+
+uploads_rejected = registry.counter(
+    "upload_rejected_total",
+    "Загрузки, отклоненные до декодирования изображения",
+    ("reason",),
+)
+
+# Меньше первый разбор не запускается: сигнатуре нужно 12 байт,
+# а куски multipart бывают совсем короткими
+HEADER_MIN_BYTES = 1024
+
+
+class ImageHeader(NamedTuple):
+    format: str  # имя формата в Pillow
+    content_type: str
+    width: int
+    height: int
+
+
+@lru_cache()
+def allowed_formats() -> FrozenSet[str]:
+    """Форматы Pillow, соответствующие ALLOWED_IMAGE_TYPES."""
+    Image.init()
+    names = {
+        name
+        for name, content_type in Image.MIME.items()
+        if content_type in settings.ALLOWED_IMAGE_TYPES
+    }
+    names.update(
+        f.name
+        for f in FORMATS.values()
+        if f.content_type in settings.ALLOWED_IMAGE_TYPES
+    )
+    return frozenset(names)
+
+
+@lru_cache()
+def _pillow_formats() -> Tuple[str, ...]:
+    # WebP и AVIF Pillow открывает только целиком - их заголовок разбирается
+    # вручную; имена без плагина в этой сборке Pillow не передаются
+    return tuple(
+        name
+        for name in sorted(allowed_formats())
+        if name in Image.OPEN and name not in (WEBP.name, AVIF.name)
+    )
+
+
+def _webp_size(head: bytes) -> Optional[Tuple[int, int]]:
+    # Первый чанк после "RIFF....WEBP": VP8X (расширенный, размер холста),
+    # VP8 (lossy) или VP8L (lossless)
+    chunk = head[12:16]
+    if chunk == b"VP8X" and len(head) >= 30:
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+    if chunk == b"VP8 " and len(head) >= 30 and head[23:26] == b"\x9d\x01\x2a":
+        width = int.from_bytes(head[26:28], "little") & 0x3FFF
+        height = int.from_bytes(head[28:30], "little") & 0x3FFF
+        return width, height
+    if chunk == b"VP8L" and len(head) >= 25 and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    return None
+
+
+def _avif_size(head: bytes) -> Optional[Tuple[int, int]]:
+    # Размеры - в свойствах ispe внутри бокса meta, который идет в начале
+    # файла; у сетки (grid) их несколько, проверяется наибольший
+    offset = 0
+    while offset + 8 <= len(head):
+        size, box = struct.unpack(">I4s", head[offset : offset + 8])
+        if size < 8:
+            return None
+        if box == b"meta":
+            end = offset + size
+            if end > len(head):
+                return None
+            sizes = []
+            found = head.find(b"ispe", offset, end)
+            while found != -1 and found + 16 <= end:
+                sizes.append(struct.unpack(">II", head[found + 8 : found + 16]))
+                found = head.find(b"ispe", found + 4, end)
+            return max(sizes, key=lambda s: s[0] * s[1]) if sizes else None
+        offset += size
+    return None
+
+
+def _pillow_header(head: bytes) -> Tuple[str, Tuple[int, int]]:
+    # Image.open читает только заголовок; пиксели не декодируются.
+    # Свой порог MAX_IMAGE_PIXELS проверяется ниже, предупреждение Pillow лишнее
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        with Image.open(BytesIO(head), formats=_pillow_formats()) as image:
+            return image.format, image.size
+
+
+def _reject(reason: str, error: web.HTTPException) -> web.HTTPException:
+    uploads_rejected.labels(reason).inc()
+    return error
+
+
+def _unsupported(text: str) -> web.HTTPException:
+    return _reject("type", web.HTTPUnsupportedMediaType(reason=text, text=text))
+
+
+def _too_large(pixels: int, text: str) -> web.HTTPException:
+    return _reject(
+        "pixels",
+        web.HTTPRequestEntityTooLarge(
+            max_size=settings.MAX_IMAGE_PIXELS,
+            actual_size=pixels,
+            reason="Image dimensions are too large",
+            text=text,
+        ),
+    )
+
+
+def check_image_header(head: bytes, complete: bool) -> Optional[ImageHeader]:
+    """
+    Формат и размеры по началу файла, без декодирования пикселей.
+    complete - больше данных не будет (конец файла или лимит заголовка).
+    None - заголовок еще не прочитан целиком. Не изображение, формат
+    не из ALLOWED_IMAGE_TYPES - 415; больше MAX_IMAGE_PIXELS - 413.
+    """
+    if len(head) < HEADER_MIN_BYTES and not complete:
+        return None
+
+    image_format = sniff_format(head)
+    if image_format is not None and image_format.name not in allowed_formats():
+        raise _unsupported(f"Image type {image_format.content_type} is not allowed")
+
+    if image_format is WEBP or image_format is AVIF:
+        size = (_webp_size if image_format is WEBP else _avif_size)(head)
+        name = image_format.name
+    else:
+        try:
+            name, size = _pillow_header(head)
+        except Image.DecompressionBombError as e:
+            # Порог Pillow - 2 x MAX_IMAGE_PIXELS, см. image_processor
+            raise _too_large(0, str(e))
+        except UnidentifiedImageError:
+            if image_format is None:
+                # Ни одна сигнатура из разрешенных форматов не подошла
+                raise _unsupported("File is not a supported image")
+            size = None
+        except (OSError, SyntaxError, ValueError):
+            # Заголовок обрезан: JPEG с крупными EXIF/ICC до SOF
+            size = None
+
+    if size is None:
+        if complete:
+            raise _unsupported("Image header is corrupt or too large")
+        return None
+
+    width, height = size
+    if width <= 0 or height <= 0:
+        raise _unsupported("Image header is corrupt or too large")
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        raise _too_large(
+            width * height,
+            f"Image is too large: {width}x{height}, "
+            f"max {settings.MAX_IMAGE_PIXELS} pixels",
+        )
+
+    content_type = FORMATS[name].content_type if name in FORMATS else Image.MIME[name]
+    return ImageHeader(name, content_type, width, height)
+
+
+class ImageHeaderReader:
+    """
+    Проверка заголовка по мере чтения потока: feed() для каждого куска,
+    finish() в конце. Ошибка выбрасывается, как только заголовок разобран,
+    до чтения остального файла.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes or settings.UPLOAD_HEADER_MAX_BYTES
+        self.head = bytearray()
+        self.header: Optional[ImageHeader] = None
+        # Разбор повторяется при удвоении накопленного, а не на каждый кусок
+        self._next_attempt = HEADER_MIN_BYTES
+
+    def feed(self, chunk: bytes) -> Optional[ImageHeader]:
+        if self.header is None:
+            self.head += chunk[: self.max_bytes - len(self.head)]
+            complete = len(self.head) >= self.max_bytes
+            if complete or len(self.head) >= self._next_attempt:
+                self._next_attempt = len(self.head) * 2
+                self.header = check_image_header(bytes(self.head), complete)
+        return self.header
+
+    def finish(self) -> ImageHeader:
+        if self.header is None:
+            self.header = check_image_header(bytes(self.head), complete=True)
+        return self.header
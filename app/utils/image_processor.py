@@ -1,36 +1,463 @@
 from PIL import Image
 from io import BytesIO
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from aiohttp import web
+from config import settings
+from utils.formats import FORMATS, PNG, ImageFormat, master_format
+from utils.metrics import registry
+import multiprocessing
 import asyncio
+import math
+import time
+import os
 
+jobs_rejected = registry.counter(
+    "image_processing_rejected_total", "Задачи обработки, отклоненные из-за очереди"
+)
+jobs_timed_out = registry.counter(
+    "image_processing_timeouts_total", "Задачи обработки, превысившие таймаут"
+)
+job_seconds = registry.histogram(
+    "image_processing_job_seconds", "Время задачи обработки с учетом очереди"
+)
+jobs_pending = registry.gauge(
+    "image_processing_pending", "Задачи обработки в работе и в очереди"
+)
+stage_seconds = registry.histogram(
+    "image_processing_stage_seconds",
+    "Этапы обработки изображения внутри воркера",
+    ("stage",),
+)
+# wait - очередь executor'а и передача данных между процессами
+STAGES = ("wait", "decode", "convert", "resize", "encode")
+stage_histograms = {stage: stage_seconds.labels(stage) for stage in STAGES}
 
-class ImageProcessor:
-    async def process_image(self, image_data: bytes, params: dict = None) -> bytes:
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            None, self._process_image_sync, image_data, params
+
+# Тот же порог, что при проверке заголовка загрузки (utils.image_header):
+# изображения из очереди и хранилища Pillow проверяет сам при открытии
+Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
+
+# Режимы, которые можно конвертировать в RGB после уменьшения: масштабирование
+# L и последующее копирование канала дают тот же результат. Палитру,
+# 1-битные изображения и альфа-канал нужно конвертировать до resize
+CONVERT_AFTER_RESIZE = {"L"}
+# Pillow масштабирует их только методом NEAREST
+NO_LANCZOS_MODES = {"1", "P"}
+ALPHA_MODES = {"RGBA", "RGBa", "LA", "La", "PA"}
+
+
+def _target_mode(
+    image: Image.Image, output_format: ImageFormat, resizing: bool
+) -> Optional[str]:
+    """Режим, в который нужно конвертировать перед сохранением, или None."""
+    if image.mode in output_format.modes and not (
+        resizing and image.mode in NO_LANCZOS_MODES
+    ):
+        return None
+    has_alpha = image.mode in ALPHA_MODES or "transparency" in image.info
+    return "RGBA" if output_format.alpha and has_alpha else "RGB"
+
+
+def _save_options(output_format: ImageFormat, quality: int) -> dict:
+    if output_format.name == "JPEG":
+        return {
+            "quality": quality,
+            "optimize": True,
+            "progressive": settings.IMAGE_PROGRESSIVE_JPEG,
+        }
+    if output_format.name in ("WEBP", "AVIF"):
+        return {"quality": quality}
+    # PNG и GIF сжимаются без потерь, quality к ним не применяется
+    return {"optimize": True}
+
+
+def _plan_resize(
+    size: Tuple[int, int], params: dict
+) -> Tuple[Tuple[int, int], Tuple[float, float, float, float]]:
+    """
+    Итоговый размер и используемая область исходника, до декодирования.
+    fit=fill - точно в x*y (поведение загрузки по умолчанию),
+    contain - вписать с сохранением пропорций (как ImageOps.contain),
+    cover - заполнить с обрезкой по центру (как ImageOps.fit).
+    contain и cover не увеличивают изображение больше исходного.
+    """
+    width, height = size
+    box = (0.0, 0.0, float(width), float(height))
+    fit = params.get("fit", "fill")
+    if fit == "fill":
+        return (params.get("x", width), params.get("y", height)), box
+
+    x = min(params.get("x", width), width)
+    y = min(params.get("y", height), height)
+    source_ratio = width / height
+    target_ratio = x / y
+
+    if fit == "cover" and "x" in params and "y" in params:
+        if source_ratio == target_ratio:
+            crop_width, crop_height = width, height
+        elif source_ratio > target_ratio:
+            crop_width, crop_height = target_ratio * height, height
+        else:
+            crop_width, crop_height = width, width / target_ratio
+        left = (width - crop_width) / 2
+        top = (height - crop_height) / 2
+        return (x, y), (left, top, left + crop_width, top + crop_height)
+
+    # Не меньше 1 пикселя, как в Image.thumbnail: у панорамы 4000x10
+    # при ширине 100 высота округлилась бы до 0
+    if source_ratio > target_ratio:
+        y = max(1, round(height / width * x))
+    elif source_ratio < target_ratio:
+        x = max(1, round(width / height * y))
+    return (x, y), box
+
+
+def _draft(
+    image: Image.Image,
+    target: Tuple[int, int],
+    box: Tuple[float, float, float, float],
+    gap: float,
+) -> Tuple[float, float, float, float]:
+    """
+    Декодирование JPEG в уменьшенном масштабе DCT (1/2, 1/4, 1/8), если
+    в области box останется не меньше gap * target пикселей.
+    Возвращает box в координатах уменьшенного изображения.
+    """
+    box_width, box_height = box[2] - box[0], box[3] - box[1]
+    requested = (
+        math.ceil(image.width * target[0] * gap / box_width),
+        math.ceil(image.height * target[1] * gap / box_height),
+    )
+    original_width = image.width
+    drafted = image.draft(None, requested)
+    if not drafted:
+        return box
+    scale = drafted[1][2] / original_width
+    return tuple(value * scale for value in box)
+
+
+def _prepare(
+    source: Union[bytes, BinaryIO], params: Optional[dict], timings: Dict[str, float]
+) -> Tuple[Image.Image, ImageFormat]:
+    """Декодирование, конвертация и resize; возвращает кадр и формат сохранения."""
+    start = time.perf_counter()
+
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+
+    # Pillow читает исходный поток сам, без промежуточной копии в памяти
+    image = Image.open(source)
+    is_jpeg = image.format == "JPEG"
+    if params and params.get("format"):
+        output_format = FORMATS[params["format"]]
+    else:
+        output_format = master_format(image.format)
+
+    # Операции планируются до декодирования: от итогового размера
+    # зависит, в каком масштабе декодировать JPEG
+    plan = None
+    if params and ("x" in params or "y" in params):
+        plan = _plan_resize(image.size, params)
+    gap = settings.IMAGE_REDUCING_GAP or None
+    if plan is not None and is_jpeg and gap:
+        plan = plan[0], _draft(image, plan[0], plan[1], gap)
+    image.load()
+    now = time.perf_counter()
+    timings["decode"], start = now - start, now
+
+    # Конвертация нужна только режимам, которые выходной формат не сохраняет
+    mode = _target_mode(image, output_format, resizing=plan is not None)
+    convert_later = False
+    if mode is not None:
+        if plan is not None and mode == "RGB" and image.mode in CONVERT_AFTER_RESIZE:
+            convert_later = True
+        else:
+            image = image.convert(mode)
+    now = time.perf_counter()
+    timings["convert"], start = now - start, now
+
+    if plan is not None:
+        # reducing_gap: сначала целочисленный reduce(), затем LANCZOS
+        # с размера не меньше gap * target
+        target, box = plan
+        image = image.resize(target, Image.LANCZOS, box=box, reducing_gap=gap)
+        if convert_later:
+            image = image.convert(mode)
+        timings["resize"] = time.perf_counter() - start
+
+    return image, output_format
+
+
+def _encode(image: Image.Image, output_format: ImageFormat, quality: int) -> BytesIO:
+    # Сохранение в буфер; вызывающий код читает его напрямую, без getvalue()
+    output = BytesIO()
+    image.save(
+        output, format=output_format.name, **_save_options(output_format, quality)
+    )
+    output.seek(0)
+    return output
+
+
+def process_image_timed(
+    source: Union[bytes, BinaryIO], params: Optional[dict] = None
+) -> Tuple[BytesIO, Dict[str, float]]:
+    """
+    Обработка на стороне воркера. Функция модульного уровня,
+    чтобы ее можно было передать в ProcessPoolExecutor.
+    Метрики воркера-процесса недоступны основному процессу,
+    поэтому время этапов возвращается вместе с результатом.
+    params["format"] - имя формата из FORMATS; без него результат
+    сохраняется в формате исходника (см. master_format).
+    """
+    timings = {}
+    image, output_format = _prepare(source, params, timings)
+    start = time.perf_counter()
+    quality = params.get("quality", 85) if params else 85
+    output = _encode(image, output_format, quality)
+    timings["encode"] = time.perf_counter() - start
+    return output, timings
+
+
+class PresetOutput(NamedTuple):
+    preset: str
+    format: str  # имя формата из FORMATS
+    data: BytesIO
+    size: Tuple[int, int]
+
+
+def _pick_frame(
+    frames: List[Image.Image],
+    size: Tuple[int, int],
+    target: Tuple[int, int],
+    box: Tuple[float, float, float, float],
+) -> Tuple[Image.Image, Tuple[float, float, float, float]]:
+    """
+    Наименьший из готовых кадров, в котором область box (в координатах
+    кадра size) не меньше target. frames упорядочены по убыванию размера,
+    frames[0] - полный кадр, подходит всегда.
+    """
+    for frame in reversed(frames[1:]):
+        scale_x, scale_y = frame.width / size[0], frame.height / size[1]
+        scaled = (
+            box[0] * scale_x,
+            box[1] * scale_y,
+            box[2] * scale_x,
+            box[3] * scale_y,
+        )
+        if scaled[2] - scaled[0] >= target[0] and scaled[3] - scaled[1] >= target[1]:
+            return frame, scaled
+    return frames[0], box
+
+
+def process_upload_timed(
+    source: Union[bytes, BinaryIO],
+    params: Optional[dict],
+    presets: Dict[str, dict],
+    formats: Sequence[str],
+) -> Tuple[Tuple[BytesIO, List[PresetOutput]], Dict[str, float]]:
+    """
+    Мастер и версии-пресеты за одно декодирование исходника. Пресеты
+    строятся от большего к меньшему, и каждый уменьшается из наименьшего
+    уже готового кадра, которого для него достаточно, а не из полного
+    размера. Пресет сохраняется в формате мастера и в formats.
+    """
+    timings = {}
+    image, output_format = _prepare(source, params, timings)
+    start = time.perf_counter()
+    quality = params.get("quality", 85) if params else 85
+    master = _encode(image, output_format, quality)
+    encode_seconds = time.perf_counter() - start
+
+    outputs = []
+    resize_seconds = 0.0
+    if presets:
+        start = time.perf_counter()
+        base = image
+        # Палитра, 1 бит, CMYK и т.п. переводятся в RGB(A) один раз до всех
+        # resize; L, LA, RGB и RGBA масштабируются LANCZOS как есть
+        mode = _target_mode(base, PNG, resizing=True)
+        if mode is not None:
+            base = base.convert(mode)
+        plans = {
+            name: _plan_resize(base.size, preset) for name, preset in presets.items()
+        }
+        order = sorted(
+            presets,
+            key=lambda name: plans[name][0][0] * plans[name][0][1],
+            reverse=True,
         )
+        names = [output_format.name]
+        names += [name for name in formats if name != output_format.name]
+        # Только кадры без обрезки и искажения пропорций годятся как источник
+        frames = [base]
+        gap = settings.IMAGE_REDUCING_GAP or None
+        resize_seconds += time.perf_counter() - start
+        for preset in order:
+            start = time.perf_counter()
+            target, box = plans[preset]
+            frame, box = _pick_frame(frames, base.size, target, box)
+            resized = frame.resize(target, Image.LANCZOS, box=box, reducing_gap=gap)
+            if presets[preset].get("fit") == "contain":
+                frames.append(resized)
+            now = time.perf_counter()
+            resize_seconds, start = resize_seconds + now - start, now
+            for name in names:
+                preset_format = FORMATS[name]
+                mode = _target_mode(resized, preset_format, resizing=False)
+                converted = resized.convert(mode) if mode is not None else resized
+                data = _encode(converted, preset_format, presets[preset]["quality"])
+                outputs.append(PresetOutput(preset, name, data, target))
+            encode_seconds += time.perf_counter() - start
 
-    def _process_image_sync(self, image_data: bytes, params: dict) -> bytes:
-        image = Image.open(BytesIO(image_data))
+    if presets:
+        timings["resize"] = timings.get("resize", 0.0) + resize_seconds
+    timings["encode"] = encode_seconds
+    return (master, outputs), timings
+
+
+def process_image_sync(
+    source: Union[bytes, BinaryIO], params: Optional[dict] = None
+) -> BytesIO:
+    return process_image_timed(source, params)[0]
+
+
+def _observe_stages(timings: Dict[str, float], elapsed: float) -> None:
+    for stage, seconds in timings.items():
+        stage_histograms[stage].observe(seconds)
+    stage_histograms["wait"].observe(max(elapsed - sum(timings.values()), 0.0))
+
+
+class ImageProcessor:
+    """
+    Движок обработки изображений с собственным пулом и контролем допуска.
+    Без start() работает как раньше - через executor по умолчанию.
+    """
 
-        # Конвертация в JPEG если нужно
-        if image.format != "JPEG":
-            image = image.convert("RGB")
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        timeout: Optional[float] = None,
+        mode: Optional[str] = None,
+    ):
+        # По умолчанию ядра делятся между воркерами веб-сервера
+        self.workers = (
+            workers
+            or settings.IMAGE_WORKERS
+            or max((os.cpu_count() or 1) // settings.web_workers, 1)
+        )
+        self.max_queue = settings.IMAGE_MAX_QUEUE if max_queue is None else max_queue
+        self.timeout = timeout or settings.IMAGE_JOB_TIMEOUT
+        self.mode = mode or settings.IMAGE_EXECUTOR
+        self.executor: Optional[Executor] = None
+        self.pending = 0
 
-        # Применение параметров компрессии
-        if params:
-            if "x" in params or "y" in params:
-                x = params.get("x", image.width)
-                y = params.get("y", image.height)
-                image = image.resize((x, y), Image.LANCZOS)
+    @property
+    def uses_processes(self) -> bool:
+        return isinstance(self.executor, ProcessPoolExecutor)
 
-            quality = params.get("quality", 85)
+    def start(self) -> "ImageProcessor":
+        if self.mode == "process":
+            # spawn: fork процесса с запущенным event loop и потоками небезопасен
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
         else:
-            quality = 85
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="image"
+            )
+        return self
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def _reject(self, reason: str) -> web.HTTPServiceUnavailable:
+        return web.HTTPServiceUnavailable(
+            reason=reason, headers={"Retry-After": str(settings.RETRY_AFTER)}
+        )
+
+    def _check_queue(self) -> None:
+        if self.pending >= self.workers + self.max_queue:
+            jobs_rejected.inc()
+            raise self._reject("Image processing queue is full")
+
+    async def _run(self, func: Callable, source: Union[bytes, BinaryIO], *args):
+        """Запуск функции воркера (..._timed) с контролем очереди и таймаутом."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        if self.executor is None:
+            output, timings = await loop.run_in_executor(None, func, source, *args)
+            _observe_stages(timings, time.perf_counter() - start)
+            return output
+
+        # Полная очередь отклоняет задачу до чтения загрузки в память
+        self._check_queue()
+        if self.uses_processes and not isinstance(source, (bytes, bytearray)):
+            # Файловые объекты не передаются между процессами; файл загрузки
+            # может лежать на диске, поэтому читается не в event loop
+            source = await loop.run_in_executor(None, source.read)
+            # Пока шло чтение, очередь могли занять: повторная проверка,
+            # между ней и submit нет await
+            self._check_queue()
+
+        job = self.executor.submit(func, source, *args)
+        # Счетчик уменьшается по фактическому завершению задачи,
+        # а не по таймауту ожидания: зависшая задача продолжает занимать воркер
+        self.pending += 1
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._job_done))
+        try:
+            output, timings = await asyncio.wait_for(
+                asyncio.wrap_future(job), self.timeout
+            )
+        except asyncio.TimeoutError:
+            jobs_timed_out.inc()
+            raise self._reject("Image processing timed out")
+        finally:
+            elapsed = time.perf_counter() - start
+            job_seconds.observe(elapsed)
+        _observe_stages(timings, elapsed)
+        return output
+
+    async def process_image(
+        self, source: Union[bytes, BinaryIO], params: dict = None
+    ) -> BytesIO:
+        return await self._run(process_image_timed, source, params)
+
+    async def process_upload(
+        self,
+        source: Union[bytes, BinaryIO],
+        params: Optional[dict],
+        presets: Dict[str, dict],
+        formats: Sequence[str] = (),
+    ) -> Tuple[BytesIO, List[PresetOutput]]:
+        """Мастер и пресеты одной задачей, см. process_upload_timed."""
+        return await self._run(
+            process_upload_timed, source, params, presets, tuple(formats)
+        )
+
+    def _job_done(self) -> None:
+        self.pending -= 1
+
+
+async def init_image_processor(app: web.Application) -> None:
+    processor = ImageProcessor().start()
+    jobs_pending.set_function(lambda: processor.pending)
+    app["image_processor"] = processor
 
-        # Сохранение в буфер
-        output = BytesIO()
-        image.save(output, format="JPEG", quality=quality, optimize=True)
-        output.seek(0)
 
-        return output.getvalue()
+async def close_image_processor(app: web.Application) -> None:
+    app["image_processor"].close()
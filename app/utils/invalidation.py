@@ -0,0 +1,14 @@
+from sqlalchemy import Select, func, select
+import json
+
+# Канал PostgreSQL, по которому воркеры сбрасывают записи своих кэшей
+CHANNEL = "cache_invalidation"
+
+
+def invalidation_notice(kind: str, **values) -> Select:
+    """
+    SELECT pg_notify(...) для выполнения в транзакции изменения: PostgreSQL
+    доставляет уведомление только после commit, при откате - не доставляет.
+    """
+    payload = json.dumps({"kind": kind, **values}, separators=(",", ":"))
+    return select(func.pg_notify(CHANNEL, payload))
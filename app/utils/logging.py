@@ -1,4 +1,7 @@
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 
 class CustomFormatter(logging.Formatter):
@@ -8,12 +11,51 @@ class CustomFormatter(logging.Formatter):
         return super().format(record)
 
 
+class SinkHandler(logging.Handler):
+    """
+    Передает запись в приемник (LogSink) без форматирования и ввода-вывода.
+    Форматирование выполняется фоновой задачей приемника.
+    """
+
+    def __init__(self, sink, level=logging.NOTSET):
+        super().__init__(level)
+        self.sink = sink
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.sink.submit(record)
+        except Exception:
+            self.handleError(record)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в prepare(): стандартный форматирует
+    сообщение и traceback в вызывающем потоке, то есть в event loop, и
+    стирает args и exc_info для остальных обработчиков. Здесь запись уходит
+    в очередь как есть и форматируется в потоке QueueListener, поэтому
+    аргументы сообщения передаются отдельно (logger.info("... %s", value))
+    и должны быть неизменяемыми.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-handler = logging.StreamHandler()
+# Запись в stderr выполняет отдельный поток, а не event loop
+stream_handler = logging.StreamHandler()
 formatter = CustomFormatter(
     "%(asctime)s,%(msecs)d: %(route)s: %(functionName)s: %(levelname)s: %(message)s"
 )
-handler.setFormatter(formatter)
+stream_handler.setFormatter(formatter)
+
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+handler = DeferredQueueHandler(log_queue)
 logger.addHandler(handler)
+
+listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
@@ -0,0 +1,408 @@
+from aiohttp import web
+from bisect import bisect_left
+from config import settings
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    parts = []
+    for name, value in labels:
+        value = (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # Последняя ячейка - переполнение (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def collect(self) -> Iterable[Tuple[str, tuple, float]]:
+        for values, child in list(self._children.items()):
+            yield "", tuple(zip(self.labelnames, values)), child.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set_function(self, function: Optional[Callable[[], float]]) -> None:
+        """Значение вычисляется в момент сбора метрик."""
+        self._function = function
+
+    def collect(self):
+        if self._function is not None:
+            yield "", (), self._function()
+            return
+        yield from super().collect()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def collect(self):
+        for values, child in list(self._children.items()):
+            labels = tuple(zip(self.labelnames, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                yield "_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield "_sum", labels, child.sum
+            yield "_count", labels, child.count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=(), function=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        """Текущие значения в виде, пригодном для JSON и объединения."""
+        return {
+            metric.name: {
+                "kind": metric.kind,
+                "help": metric.documentation,
+                "samples": [
+                    [suffix, [list(label) for label in labels], value]
+                    for suffix, labels, value in metric.collect()
+                ],
+            }
+            for metric in self._metrics.values()
+        }
+
+    def render(self) -> str:
+        return render_snapshot(self.snapshot())
+
+
+def merge_snapshots(snapshots: Iterable[dict], keep_gauges: bool = True) -> dict:
+    """
+    Сумма снимков нескольких процессов. Счетчики и гистограммы складываются
+    (бакеты гистограмм накопительные, поэтому сумма корректна), gauge - тоже:
+    соединения, задачи в очереди и т.п. суммируются по воркерам.
+    keep_gauges=False - для снимков завершившихся процессов.
+    """
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if not keep_gauges and metric["kind"] == "gauge":
+                continue
+            target = merged.setdefault(
+                name, {"kind": metric["kind"], "help": metric["help"], "values": {}}
+            )
+            values = target["values"]
+            for suffix, labels, value in metric["samples"]:
+                key = (suffix, tuple(tuple(label) for label in labels))
+                values[key] = values.get(key, 0.0) + value
+    return {
+        name: {
+            "kind": metric["kind"],
+            "help": metric["help"],
+            "samples": [
+                [suffix, [list(label) for label in labels], value]
+                for (suffix, labels), value in metric["values"].items()
+            ],
+        }
+        for name, metric in merged.items()
+    }
+
+
+def render_snapshot(snapshot: dict) -> str:
+    """Текстовый формат Prometheus (version 0.0.4)."""
+    lines = []
+    for name, metric in snapshot.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for suffix, labels, value in metric["samples"]:
+            lines.append(
+                f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+RETIRED_SNAPSHOT = "retired.json"
+
+
+def _load_snapshot(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Файл удален или переписывается другим процессом
+        return None
+
+
+def _write_snapshot(path: str, snapshot: dict) -> None:
+    # Свой временный файл на каждую запись: снимок процесса одновременно
+    # пишут периодическая задача (loop) и /metrics (executor)
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory or None, prefix=f"{name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def retire_snapshot(directory: str, pid: int) -> None:
+    """
+    Вызывается лаунчером после выхода воркера: его счетчики переносятся
+    в общий файл, чтобы сумма по процессам не уменьшалась при перезапуске.
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    snapshot = _load_snapshot(path)
+    if snapshot is None:
+        return
+    retired_path = os.path.join(directory, RETIRED_SNAPSHOT)
+    retired = _load_snapshot(retired_path) or {}
+    _write_snapshot(
+        retired_path, merge_snapshots([retired, snapshot], keep_gauges=False)
+    )
+    os.remove(path)
+
+
+@dataclass
+class MetricsExporter:
+    """
+    В режиме нескольких воркеров каждый процесс периодически пишет снимок
+    своих метрик в METRICS_DIR, а /metrics любого воркера отдает сумму.
+    Без каталога работает как обычный registry.render().
+    """
+
+    registry: MetricsRegistry
+    directory: Optional[str] = None
+    interval: float = 5.0
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"{os.getpid()}.json")
+
+    def write(self) -> None:
+        _write_snapshot(self.path, self.registry.snapshot())
+
+    def _render_all(self, snapshot: dict) -> str:
+        # Свой снимок берется из памяти, с диска - только других процессов
+        own = os.path.basename(self.path)
+        try:
+            _write_snapshot(self.path, snapshot)
+            names = sorted(os.listdir(self.directory))
+        except OSError as e:
+            logger.warning(f"Metrics snapshot failed: {e}")
+            names = []
+        snapshots: List[dict] = []
+        for name in names:
+            if name.endswith(".json") and name != own:
+                other = _load_snapshot(os.path.join(self.directory, name))
+                if other is not None:
+                    snapshots.append(other)
+        snapshots.append(snapshot)
+        return render_snapshot(merge_snapshots(snapshots))
+
+    async def render(self) -> str:
+        if not self.directory:
+            return self.registry.render()
+        # Снимок - в потоке loop: метрики меняются только в нем
+        snapshot = self.registry.snapshot()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._render_all, snapshot)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning(f"Metrics snapshot failed: {e}")
+
+    def start(self) -> "MetricsExporter":
+        if self.directory:
+            self.write()
+            self.task = asyncio.ensure_future(self._run())
+        return self
+
+    async def close(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        # Последние значения заберет лаунчер (retire_snapshot)
+        self.write()
+
+
+registry = MetricsRegistry()
+
+
+async def init_metrics(app: web.Application) -> None:
+    app["metrics_exporter"] = MetricsExporter(
+        registry, settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL
+    ).start()
+
+
+async def close_metrics(app: web.Application) -> None:
+    await app["metrics_exporter"].close()
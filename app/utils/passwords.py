@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from aiohttp import web
+from typing import Optional, Tuple
+from config import settings
+from utils.metrics import registry
+import asyncio
+import functools
+import time
+
+# min/max = default: хэши с другой стоимостью считаются устаревшими
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+hash_rejected = registry.counter(
+    "password_hash_rejected_total", "Операции bcrypt, отклоненные из-за очереди"
+)
+hash_seconds = registry.histogram(
+    "password_hash_seconds", "Время операции bcrypt с учетом очереди", ("operation",)
+)
+hash_pending = registry.gauge(
+    "password_hash_pending", "Операции bcrypt в работе и в очереди"
+)
+hash_queued = registry.gauge(
+    "password_hash_queued", "Операции bcrypt, ожидающие свободного потока"
+)
+
+
+class PasswordHasher:
+    """
+    Хэширование и проверка паролей в отдельном ограниченном пуле потоков
+    (bcrypt отпускает GIL). Без start() использует executor по умолчанию.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.workers = workers or settings.PASSWORD_HASH_WORKERS
+        self.max_queue = (
+            settings.PASSWORD_HASH_MAX_QUEUE if max_queue is None else max_queue
+        )
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+
+    def start(self) -> "PasswordHasher":
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="bcrypt"
+        )
+        return self
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    @property
+    def queued(self) -> int:
+        return max(self.pending - self.workers, 0)
+
+    async def _run(self, operation: str, func, *args):
+        if self.executor is not None and self.pending >= self.workers + self.max_queue:
+            hash_rejected.inc()
+            raise web.HTTPServiceUnavailable(
+                reason="Too many authentication requests",
+                headers={"Retry-After": str(settings.RETRY_AFTER)},
+            )
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(
+                self.executor, functools.partial(func, *args)
+            )
+        finally:
+            self.pending -= 1
+            hash_seconds.labels(operation).observe(time.perf_counter() - start)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", pwd_context.hash, password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """(верен ли пароль, новый хэш если стоимость отличается от BCRYPT_ROUNDS)."""
+        return await self._run(
+            "verify", pwd_context.verify_and_update, password, hashed_password
+        )
+
+    async def dummy_verify(self) -> None:
+        # Выравнивает время ответа для несуществующих пользователей
+        await self._run("verify", pwd_context.dummy_verify)
+
+
+async def init_password_hasher(app: web.Application) -> None:
+    hasher = PasswordHasher().start()
+    hash_pending.set_function(lambda: hasher.pending)
+    hash_queued.set_function(lambda: hasher.queued)
+    app["password_hasher"] = hasher
+
+
+async def close_password_hasher(app: web.Application) -> None:
+    app["password_hasher"].close()
@@ -0,0 +1,68 @@
+from aiohttp import web, BodyPartReader
+from tempfile import SpooledTemporaryFile
+from typing import Tuple
+from config import settings
+from utils.image_header import ImageHeader, ImageHeaderReader, uploads_rejected
+from utils.metrics import registry
+import asyncio
+import hashlib
+import time
+
+read_seconds = registry.histogram(
+    "upload_read_seconds", "Чтение файла из multipart во временный буфер"
+)
+
+
+async def read_field_to_spool(
+    field: BodyPartReader, max_size: int = None, chunk_size: int = 64 * 1024
+) -> Tuple[SpooledTemporaryFile, int, str, ImageHeader]:
+    """
+    Читает часть multipart по кускам в SpooledTemporaryFile.
+    Небольшие файлы остаются в памяти, крупные уходят на диск.
+    Лимит размера проверяется во время чтения, а не после; формат
+    и размеры изображения - по первым кускам, до чтения остального файла.
+    Запись на диск идет в пуле потоков, а не в event loop.
+    Возвращает (файл, размер, sha256 содержимого, заголовок изображения).
+    """
+    max_size = max_size or settings.MAX_IMAGE_SIZE
+    max_memory = settings.UPLOAD_SPOOL_MAX_MEMORY
+    spool = SpooledTemporaryFile(max_size=max_memory)
+    on_disk = False
+    loop = asyncio.get_running_loop()
+    size = 0
+    digest = hashlib.sha256()
+    header_reader = ImageHeaderReader()
+    start = time.perf_counter()
+    try:
+        while True:
+            chunk = await field.read_chunk(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                uploads_rejected.labels("size").inc()
+                raise web.HTTPRequestEntityTooLarge(
+                    max_size=max_size, actual_size=size
+                )
+            header_reader.feed(chunk)
+            if not on_disk and max_memory and size > max_memory:
+                # Сброс буфера в файл - до записи, иначе его сделал бы write
+                await loop.run_in_executor(None, spool.rollover)
+                on_disk = True
+            if on_disk:
+                await loop.run_in_executor(None, spool.write, chunk)
+            else:
+                spool.write(chunk)
+            digest.update(chunk)
+        header = header_reader.finish()
+    except BaseException as e:
+        spool.close()
+        if isinstance(e, web.HTTPException):
+            # Остаток тела не прочитан: после ответа соединение закрывается,
+            # иначе клиент отправит в него следующий запрос раньше времени
+            e.force_close()
+        raise
+
+    read_seconds.observe(time.perf_counter() - start)
+    spool.seek(0)
+    return spool, size, digest.hexdigest(), header
@@ -0,0 +1,85 @@
+"""
+Общие вспомогательные функции для бенчмарков.
+
+Приложение импортирует модули как `from config import settings`, поэтому
+каталог app/ добавляется в sys.path, а обязательные настройки получают
+значения по умолчанию, указывающие на локальные заглушки.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_DIR = ROOT / "app"
+
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+for key, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "bench",
+    "DB_USER": "bench",
+    "DB_PASSWORD": "bench",
+    "SECRET_KEY": "bench-secret",
+    "MINIO_ENDPOINT": "127.0.0.1:9000",
+    "MINIO_ACCESS_KEY": "bench",
+    "MINIO_SECRET_KEY": "bench-secret",
+    "MINIO_SECURE": "false",
+    "MINIO_BUCKET_NAME": "images",
+}.items():
+    os.environ.setdefault(key, value)
+
+
+def git_revision() -> str:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=ROOT,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(name: str, results: dict, output: str = None) -> dict:
+    """Печатает результаты в JSON и при необходимости сохраняет в файл."""
+    payload = {
+        "benchmark": name,
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    text = json.dumps(payload, indent=2, ensure_ascii=False)
+    if output:
+        Path(output).write_text(text)
+    print(text)
+    return payload
+
+
+async def loop_lag_probe(samples: list, interval: float = 0.005) -> None:
+    """Записывает задержку пробуждения event loop относительно interval."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
@@ -0,0 +1,89 @@
+"""
+Сравнение двух JSON-результатов одного бенчмарка (например, двух коммитов).
+Печатает изменившиеся показатели и завершается с кодом 1, если какой-то
+из них ухудшился больше чем на --threshold процентов.
+
+    python -m benchmarks.e2e_bench --output before.json
+    git checkout <commit>
+    python -m benchmarks.e2e_bench --output after.json
+    python -m benchmarks.compare before.json after.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, Optional
+
+# Поля, по которым опознаются строки в списках прогонов
+ID_FIELDS = ("size", "format", "variant", "concurrency", "workers", "mode")
+# Чем больше, тем лучше; остальные числовые показатели - чем меньше, тем лучше
+HIGHER_IS_BETTER = ("per_sec",)
+# Описательные числа, а не результаты
+IGNORED = ("requests", "repeat", "timestamp", "cpu_count", "source_bytes")
+
+
+def flatten(value, prefix: str = "") -> Dict[str, float]:
+    items = {}
+    if isinstance(value, dict):
+        for key, child in value.items():
+            items.update(flatten(child, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            label = str(index)
+            if isinstance(child, dict):
+                ids = [f"{name}={child[name]}" for name in ID_FIELDS if name in child]
+                label = ",".join(ids) or label
+            items.update(flatten(child, f"{prefix}[{label}]"))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        items[prefix] = float(value)
+    return items
+
+
+def _change(name: str, before: float, after: float) -> Optional[float]:
+    """Изменение в процентах, положительное - ухудшение."""
+    if before == 0:
+        return None
+    delta = (after - before) / abs(before) * 100
+    if any(marker in name for marker in HIGHER_IS_BETTER):
+        delta = -delta
+    return delta
+
+
+def main(args) -> int:
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if before.get("benchmark") != after.get("benchmark"):
+        print("Results belong to different benchmarks", file=sys.stderr)
+        return 2
+
+    print(
+        f"{before['benchmark']}: {before.get('revision')} -> {after.get('revision')}"
+    )
+    old, new = flatten(before["results"]), flatten(after["results"])
+    regressions = 0
+    for name in sorted(old.keys() & new.keys()):
+        if name.rsplit(".", 1)[-1] in IGNORED:
+            continue
+        change = _change(name, old[name], new[name])
+        if change is None or abs(change) < args.min_change:
+            continue
+        marker = ""
+        if change > args.threshold:
+            marker = "  REGRESSION"
+            regressions += 1
+        delta = (new[name] - old[name]) / abs(old[name]) * 100
+        print(f"{name}: {old[name]:g} -> {new[name]:g} ({delta:+.1f}%){marker}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument(
+        "--min-change", type=float, default=2.0, help="не печатать изменения меньше, %%"
+    )
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,322 @@
+"""
+Заглушка PostgreSQL для бенчмарков: репозитории в памяти процесса.
+
+Повторяют интерфейс ImageRepository и UserRepository, поэтому сервисы,
+middleware и маршруты работают без изменений. Задержка сети до БД
+имитируется параметром latency (на каждый запрос и commit), сброс WAL
+на диск - commit_latency: commit-ы ждут его по очереди, как fsync.
+Транзакций нет: изменения видны сразу, rollback ничего не отменяет.
+"""
+
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+
+@dataclass
+class MemoryDatabase:
+    latency: float = 0.0
+    commit_latency: float = 0.0
+    images: Dict[int, object] = field(default_factory=dict)
+    stored: Dict[Tuple[str, str], object] = field(default_factory=dict)
+    renditions: Dict[str, List[object]] = field(default_factory=dict)
+    users: Dict[int, object] = field(default_factory=dict)
+    ids: itertools.count = field(default_factory=lambda: itertools.count(1))
+    roundtrips: int = 0
+    commits: int = 0
+    wal_lock: Optional[asyncio.Lock] = None  # создается в loop, где работает БД
+
+    async def roundtrip(self) -> None:
+        self.roundtrips += 1
+        await asyncio.sleep(self.latency)
+
+    async def commit(self) -> None:
+        self.commits += 1
+        await self.roundtrip()
+        if self.commit_latency:
+            if self.wal_lock is None:
+                self.wal_lock = asyncio.Lock()
+            async with self.wal_lock:
+                await asyncio.sleep(self.commit_latency)
+
+
+@dataclass
+class MemorySession:
+    db: MemoryDatabase
+
+    async def commit(self) -> None:
+        await self.db.commit()
+
+    async def rollback(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "MemorySession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+@dataclass
+class MemorySessionMaker:
+    db: MemoryDatabase
+
+    def __call__(self) -> MemorySession:
+        return MemorySession(self.db)
+
+
+def _new_row(model, db: MemoryDatabase, **values):
+    now = datetime.utcnow()
+    row = model(**values)
+    row.id = next(db.ids)
+    row.created_at = row.updated_at = now
+    return row
+
+
+@dataclass
+class MemoryImageRepository:
+    session: MemorySession
+
+    @property
+    def db(self) -> MemoryDatabase:
+        return self.session.db
+
+    def _insert(self, image_data):
+        from models.image import ImageModel
+
+        image = _new_row(ImageModel, self.db, **image_data.model_dump())
+        self.db.images[image.id] = image
+        return image
+
+    async def create_image(self, image_data):
+        (image,) = await self.create_images([image_data])
+        await self.session.commit()
+        return image
+
+    async def create_images(self, images) -> list:
+        await self.db.roundtrip()
+        return [self._insert(image) for image in images]
+
+    async def get_image_by_id(self, image_id: int, owner_id: Optional[int] = None):
+        await self.db.roundtrip()
+        image = self.db.images.get(image_id)
+        if image is None or (owner_id is not None and image.owner_id != owner_id):
+            return None
+        return image
+
+    async def get_image_row(self, image_id: int):
+        return await self.get_image_by_id(image_id)
+
+    async def list_images(
+        self,
+        limit: int,
+        owner_id: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> list:
+        await self.db.roundtrip()
+        rows = (
+            image
+            for image in reversed(list(self.db.images.values()))
+            if (owner_id is None or image.owner_id == owner_id)
+            and (after is None or (image.created_at, image.id) < after)
+        )
+        return list(itertools.islice(rows, limit))
+
+    async def get_images_by_ids(
+        self, ids: Sequence[int], owner_id: Optional[int] = None
+    ) -> list:
+        await self.db.roundtrip()
+        rows = (self.db.images.get(image_id) for image_id in ids)
+        return [
+            row
+            for row in rows
+            if row is not None and (owner_id is None or row.owner_id == owner_id)
+        ]
+
+    async def find_stored_objects(
+        self, source_hashes: Sequence[str], params_key: str
+    ) -> dict:
+        await self.db.roundtrip()
+        found = (self.db.stored.get((h, params_key)) for h in source_hashes)
+        return {
+            stored.source_hash: stored
+            for stored in found
+            if stored is not None and stored.ref_count > 0
+        }
+
+    async def acquire_stored_object(
+        self, source_hash: str, params_key: str, count: int = 1
+    ):
+        await self.db.roundtrip()
+        stored = self.db.stored.get((source_hash, params_key))
+        if stored is None or stored.ref_count <= 0:
+            return None
+        stored.ref_count += count
+        return stored
+
+    def _register(self, values: dict):
+        from models.stored_object import StoredObjectModel
+
+        key = (values["source_hash"], values["params_key"])
+        stored = self.db.stored.get(key)
+        if stored is None:
+            stored = self.db.stored[key] = _new_row(
+                StoredObjectModel, self.db, **values
+            )
+        else:
+            stored.ref_count += values["ref_count"]
+        return stored
+
+    async def register_stored_object(
+        self,
+        object_name: str,
+        source_hash: str,
+        params_key: str,
+        content_type: str,
+        size: int,
+    ):
+        await self.db.roundtrip()
+        return self._register(
+            {
+                "object_name": object_name,
+                "source_hash": source_hash,
+                "params_key": params_key,
+                "content_type": content_type,
+                "size": size,
+                "ref_count": 1,
+            }
+        )
+
+    async def register_stored_objects(self, objects: List[dict]) -> dict:
+        await self.db.roundtrip()
+        stored = [self._register(dict(values)) for values in objects]
+        return {(obj.source_hash, obj.params_key): obj for obj in stored}
+
+    async def create_renditions(self, renditions: List[dict]) -> None:
+        from models.rendition import RenditionModel
+
+        if renditions:
+            await self.db.roundtrip()
+        for values in renditions:
+            rows = self.db.renditions.setdefault(values["master_object_name"], [])
+            rows.append(_new_row(RenditionModel, self.db, **values))
+
+    async def get_renditions(self, master_object_name: str) -> list:
+        await self.db.roundtrip()
+        return list(self.db.renditions.get(master_object_name, ()))
+
+    def _remaining(self, image) -> int:
+        for key, stored in list(self.db.stored.items()):
+            if stored.object_name == image.minio_object_name:
+                stored.ref_count -= 1
+                if stored.ref_count <= 0:
+                    del self.db.stored[key]
+                return max(stored.ref_count, 0)
+        return sum(
+            1
+            for row in self.db.images.values()
+            if row.minio_object_name == image.minio_object_name
+        )
+
+    async def delete_image(self, image) -> int:
+        await self.db.roundtrip()
+        self.db.images.pop(image.id, None)
+        remaining = self._remaining(image)
+        if remaining == 0:
+            self.db.renditions.pop(image.minio_object_name, None)
+        return remaining
+
+
+@dataclass
+class MemoryUserRepository:
+    session: MemorySession
+
+    @property
+    def db(self) -> MemoryDatabase:
+        return self.session.db
+
+    async def get_by_id(self, user_id: int):
+        await self.db.roundtrip()
+        return self.db.users.get(user_id)
+
+    get_user_row = get_by_id
+
+    async def _find(self, **criteria):
+        await self.db.roundtrip()
+        for user in self.db.users.values():
+            if all(getattr(user, name) == value for name, value in criteria.items()):
+                return user
+        return None
+
+    async def get_by_username(self, username: str):
+        return await self._find(username=username)
+
+    async def get_by_email(self, email: str):
+        return await self._find(email=email)
+
+    async def create(self, user_data, hashed_password: str):
+        from models.user import UserModel
+
+        await self.db.roundtrip()
+        user = _new_row(
+            UserModel,
+            self.db,
+            username=user_data.username,
+            email=user_data.email,
+            hashed_password=hashed_password,
+            is_active=True,
+            is_superuser=False,
+        )
+        self.db.users[user.id] = user
+        return user
+
+    async def update_password_hash(self, user, hashed_password: str) -> None:
+        await self.db.roundtrip()
+        user.hashed_password = hashed_password
+
+
+def install(app: web.Application, latency: float = 0.0) -> MemoryDatabase:
+    """
+    Подменяет БД в приложении из create_app(): хуки init_db/close_db
+    и классы репозиториев, которые создают зависимости и кэш.
+    """
+    import api.dependencies
+    import database
+    import services.auth_service
+    import services.cache_invalidation
+    import services.cache_service
+    import services.image_writer
+
+    api.dependencies.ImageRepository = MemoryImageRepository
+    api.dependencies.UserRepository = MemoryUserRepository
+    services.auth_service.UserRepository = MemoryUserRepository
+    services.cache_service.ImageRepository = MemoryImageRepository
+    services.image_writer.ImageRepository = MemoryImageRepository
+
+    db = MemoryDatabase(latency=latency)
+
+    async def init_memory_db(app: web.Application) -> None:
+        app["db_sessionmaker"] = MemorySessionMaker(db)
+
+    async def close_memory_db(app: web.Application) -> None:
+        pass
+
+    startup = list(app.on_startup)
+    startup[startup.index(database.init_db)] = init_memory_db
+    app.on_startup.clear()
+    app.on_startup.extend(startup)
+    cleanup = list(app.on_cleanup)
+    cleanup[cleanup.index(database.close_db)] = close_memory_db
+    app.on_cleanup.clear()
+    app.on_cleanup.extend(cleanup)
+    # Уведомлений PostgreSQL нет, кэш - в одном процессе
+    app.on_startup.remove(services.cache_invalidation.init_cache_invalidation)
+    app.on_cleanup.remove(services.cache_invalidation.close_cache_invalidation)
+    return db
@@ -0,0 +1,116 @@
+"""
+Быстрый путь уменьшения: прежняя обработка (полное декодирование,
+convert("RGB"), LANCZOS по всему изображению) против плана с draft()
+для JPEG и reducing_gap. CPU-время и пиковая память на мегапиксель исходника.
+
+Каждый вариант выполняется в отдельном процессе; пик памяти - прирост
+VmHWM относительно RSS перед обработкой (Pillow выделяет память вне
+tracemalloc).
+
+    python -m benchmarks.decode_bench --size 6000x4000 --repeat 5
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from benchmarks._common import write_results
+from benchmarks.e2e_bench import _read_status, _reset_peak
+from benchmarks.image_bench import make_image
+
+
+def legacy_process(source: bytes, params: dict) -> BytesIO:
+    """Обработка до появления плана (для сравнения)."""
+    from PIL import Image, ImageOps
+
+    image = Image.open(BytesIO(source))
+    if image.format != "JPEG":
+        image = image.convert("RGB")
+    fit = params.get("fit", "fill")
+    if fit == "fill":
+        image = image.resize(
+            (params.get("x", image.width), params.get("y", image.height)),
+            Image.LANCZOS,
+        )
+    else:
+        x = min(params.get("x", image.width), image.width)
+        y = min(params.get("y", image.height), image.height)
+        if fit == "cover" and "x" in params and "y" in params:
+            image = ImageOps.fit(image, (x, y), Image.LANCZOS)
+        else:
+            image = ImageOps.contain(image, (x, y), Image.LANCZOS)
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=params.get("quality", 85), optimize=True)
+    return output
+
+
+def _measure(variant: str, source: bytes, params: dict, repeat: int) -> dict:
+    # Выполняется в отдельном процессе
+    from utils.image_processor import process_image_sync
+
+    process = legacy_process if variant == "legacy" else process_image_sync
+    pid = os.getpid()
+    cpu = []
+    peak_kb = 0
+    for _ in range(repeat):
+        _reset_peak(pid)
+        baseline_kb = _read_status(pid)["VmRSS"]
+        start = time.process_time()
+        output = process(source, params)
+        cpu.append(time.process_time() - start)
+        peak_kb = max(peak_kb, _read_status(pid)["VmHWM"] - baseline_kb)
+    return {
+        "cpu_ms": min(cpu) * 1000,
+        "peak_mb": peak_kb / 1024,
+        "output_bytes": output.getbuffer().nbytes,
+    }
+
+
+def run_isolated(variant: str, source: bytes, params: dict, repeat: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_measure, variant, source, params, repeat).result()
+
+
+def main(args) -> None:
+    width, height = (int(v) for v in args.size.split("x"))
+    megapixels = width * height / 1_000_000
+    # Прежняя обработка всегда сохраняла JPEG
+    cases = {
+        "contain_800": {"x": 800, "y": 800, "fit": "contain", "format": "JPEG"},
+        "cover_256": {"x": 256, "y": 256, "fit": "cover", "format": "JPEG"},
+        "fill_1920x1080": {"x": 1920, "y": 1080, "format": "JPEG"},
+    }
+    results = {"source": args.size, "megapixels": megapixels, "runs": []}
+
+    for image_format in args.formats.split(","):
+        source = make_image(width, height, image_format)
+        for name, params in cases.items():
+            run = {"format": image_format, "variant": name}
+            for variant in ("legacy", "planned"):
+                measured = run_isolated(variant, source, params, args.repeat)
+                run[f"{variant}_cpu_ms_per_mp"] = round(
+                    measured["cpu_ms"] / megapixels, 2
+                )
+                run[f"{variant}_peak_mb_per_mp"] = round(
+                    measured["peak_mb"] / megapixels, 2
+                )
+                run[f"{variant}_output_bytes"] = measured["output_bytes"]
+            run["cpu_speedup"] = round(
+                run["legacy_cpu_ms_per_mp"] / max(run["planned_cpu_ms_per_mp"], 0.01), 2
+            )
+            results["runs"].append(run)
+
+    write_results("decode", results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", default="6000x4000")
+    parser.add_argument("--formats", default="JPEG,PNG")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output")
+    main(parser.parse_args())
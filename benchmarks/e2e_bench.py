@@ -0,0 +1,226 @@
+"""
+Сквозной прогон приложения из create_app(): пропускная способность,
+задержки и память сервера при разной конкурентности загрузки и скачивания.
+
+Сервер запускается в отдельном процессе со всеми middleware и хуками;
+PostgreSQL заменяется репозиториями в памяти (db_standin), MinIO -
+S3-заглушкой в том же процессе (--storage minio или tiered) или локальным
+диском во временном каталоге (--storage local). Нагрузку дает основной процесс.
+С --delivery redirect скачивание замеряет только ответ приложения (307
+на presigned URL): сами байты клиент получает из хранилища.
+
+    python -m benchmarks.e2e_bench --concurrency 1,8,32,64 --requests 200
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+import uuid
+
+from benchmarks._common import percentile, write_results
+from benchmarks.processing_bench import make_jpeg
+from benchmarks.s3_standin import S3StandIn
+
+import aiohttp
+
+BENCH_ENV = {
+    "LOG_SINK_ENABLED": "false",
+    # Стоимость bcrypt не относится к сценариям загрузки и скачивания
+    "BCRYPT_ROUNDS": "4",
+    "WEB_WORKERS": "1",
+    # Очередь фоновых задач работает только с PostgreSQL
+    "JOB_WORKERS": "0",
+}
+
+
+def _read_status(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "VmHWM"):
+                values[name] = int(value.split()[0])
+    return values
+
+
+def _reset_peak(pid: int) -> None:
+    # Сброс VmHWM (Linux 4.0+); без прав - пик считается с начала процесса
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _server_main(
+    port: int, storage_port: int, db_latency: float, storage: str, ready
+) -> None:
+    from benchmarks import db_standin
+
+    if storage != "local":
+        S3StandIn(port=storage_port).start()
+
+    from aiohttp import web
+    from main import create_app
+    from server import install_uvloop
+
+    async def serve():
+        app = await create_app()
+        db_standin.install(app, latency=db_latency)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        # SIGTERM - через хуки on_cleanup, чтобы закрыть пулы обработки
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        ready.set()
+        await stop.wait()
+        await runner.cleanup()
+
+    install_uvloop()
+    asyncio.run(serve())
+
+
+def start_server(
+    port: int, db_latency: float, storage: str = "minio", delivery: str = "proxy"
+) -> multiprocessing.Process:
+    # Настройки читаются из окружения при импорте config в дочернем процессе
+    storage_port = S3StandIn._free_port("127.0.0.1")
+    os.environ.update(BENCH_ENV)
+    os.environ["MINIO_ENDPOINT"] = f"127.0.0.1:{storage_port}"
+    os.environ["STORAGE_BACKEND"] = storage
+    os.environ["IMAGE_DELIVERY_MODE"] = delivery
+    os.environ["LOCAL_STORAGE_PATH"] = tempfile.mkdtemp(prefix="e2e-storage-")
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    process = context.Process(
+        target=_server_main,
+        args=(port, storage_port, db_latency, storage, ready),
+    )
+    process.start()
+    if not ready.wait(60):
+        process.terminate()
+        raise RuntimeError("Benchmark server did not start")
+    return process
+
+
+async def _login(session: aiohttp.ClientSession, base: str) -> str:
+    user = {
+        "username": "bench",
+        "email": "bench@example.com",
+        "password": "bench-password",
+    }
+    async with session.post(f"{base}/api/register", json=user) as response:
+        response.raise_for_status()
+        return (await response.json())["access_token"]
+
+
+async def _sweep(session, requests: int, concurrency: int, call) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(index: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call(session, index)
+            except (aiohttp.ClientError, AssertionError):
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "requests_per_sec": round(requests / elapsed, 2),
+        "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "latency_p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def main(args) -> None:
+    width, height = (int(v) for v in args.size.split("x"))
+    source = make_jpeg(width, height)
+    base = f"http://127.0.0.1:{args.port}"
+    server = start_server(
+        args.port, args.db_latency / 1000, args.storage, args.delivery
+    )
+    image_ids = []
+
+    async def upload(session, index):
+        form = aiohttp.FormData()
+        # Хвост после JPEG не мешает декодеру, но дает уникальный sha256:
+        # иначе все загрузки кроме первой ушли бы в дедупликацию
+        form.add_field(
+            "file",
+            source + uuid.uuid4().bytes,
+            filename=f"{index}.jpg",
+            content_type="image/jpeg",
+        )
+        form.add_field("quality", str(args.quality))
+        async with session.post(f"{base}/api/upload", data=form) as response:
+            assert response.status == 200, response.status
+            image_ids.append((await response.json())["id"])
+
+    async def download(session, index):
+        assert image_ids, "no uploaded images to download"
+        image_id = image_ids[index % len(image_ids)]
+        url = f"{base}/api/images/{image_id}"
+        async with session.get(url, allow_redirects=False) as response:
+            assert response.status in (200, 307), response.status
+            await response.read()
+
+    results = {
+        "source": args.size,
+        "db_latency_ms": args.db_latency,
+        "storage": args.storage,
+        "delivery": args.delivery,
+        "upload": [],
+        "download": [],
+    }
+    try:
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            token = await _login(session, base)
+            session.headers["Authorization"] = f"Bearer {token}"
+
+            for scenario, call in (("upload", upload), ("download", download)):
+                for concurrency in (int(v) for v in args.concurrency.split(",")):
+                    _reset_peak(server.pid)
+                    run = await _sweep(session, args.requests, concurrency, call)
+                    memory = _read_status(server.pid)
+                    run["server_rss_mb"] = round(memory["VmRSS"] / 1024, 1)
+                    run["server_peak_rss_mb"] = round(memory["VmHWM"] / 1024, 1)
+                    results[scenario].append(run)
+    finally:
+        server.terminate()
+        server.join()
+
+    write_results("e2e", results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--size", default="1920x1080")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--db-latency", type=float, default=0.5, help="мс на запрос")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--storage", choices=("minio", "local", "tiered"), default="minio"
+    )
+    parser.add_argument("--delivery", choices=("proxy", "redirect"), default="proxy")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
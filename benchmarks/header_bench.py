@@ -0,0 +1,99 @@
+"""
+Проверка загрузки по заголовку: ImageHeaderReader на первых кусках файла
+против прежнего пути, в котором файл читался целиком и отдавался Pillow
+на полное декодирование. Время и объем прочитанных данных до решения
+для обычного изображения, мусора и бомбы распаковки (заголовок PNG
+на 100 Мп при нескольких десятках КБ данных).
+
+    python -m benchmarks.header_bench --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import time
+from io import BytesIO
+
+from benchmarks._common import write_results
+from benchmarks.image_bench import make_image
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _check(data: bytes) -> tuple:
+    from aiohttp import web
+    from utils.image_header import ImageHeaderReader
+
+    reader = ImageHeaderReader()
+    read = 0
+    try:
+        for offset in range(0, len(data), CHUNK_SIZE):
+            read = min(offset + CHUNK_SIZE, len(data))
+            if reader.feed(data[offset : offset + CHUNK_SIZE]) is not None:
+                break
+        reader.finish()
+        return "accepted", read
+    except web.HTTPException as e:
+        return f"rejected {e.status}", read
+
+
+def _decode(data: bytes) -> tuple:
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image.load()
+        return "decoded", len(data)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        return f"failed {e.__class__.__name__}", len(data)
+
+
+def _timed(func, data: bytes, repeat: int) -> tuple:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outcome = func(data)
+        times.append(time.perf_counter() - start)
+    return outcome, statistics.median(times)
+
+
+def main(args) -> None:
+    from PIL import Image
+
+    # Прежний порог Pillow; в приложении - settings.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    bomb = BytesIO()
+    Image.new("1", (10_000, 10_000)).save(bomb, "PNG")
+    cases = {
+        "jpeg_1920x1080": make_image(1920, 1080, "JPEG"),
+        "junk_8mb": os.urandom(8 * 1024 * 1024),
+        "png_bomb_100mp": bomb.getvalue(),
+    }
+    # Первый вызов загружает плагины Pillow
+    _check(cases["jpeg_1920x1080"])
+
+    results = {"repeat": args.repeat, "runs": []}
+    for name, data in cases.items():
+        (check, check_read), check_seconds = _timed(_check, data, args.repeat)
+        (decode, decode_read), decode_seconds = _timed(_decode, data, args.repeat)
+        results["runs"].append(
+            {
+                "case": name,
+                "bytes": len(data),
+                "header_outcome": check,
+                "header_us": round(check_seconds * 1_000_000, 1),
+                "header_bytes_read": check_read,
+                "decode_outcome": decode,
+                "decode_ms": round(decode_seconds * 1000, 2),
+                "decode_bytes_read": decode_read,
+            }
+        )
+
+    write_results("header", results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output")
+    main(parser.parse_args())
@@ -0,0 +1,88 @@
+"""
+Микробенчмарк обработки одного изображения (то, что выполняет воркер
+ImageProcessor) по размерам и форматам исходника, с разбивкой по этапам.
+
+    python -m benchmarks.image_bench --sizes 640x480,1920x1080,4000x3000 --repeat 10
+"""
+
+import argparse
+import statistics
+import time
+from io import BytesIO
+
+from benchmarks._common import percentile, write_results
+
+from PIL import Image
+from utils.image_processor import STAGES, process_image_timed
+
+
+def make_image(width: int, height: int, image_format: str) -> bytes:
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    if image_format == "GIF":
+        image = image.convert("P")
+    output = BytesIO()
+    image.save(output, format=image_format)
+    return output.getvalue()
+
+
+def _measure(source: bytes, params: dict, repeat: int) -> dict:
+    process_image_timed(source, params)  # прогрев
+    totals = []
+    stages = {stage: [] for stage in STAGES}
+    output_size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output, timings = process_image_timed(source, params)
+        totals.append(time.perf_counter() - start)
+        output_size = output.getbuffer().nbytes
+        for stage, seconds in timings.items():
+            stages[stage].append(seconds)
+    return {
+        "mean_ms": round(statistics.mean(totals) * 1000, 2),
+        "p50_ms": round(percentile(totals, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(totals, 0.95) * 1000, 2),
+        "output_bytes": output_size,
+        "stages_mean_ms": {
+            stage: round(statistics.mean(values) * 1000, 2)
+            for stage, values in stages.items()
+            if values
+        },
+    }
+
+
+def main(args) -> None:
+    results = {"repeat": args.repeat, "runs": []}
+    for size in args.sizes.split(","):
+        width, height = (int(v) for v in size.split("x"))
+        for image_format in args.formats.split(","):
+            source = make_image(width, height, image_format)
+            variants = {
+                "reencode": {"quality": args.quality},
+                "resize_half": {
+                    "quality": args.quality,
+                    "x": width // 2,
+                    "y": height // 2,
+                },
+                "thumbnail": {"quality": args.quality, "x": 256, "y": 256},
+            }
+            for name, params in variants.items():
+                run = {
+                    "size": size,
+                    "format": image_format,
+                    "source_bytes": len(source),
+                    "variant": name,
+                }
+                run.update(_measure(source, params, args.repeat))
+                results["runs"].append(run)
+
+    write_results("image", results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="640x480,1920x1080,4000x3000")
+    parser.add_argument("--formats", default="JPEG,PNG,WEBP,GIF")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output")
+    main(parser.parse_args())
@@ -0,0 +1,79 @@
+"""
+"Шторм" входов: задержка event loop при синхронном bcrypt в обработчике
+(прежнее поведение) и при PasswordHasher с отдельным пулом потоков.
+
+    python -m benchmarks.login_bench --logins 200 --concurrency 50 --rounds 12
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks._common import loop_lag_probe, percentile, write_results
+
+from passlib.context import CryptContext
+from utils.passwords import PasswordHasher
+import utils.passwords
+
+
+async def _storm(verify, hashed: str, logins: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            valid = await verify("correct horse", hashed)
+            assert valid
+
+    lag = []
+    probe = asyncio.create_task(loop_lag_probe(lag))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.01)
+    probe.cancel()
+    return {
+        "logins_per_sec": round(logins / elapsed, 2),
+        "loop_lag_p50_ms": round(percentile(lag, 0.5) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(lag, 0.99) * 1000, 2),
+        "loop_lag_max_ms": round(max(lag, default=0.0) * 1000, 2),
+    }
+
+
+async def main(args) -> None:
+    context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=args.rounds)
+    hashed = context.hash("correct horse")
+    # Стоимость совпадает с хэшем, чтобы не мерить пересчет
+    utils.passwords.pwd_context = context
+
+    async def inline_verify(password, hashed_password):
+        return context.verify(password, hashed_password)
+
+    hasher = PasswordHasher(workers=args.workers, max_queue=args.logins).start()
+
+    async def pooled_verify(password, hashed_password):
+        valid, _ = await hasher.verify_and_update(password, hashed_password)
+        return valid
+
+    results = {
+        "rounds": args.rounds,
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "inline": await _storm(inline_verify, hashed, args.logins, args.concurrency),
+        "executor": await _storm(
+            pooled_verify, hashed, args.logins, args.concurrency
+        ),
+    }
+    hasher.close()
+    write_results("login_storm", results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,153 @@
+"""
+Накладные расходы горячих выборок по ключу (get_image_by_id, get_by_id,
+get_by_username) на стороне SQLAlchemy: select(), собираемый на каждый
+вызов (прежний код), заранее собранный запрос репозитория с ORM-моделью
+и строка без ORM (get_image_row, get_user_row). Для сравнения - сборка
+на каждый вызов без кэша компиляции (query_cache_size=0).
+
+БД - SQLite в памяти через синхронную Session: сам запрос почти
+бесплатен, поэтому разница - это стоимость сборки, компиляции и загрузки
+ORM. Кэш подготовленных запросов asyncpg так не замерить - нужен PostgreSQL.
+
+    python -m benchmarks.lookup_bench --lookups 20000
+"""
+
+import argparse
+import time
+
+from benchmarks._common import write_results
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from models.image import ImageModel
+from models.user import UserModel
+import repositories.image_repo as image_repo
+import repositories.user_repo as user_repo
+
+ROWS = 1000
+
+
+def _engine(query_cache_size: int = 500):
+    engine = create_engine("sqlite://", query_cache_size=query_cache_size)
+    UserModel.metadata.create_all(
+        engine, tables=[UserModel.__table__, ImageModel.__table__]
+    )
+    with Session(engine) as session:
+        session.add_all(
+            UserModel(
+                username=f"user{i}", email=f"user{i}@example.com", hashed_password="x"
+            )
+            for i in range(ROWS)
+        )
+        session.add_all(
+            ImageModel(
+                original_filename=f"{i}.jpg",
+                content_type="image/jpeg",
+                size=100_000,
+                minio_object_name=f"{i}.jpg",
+                owner_id=i % ROWS + 1,
+            )
+            for i in range(ROWS)
+        )
+        session.commit()
+    return engine
+
+
+# Прежние реализации: запрос собирается заново на каждый вызов
+def _rebuilt_image(session: Session, key: int):
+    return session.execute(
+        select(ImageModel).where(ImageModel.id == key)
+    ).scalar_one_or_none()
+
+
+def _rebuilt_user(session: Session, key: int):
+    return session.execute(
+        select(UserModel).where(UserModel.id == key)
+    ).scalar_one_or_none()
+
+
+def _rebuilt_username(session: Session, key: int):
+    return session.execute(
+        select(UserModel).where(UserModel.username == f"user{key - 1}")
+    ).scalar_one_or_none()
+
+
+def _cached_image(session: Session, key: int):
+    return session.execute(
+        image_repo._IMAGE_BY_ID, {"image_id": key}
+    ).scalar_one_or_none()
+
+
+def _cached_user(session: Session, key: int):
+    return session.execute(user_repo._USER_BY_ID, {"user_id": key}).scalar_one_or_none()
+
+
+def _cached_username(session: Session, key: int):
+    return session.execute(
+        user_repo._USER_BY_USERNAME, {"username": f"user{key - 1}"}
+    ).scalar_one_or_none()
+
+
+# Как get_image_row и get_user_row: на соединении сессии, мимо ORM
+def _image_row(session: Session, key: int):
+    connection = session.connection()
+    return connection.execute(image_repo._IMAGE_ROW_BY_ID, {"image_id": key}).first()
+
+
+def _user_row(session: Session, key: int):
+    connection = session.connection()
+    return connection.execute(user_repo._USER_ROW_BY_ID, {"user_id": key}).first()
+
+
+LOOKUPS = {
+    "get_image_by_id": {
+        "rebuilt_orm": _rebuilt_image,
+        "cached_orm": _cached_image,
+        "row": _image_row,
+    },
+    "get_user_by_id": {
+        "rebuilt_orm": _rebuilt_user,
+        "cached_orm": _cached_user,
+        "row": _user_row,
+    },
+    "get_by_username": {
+        "rebuilt_orm": _rebuilt_username,
+        "cached_orm": _cached_username,
+    },
+}
+
+
+def _measure(engine, lookup, count: int) -> float:
+    # Одна сессия с уже выданным соединением, чтобы стоимость сессии и пула
+    # не скрывала разницу; identity map очищается, как у новой сессии запроса
+    with Session(engine) as session:
+        session.connection()
+        start = time.perf_counter()
+        for i in range(count):
+            assert lookup(session, i % ROWS + 1) is not None
+            session.expunge_all()
+        return (time.perf_counter() - start) / count
+
+
+def main(args) -> None:
+    engine = _engine()
+    uncached = _engine(query_cache_size=0)
+    results = {"lookups": args.lookups, "runs": []}
+    for name, variants in LOOKUPS.items():
+        run = {"lookup": name}
+        candidates = [(variant, engine, func) for variant, func in variants.items()]
+        candidates.append(("rebuilt_orm_no_cache", uncached, variants["rebuilt_orm"]))
+        for variant, variant_engine, func in candidates:
+            _measure(variant_engine, func, 200)  # прогрев кэшей
+            seconds = _measure(variant_engine, func, args.lookups)
+            run[f"{variant}_us"] = round(seconds * 1_000_000, 1)
+        results["runs"].append(run)
+    write_results("lookup", results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--output")
+    main(parser.parse_args())
@@ -0,0 +1,72 @@
+"""
+Масштабирование обработки изображений по числу воркеров:
+ProcessPoolExecutor против пула потоков (прежнее поведение).
+
+    python -m benchmarks.processing_bench --workers 1,2,4,8 --images 64
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from io import BytesIO
+
+from benchmarks._common import write_results
+
+from PIL import Image
+from utils.image_processor import ImageProcessor
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=95)
+    return output.getvalue()
+
+
+async def _measure(processor: ImageProcessor, payload: bytes, images: int, params):
+    # Прогрев: запуск процессов и импорт Pillow в воркерах
+    await asyncio.gather(
+        *(processor.process_image(payload, params) for _ in range(processor.workers))
+    )
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(processor.process_image(payload, params) for _ in range(images))
+    )
+    elapsed = time.perf_counter() - start
+    return round(images / elapsed, 2)
+
+
+async def main(args) -> None:
+    width, height = (int(v) for v in args.size.split("x"))
+    payload = make_jpeg(width, height)
+    params = {"x": width // 2, "y": height // 2, "quality": 80}
+    results = {"source": args.size, "params": params, "runs": []}
+
+    for workers in (int(v) for v in args.workers.split(",")):
+        run = {"workers": workers}
+        for mode in ("thread", "process"):
+            processor = ImageProcessor(
+                workers=workers, max_queue=args.images, mode=mode
+            ).start()
+            try:
+                run[f"{mode}_images_per_sec"] = await _measure(
+                    processor, payload, args.images, params
+                )
+            finally:
+                processor.close()
+        results["runs"].append(run)
+
+    write_results("processing", results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--workers",
+        default=",".join(str(2**i) for i in range(8) if 2**i <= (os.cpu_count() or 1)),
+    )
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--size", default="3000x2000")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,169 @@
+"""
+Минимальная S3-совместимая заглушка для бенчмарков.
+
+Хранит объекты в памяти и понимает ровно те запросы, которые делает
+minio.Minio: HEAD/PUT bucket, список объектов по префиксу (ListObjectsV2),
+пакетное удаление, PUT/GET/HEAD/DELETE object.
+Запускается в отдельном потоке со своим event loop, чтобы блокирующий
+клиент в основном потоке не мог ее заблокировать.
+"""
+
+import asyncio
+import hashlib
+import socket
+import threading
+from email.utils import formatdate
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+
+
+class S3StandIn:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        store: bool = True,
+    ):
+        self.host = host
+        self.port = port or self._free_port(host)
+        self.latency = latency
+        # store=False: тело принимается и отбрасывается (замеры памяти клиента)
+        self.store = store
+        self.buckets = {}
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @staticmethod
+    def _free_port(host: str) -> int:
+        with socket.socket() as sock:
+            sock.bind((host, 0))
+            return sock.getsockname()[1]
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        parts = request.path.lstrip("/").split("/", 1)
+        bucket = parts[0]
+        key = parts[1] if len(parts) > 1 else ""
+
+        if not key:
+            if "location" in request.query:
+                return web.Response(
+                    text='<?xml version="1.0" encoding="UTF-8"?>'
+                    "<LocationConstraint>us-east-1</LocationConstraint>",
+                    content_type="application/xml",
+                )
+            if request.method == "PUT":
+                self.buckets.setdefault(bucket, {})
+                return web.Response(status=200)
+            if request.method == "GET" and "list-type" in request.query:
+                return self._list(bucket, request.query.get("prefix", ""))
+            if request.method == "POST" and "delete" in request.query:
+                return self._delete_many(bucket, await request.read())
+            if bucket in self.buckets:
+                return web.Response(status=200)
+            return web.Response(status=404)
+
+        objects = self.buckets.setdefault(bucket, {})
+        if request.method == "PUT":
+            body = await request.read()
+            etag = hashlib.md5(body).hexdigest()
+            if self.store:
+                objects[key] = (
+                    body,
+                    request.headers.get("Content-Type", "application/octet-stream"),
+                    etag,
+                )
+            return web.Response(status=200, headers={"ETag": f'"{etag}"'})
+
+        if key not in objects:
+            return web.Response(status=404)
+        body, content_type, etag = objects[key]
+        if request.method == "DELETE":
+            del objects[key]
+            return web.Response(status=204)
+
+        headers = {
+            "ETag": f'"{etag}"',
+            "Last-Modified": formatdate(usegmt=True),
+            "Content-Type": content_type,
+            "Accept-Ranges": "bytes",
+        }
+        status = 200
+        range_header = request.headers.get("Range")
+        if range_header and range_header.startswith("bytes="):
+            start, _, end = range_header[6:].partition("-")
+            start = int(start)
+            end = int(end) if end else len(body) - 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+            body = body[start : end + 1]
+            status = 206
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            return web.Response(status=status, headers=headers)
+        return web.Response(status=status, body=body, headers=headers)
+
+    def _list(self, bucket: str, prefix: str) -> web.Response:
+        contents = "".join(
+            f"<Contents><Key>{escape(key)}</Key>"
+            f"<LastModified>2026-01-01T00:00:00.000Z</LastModified>"
+            f'<ETag>"{etag}"</ETag><Size>{len(body)}</Size></Contents>'
+            for key, (body, _, etag) in sorted(self.buckets.get(bucket, {}).items())
+            if key.startswith(prefix)
+        )
+        return web.Response(
+            text='<?xml version="1.0" encoding="UTF-8"?>'
+            f"<ListBucketResult><Name>{bucket}</Name><Prefix>{escape(prefix)}</Prefix>"
+            f"<IsTruncated>false</IsTruncated>{contents}</ListBucketResult>",
+            content_type="application/xml",
+        )
+
+    def _delete_many(self, bucket: str, body: bytes) -> web.Response:
+        objects = self.buckets.get(bucket, {})
+        for element in ElementTree.fromstring(body).iter():
+            if element.tag.endswith("Key"):
+                objects.pop(element.text, None)
+        return web.Response(
+            text='<?xml version="1.0" encoding="UTF-8"?><DeleteResult/>',
+            content_type="application/xml",
+        )
+
+    def _serve(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self) -> "S3StandIn":
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def __enter__(self) -> "S3StandIn":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,137 @@
+"""
+Сравнение пропускной способности клиента хранилища:
+прежняя реализация (синхронные вызовы minio внутри async def) против
+MinioService с отдельным пулом потоков и общим пулом соединений,
+а также LocalStorage и TieredStorage (диск + та же S3-заглушка).
+
+    python -m benchmarks.storage_bench --requests 2000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from io import BytesIO
+
+from benchmarks._common import loop_lag_probe, percentile, write_results
+from benchmarks.s3_standin import S3StandIn
+
+from minio import Minio
+from services.local_storage import LocalStorage
+from services.minio_service import MinioService
+from services.storage_service import TieredStorage
+
+
+class LegacyMinioService:
+    """Поведение до перехода на executor: вызовы блокируют event loop."""
+
+    def __init__(self, endpoint: str, bucket_name: str):
+        self.bucket_name = bucket_name
+        self.client = Minio(
+            endpoint, access_key="bench", secret_key="bench-secret", secure=False
+        )
+        if not self.client.bucket_exists(bucket_name):
+            self.client.make_bucket(bucket_name)
+
+    async def upload_image(self, image_data: bytes, object_name: str) -> str:
+        self.client.put_object(
+            self.bucket_name,
+            object_name,
+            BytesIO(image_data),
+            len(image_data),
+            content_type="image/jpeg",
+        )
+        return object_name
+
+    async def get_image(self, object_name: str) -> bytes:
+        response = self.client.get_object(self.bucket_name, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+
+async def _run(service, payload: bytes, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            name = f"{uuid.uuid4().hex}.jpg"
+            await service.upload_image(payload, name)
+            await service.get_image(name)
+            latencies.append(time.perf_counter() - start)
+
+    lag = []
+    probe = asyncio.create_task(loop_lag_probe(lag))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    # Даем пробе зафиксировать последний интервал блокировки
+    await asyncio.sleep(0.01)
+    probe.cancel()
+
+    return {
+        "requests_per_sec": round(requests / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(lag, 0.99) * 1000, 2),
+        "loop_lag_max_ms": round(max(lag, default=0.0) * 1000, 2),
+    }
+
+
+async def main(args) -> None:
+    payload = os.urandom(args.size)
+    results = {"payload_bytes": args.size, "concurrency": args.concurrency}
+    with S3StandIn(latency=args.latency) as s3:
+        legacy = LegacyMinioService(s3.endpoint, "legacy")
+        results["legacy"] = await _run(legacy, payload, args.requests, args.concurrency)
+
+        client = Minio(
+            s3.endpoint,
+            access_key="bench",
+            secret_key="bench-secret",
+            secure=False,
+            region="us-east-1",
+        )
+        service = MinioService(client=client, bucket_name="pooled")
+        await service.ensure_bucket_exists()
+        results["executor"] = await _run(
+            service, payload, args.requests, args.concurrency
+        )
+
+        with tempfile.TemporaryDirectory() as root:
+            local = LocalStorage(root=os.path.join(root, "local"))
+            await local.start()
+            results["local"] = await _run(
+                local, payload, args.requests, args.concurrency
+            )
+            local.close()
+
+            # Удаленный ярус - тот же MinioService; закрывается вместе с tiered
+            tiered_local = LocalStorage(root=os.path.join(root, "tiered"))
+            tiered = TieredStorage(tiered_local, service)
+            await tiered.start()
+            results["tiered"] = await _run(
+                tiered, payload, args.requests, args.concurrency
+            )
+            tiered.close()
+
+    write_results("storage", results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--size", type=int, default=256 * 1024)
+    parser.add_argument(
+        "--latency", type=float, default=0.002, help="задержка заглушки S3, сек"
+    )
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
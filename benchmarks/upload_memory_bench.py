@@ -0,0 +1,180 @@
+"""
+Пиковый RSS на загрузку при конкурентной нагрузке: прежний конвейер
+(field.read() -> BytesIO -> getvalue() -> BytesIO) против потокового
+(SpooledTemporaryFile -> Pillow -> BytesIO -> put_object).
+
+Каждый вариант запускается в отдельном процессе, чтобы пики RSS не смешивались.
+
+    python -m benchmarks.upload_memory_bench --concurrency 16 --megapixels 12
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import uuid
+from io import BytesIO
+
+from benchmarks._common import write_results
+from benchmarks.s3_standin import S3StandIn
+
+
+def _current_rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() // 1024
+
+
+def _peak_rss_kb() -> int:
+    # На Linux ru_maxrss в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_jpeg(megapixels: float) -> bytes:
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 3 / 2) ** 0.5)
+    height = int(width * 2 / 3)
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=95)
+    return output.getvalue()
+
+
+def _legacy_process(image_data: bytes, params: dict) -> bytes:
+    from PIL import Image
+
+    image = Image.open(BytesIO(image_data))
+    if image.format != "JPEG":
+        image = image.convert("RGB")
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=85, optimize=True)
+    output.seek(0)
+    return output.getvalue()
+
+
+def _build_app(variant: str, endpoint: str):
+    from aiohttp import web
+    from minio import Minio
+    from services.minio_service import MinioService
+    from utils.image_processor import ImageProcessor
+    from utils.streams import read_field_to_spool
+
+    client = Minio(
+        endpoint,
+        access_key="bench",
+        secret_key="bench-secret",
+        secure=False,
+        region="us-east-1",
+    )
+    storage = MinioService(client=client, bucket_name="memory")
+    processor = ImageProcessor()
+
+    async def legacy(request):
+        reader = await request.multipart()
+        field = await reader.next()
+        file_data = await field.read()
+        loop = asyncio.get_running_loop()
+        processed = await loop.run_in_executor(
+            None, _legacy_process, bytes(file_data), None
+        )
+        await storage.upload_image(processed, f"{uuid.uuid4().hex}.jpg")
+        return web.Response(text="ok")
+
+    async def streaming(request):
+        reader = await request.multipart()
+        field = await reader.next()
+        spool, _, _, _ = await read_field_to_spool(field)
+        try:
+            processed = await processor.process_image(spool, None)
+        finally:
+            spool.close()
+        await storage.upload_image(
+            processed, f"{uuid.uuid4().hex}.jpg", length=processed.getbuffer().nbytes
+        )
+        return web.Response(text="ok")
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/upload", legacy if variant == "legacy" else streaming)
+    return app, storage
+
+
+async def _worker(args) -> dict:
+    import aiohttp
+    from aiohttp.test_utils import TestClient, TestServer
+
+    payload = make_jpeg(args.megapixels)
+    app, storage = _build_app(args.variant, args.endpoint)
+    await storage.ensure_bucket_exists()
+
+    async with TestClient(TestServer(app)) as client:
+
+        async def upload():
+            form = aiohttp.FormData()
+            form.add_field(
+                "file", payload, filename="bench.jpg", content_type="image/jpeg"
+            )
+            response = await client.post("/upload", data=form)
+            assert response.status == 200, await response.text()
+
+        # Прогрев: импорт модулей, аллокаторы Pillow
+        await upload()
+        baseline = _current_rss_kb()
+        for _ in range(args.rounds):
+            await asyncio.gather(*(upload() for _ in range(args.concurrency)))
+        peak = _peak_rss_kb()
+
+    storage.close()
+    return {
+        "payload_bytes": len(payload),
+        "baseline_rss_kb": baseline,
+        "peak_rss_kb": peak,
+        "peak_rss_per_upload_kb": round((peak - baseline) / args.concurrency, 1),
+    }
+
+
+def main(args) -> None:
+    results = {
+        "concurrency": args.concurrency,
+        "megapixels": args.megapixels,
+    }
+    with S3StandIn(store=False) as s3:
+        for variant in ("legacy", "streaming"):
+            output = subprocess.check_output(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.upload_memory_bench",
+                    "--worker",
+                    "--variant",
+                    variant,
+                    "--endpoint",
+                    s3.endpoint,
+                    "--concurrency",
+                    str(args.concurrency),
+                    "--megapixels",
+                    str(args.megapixels),
+                    "--rounds",
+                    str(args.rounds),
+                ]
+            )
+            results[variant] = json.loads(output)
+    write_results("upload_memory", results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--output")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--variant", help=argparse.SUPPRESS)
+    parser.add_argument("--endpoint", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(asyncio.run(_worker(args))))
+    else:
+        main(args)
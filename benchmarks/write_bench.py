@@ -0,0 +1,121 @@
+"""
+Запись метаданных загрузок: отдельная транзакция на каждую загрузку
+(регистрация объекта, версии, INSERT изображения и commit) против
+группового commit ImageWriter. БД - заглушка в памяти с задержкой сети
+(--latency) и сбросом WAL на каждый commit (--commit-latency), который
+commit-ы ждут по очереди.
+
+    python -m benchmarks.write_bench --uploads 2000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from benchmarks._common import percentile, write_results
+from benchmarks.db_standin import (
+    MemoryDatabase,
+    MemoryImageRepository,
+    MemorySessionMaker,
+)
+
+from schemas.image import ImageCreate
+from services.image_service import ImageService
+import services.image_writer
+from services.image_writer import ImageWriter
+
+PRESETS = ("thumb", "card", "full")
+
+
+def _upload() -> tuple:
+    object_name = f"{uuid.uuid4().hex}.jpg"
+    image = ImageCreate(
+        original_filename="photo.jpg",
+        content_type="image/jpeg",
+        size=100_000,
+        minio_object_name=object_name,
+        source_hash=uuid.uuid4().hex,
+    )
+    renditions = [
+        {
+            "master_object_name": object_name,
+            "preset": preset,
+            "content_type": "image/webp",
+            "object_name": f"renditions/{object_name}/{preset}.webp",
+            "width": 150,
+            "height": 150,
+            "size": 5_000,
+        }
+        for preset in PRESETS
+    ]
+    return image, renditions
+
+
+async def _run(args, batching: bool) -> dict:
+    db = MemoryDatabase(latency=args.latency, commit_latency=args.commit_latency)
+    sessionmaker = MemorySessionMaker(db)
+    writer = None
+    if batching:
+        writer = ImageWriter(
+            sessionmaker, args.max_batch, args.max_delay, args.workers
+        ).start()
+
+    async def save(image, renditions):
+        if writer is not None:
+            return await writer.write(image, renditions)
+        async with sessionmaker() as session:
+            service = ImageService(MemoryImageRepository(session), None, None)
+            return await service.save_upload(image, renditions)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def upload():
+        image, renditions = _upload()
+        async with semaphore:
+            start = time.perf_counter()
+            saved = await save(image, renditions)
+            latencies.append(time.perf_counter() - start)
+            assert saved.minio_object_name == image.minio_object_name
+
+    start = time.perf_counter()
+    await asyncio.gather(*(upload() for _ in range(args.uploads)))
+    elapsed = time.perf_counter() - start
+    if writer is not None:
+        await writer.close()
+    assert len(db.images) == args.uploads
+    return {
+        "mode": "group_commit" if batching else "per_upload",
+        "uploads_per_sec": round(args.uploads / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "commits_per_upload": round(db.commits / args.uploads, 3),
+        "roundtrips_per_upload": round(db.roundtrips / args.uploads, 3),
+    }
+
+
+async def main(args) -> None:
+    # Заглушка вместо ImageRepository, как в db_standin.install
+    services.image_writer.ImageRepository = MemoryImageRepository
+    results = {
+        "uploads": args.uploads,
+        "concurrency": args.concurrency,
+        "latency_ms": args.latency * 1000,
+        "commit_latency_ms": args.commit_latency * 1000,
+        "runs": [await _run(args, batching) for batching in (False, True)],
+    }
+    write_results("write", results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.0005)
+    parser.add_argument("--commit-latency", type=float, default=0.002)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-delay", type=float, default=0.002)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
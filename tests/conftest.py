@@ -0,0 +1,62 @@
+import os
+
+# Обязательные настройки без значений по умолчанию (config.Settings);
+# заданные в окружении не перезаписываются
+for name, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "images_test",
+    "DB_USER": "postgres",
+    "DB_PASSWORD": "postgres",
+    "SECRET_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+import pytest  # noqa: E402
+from sqlalchemy.ext.asyncio import (  # noqa: E402
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from models.base import Base  # noqa: E402
+from models import image, job, log, rendition, stored_object, user  # noqa: E402,F401
+from models.user import UserModel  # noqa: E402
+
+
+@pytest.fixture
+async def db_sessionmaker():
+    """
+    Фабрика сессий к отдельной PostgreSQL из TEST_DATABASE_URL
+    (postgresql+asyncpg://...): таблицы пересоздаются на каждый тест.
+    Без переменной тесты с БД пропускаются - запросы репозиториев
+    используют возможности PostgreSQL (SKIP LOCKED, ON CONFLICT, ANY).
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_async_engine(url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+    )
+    await engine.dispose()
+
+
+@pytest.fixture
+def create_user(db_sessionmaker):
+    async def create(username: str, is_superuser: bool = False) -> UserModel:
+        async with db_sessionmaker() as session:
+            user = UserModel(
+                username=username,
+                email=f"{username}@example.com",
+                hashed_password="x",
+                is_superuser=is_superuser,
+            )
+            session.add(user)
+            await session.commit()
+            return user
+
+    return create
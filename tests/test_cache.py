@@ -0,0 +1,91 @@
+import pytest
+
+import utils.cache
+from utils.cache import LRUCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(utils.cache.time, "monotonic", clock)
+    return clock
+
+
+def test_get_returns_value_until_ttl(clock):
+    cache = LRUCache("test_ttl", ttl=10)
+    cache.set("a", 1)
+    clock.now += 9.9
+    assert cache.get("a") == 1
+    assert "a" in cache
+    clock.now += 0.2
+    assert cache.get("a") is None
+    assert "a" not in cache
+
+
+def test_max_entries_evicts_least_recently_used(clock):
+    cache = LRUCache("test_entries", ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Обращение делает "a" свежей записью
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_max_bytes_counts_item_sizes(clock):
+    cache = LRUCache("test_bytes", ttl=60, max_bytes=10)
+    cache.set("a", b"x" * 6, size=6)
+    cache.set("b", b"y" * 4, size=4)
+    assert cache.size == 10
+    cache.set("c", b"z" * 3, size=3)
+    assert cache.get("a") is None
+    assert cache.size == 7
+
+
+def test_set_replaces_value_and_size(clock):
+    cache = LRUCache("test_replace", ttl=60, max_bytes=100)
+    cache.set("a", b"x" * 50, size=50)
+    cache.set("a", b"x" * 20, size=20)
+    assert cache.size == 20
+    assert len(cache) == 1
+
+
+def test_delete_and_clear(clock):
+    cache = LRUCache("test_delete", ttl=60, max_bytes=100)
+    cache.set("a", b"x", size=1)
+    cache.set("b", b"y", size=1)
+    cache.delete("a")
+    cache.delete("missing")
+    assert cache.get("a") is None
+    assert cache.size == 1
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_item_larger_than_cache_is_not_stored(clock):
+    cache = LRUCache("test_oversize", ttl=60, max_bytes=10)
+    cache.set("a", b"x", size=1)
+    cache.set("big", b"x" * 11, size=11)
+    assert cache.get("big") is None
+    assert cache.get("a") == b"x"
+
+
+def test_entry_ttl_overrides_default(clock):
+    cache = LRUCache("test_entry_ttl", ttl=60)
+    cache.set("short", 1, ttl=1)
+    cache.set("long", 2)
+    clock.now += 2
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
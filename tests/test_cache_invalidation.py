@@ -0,0 +1,62 @@
+import json
+
+from services.cache_invalidation import CacheInvalidationListener
+from services.cache_service import AuthCache, ImageCache
+from services.rendition_service import RenditionService
+
+
+def _listener():
+    image_cache = ImageCache(None, None)
+    image_cache.metadata.set(1, "metadata")
+    image_cache.payload.set("abc.jpg", b"data", size=4)
+    image_cache.renditions.set("abc.jpg", [])
+    renditions = RenditionService(None, None)
+    renditions._remember("renditions/abc/100x0_q85_contain.webp", 10)
+    renditions._remember("renditions/def/100x0_q85_contain.webp", 10)
+    auth_cache = AuthCache()
+    auth_cache.users.set(7, "user")
+    return CacheInvalidationListener(image_cache, renditions, auth_cache)
+
+
+def _notify(listener, **message) -> None:
+    listener._on_notify(None, 0, "cache_invalidation", json.dumps(message))
+
+
+def test_deleted_row_drops_only_metadata_while_object_is_shared():
+    listener = _listener()
+    _notify(listener, kind="image", id=1, object_name="abc.jpg", object_deleted=False)
+    assert listener.image_cache.metadata.get(1) is None
+    assert listener.image_cache.payload.get("abc.jpg") == b"data"
+    assert len(listener.renditions.known) == 2
+
+
+def test_deleted_object_drops_payload_and_renditions():
+    listener = _listener()
+    _notify(listener, kind="image", id=1, object_name="abc.jpg", object_deleted=True)
+    assert listener.image_cache.payload.get("abc.jpg") is None
+    assert listener.image_cache.renditions.get("abc.jpg") is None
+    assert list(listener.renditions.known) == ["renditions/def/100x0_q85_contain.webp"]
+    assert "abc" not in listener.renditions.known_by_master
+
+
+def test_changed_user_drops_cached_user():
+    listener = _listener()
+    _notify(listener, kind="user", id=7)
+    assert listener.auth_cache.users.get(7) is None
+
+
+def test_malformed_message_is_ignored():
+    listener = _listener()
+    listener._on_notify(None, 0, "cache_invalidation", "not json")
+    _notify(listener, kind="image")
+    _notify(listener, kind="unknown", id=1)
+    assert listener.image_cache.metadata.get(1) == "metadata"
+
+
+def test_reconnect_clears_everything():
+    listener = _listener()
+    listener.clear()
+    assert len(listener.image_cache.metadata) == 0
+    assert len(listener.image_cache.payload) == 0
+    assert len(listener.renditions.known) == 0
+    assert len(listener.auth_cache.users) == 0
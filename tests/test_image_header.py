@@ -0,0 +1,77 @@
+from io import BytesIO
+
+import pytest
+from aiohttp import web
+from PIL import Image, features
+
+from config import settings
+from utils.image_header import ImageHeader, ImageHeaderReader
+
+
+def _encode(image_format: str, size=(64, 48), mode="RGB", **options) -> bytes:
+    output = BytesIO()
+    Image.new(mode, size, "red").save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def _read(data: bytes, chunk_size: int = 100) -> ImageHeader:
+    reader = ImageHeaderReader()
+    for start in range(0, len(data), chunk_size):
+        if reader.feed(data[start : start + chunk_size]) is not None:
+            break
+    return reader.finish()
+
+
+@pytest.mark.parametrize(
+    "image_format, content_type, options",
+    [
+        ("JPEG", "image/jpeg", {}),
+        ("PNG", "image/png", {}),
+        ("GIF", "image/gif", {}),
+        ("WEBP", "image/webp", {}),
+        ("WEBP", "image/webp", {"lossless": True}),
+    ],
+)
+def test_format_and_size_from_header(image_format, content_type, options):
+    header = _read(_encode(image_format, **options))
+    assert header == ImageHeader(image_format, content_type, 64, 48)
+
+
+@pytest.mark.skipif(not features.check("avif"), reason="Pillow without AVIF")
+def test_avif_header():
+    assert _read(_encode("AVIF")) == ImageHeader("AVIF", "image/avif", 64, 48)
+
+
+def test_header_is_parsed_before_the_rest_of_the_file():
+    # Несжимаемые данные: PNG заметно больше заголовка
+    image = Image.frombytes("L", (512, 512), bytes(range(256)) * 1024)
+    output = BytesIO()
+    image.save(output, format="PNG", compress_level=0)
+    data = output.getvalue()
+
+    reader = ImageHeaderReader()
+    header = reader.feed(data[:4096])
+    assert header == ImageHeader("PNG", "image/png", 512, 512)
+    assert len(reader.head) < len(data)
+
+
+def test_not_an_image_is_rejected():
+    with pytest.raises(web.HTTPUnsupportedMediaType):
+        _read(b"<html>" + b"x" * 4096)
+
+
+def test_format_outside_allowed_types_is_rejected():
+    with pytest.raises(web.HTTPUnsupportedMediaType):
+        _read(_encode("BMP"))
+
+
+def test_truncated_header_is_rejected_at_end_of_file():
+    with pytest.raises(web.HTTPUnsupportedMediaType):
+        _read(_encode("PNG")[:20])
+
+
+def test_too_many_pixels_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_IMAGE_PIXELS", 64 * 48 - 1)
+    for image_format in ("PNG", "WEBP"):
+        with pytest.raises(web.HTTPRequestEntityTooLarge):
+            _read(_encode(image_format))
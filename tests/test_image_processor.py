@@ -0,0 +1,79 @@
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import pytest
+from aiohttp import web
+from PIL import Image
+
+from utils.image_processor import ImageProcessor, _plan_resize, process_image_sync
+
+
+@pytest.mark.parametrize(
+    "size, params, expected",
+    [
+        ((4000, 10), {"x": 100, "fit": "contain"}, (100, 1)),
+        ((10, 4000), {"y": 100, "fit": "contain"}, (1, 100)),
+        ((4000, 10), {"x": 100, "y": 100, "fit": "contain"}, (100, 1)),
+        ((10, 4000), {"x": 100, "y": 100, "fit": "contain"}, (1, 100)),
+        ((4000, 3000), {"x": 100, "fit": "contain"}, (100, 75)),
+    ],
+)
+def test_plan_resize_contain_keeps_at_least_one_pixel(size, params, expected):
+    target, box = _plan_resize(size, params)
+    assert target == expected
+    assert box == (0.0, 0.0, float(size[0]), float(size[1]))
+
+
+@pytest.mark.parametrize("size", [(4000, 10), (10, 4000)])
+def test_contain_extreme_aspect_ratio(size):
+    source = BytesIO()
+    Image.new("RGB", size, "red").save(source, format="PNG")
+
+    output = process_image_sync(
+        source.getvalue(), {"x": 100, "y": 100, "fit": "contain"}
+    )
+
+    with Image.open(output) as result:
+        assert max(result.size) == 100
+        assert min(result.size) == 1
+
+
+class Upload:
+    """Файл загрузки; on_read имитирует задачи, поставленные во время чтения."""
+
+    def __init__(self, on_read=None):
+        self.reads = 0
+        self.on_read = on_read
+
+    def read(self) -> bytes:
+        self.reads += 1
+        if self.on_read is not None:
+            self.on_read()
+        return b"image"
+
+
+@pytest.fixture
+def process_processor():
+    processor = ImageProcessor(workers=1, max_queue=1)
+    # Процессы стартуют только при первом submit
+    processor.executor = ProcessPoolExecutor(max_workers=1)
+    yield processor
+    processor.executor.shutdown(wait=False)
+
+
+async def test_full_queue_rejects_before_reading_upload(process_processor):
+    process_processor.pending = 2
+    upload = Upload()
+
+    with pytest.raises(web.HTTPServiceUnavailable):
+        await process_processor.process_image(upload, {})
+    assert upload.reads == 0
+
+
+async def test_queue_filled_during_read_rejects_before_submit(process_processor):
+    def fill():
+        process_processor.pending = 2
+
+    with pytest.raises(web.HTTPServiceUnavailable):
+        await process_processor.process_image(Upload(fill), {})
+    assert process_processor.pending == 2
@@ -0,0 +1,241 @@
+import asyncio
+import uuid
+from io import BytesIO
+from typing import List
+
+import pytest
+from sqlalchemy import select
+
+from benchmarks.db_standin import (
+    MemoryDatabase,
+    MemoryImageRepository,
+    MemorySession,
+    MemorySessionMaker,
+)
+from models.rendition import RenditionModel
+from models.stored_object import StoredObjectModel
+from repositories.image_repo import ImageRepository
+from schemas.image import ImageCreate
+import services.cache_service
+from services.cache_service import ImageCache
+from services.image_service import ImageService, StoredUpload
+
+OWNER, OTHER = 1, 2
+
+
+class RecordingStorage:
+    def __init__(self):
+        self.deleted: List[str] = []
+
+    async def delete_image(self, object_name: str) -> None:
+        self.deleted.append(object_name)
+
+
+def _image(owner_id=OWNER, object_name=None, source_hash=None) -> ImageCreate:
+    return ImageCreate(
+        original_filename="photo.jpg",
+        content_type="image/jpeg",
+        size=100,
+        minio_object_name=object_name or f"{uuid.uuid4().hex}.jpg",
+        source_hash=source_hash,
+        owner_id=owner_id,
+    )
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(
+        services.cache_service, "ImageRepository", MemoryImageRepository
+    )
+    return MemoryDatabase()
+
+
+def _service(db, cached: bool = False) -> ImageService:
+    cache = ImageCache(MemorySessionMaker(db), None) if cached else None
+    return ImageService(
+        MemoryImageRepository(MemorySession(db)), RecordingStorage(), None, cache
+    )
+
+
+@pytest.mark.parametrize("cached", [False, True])
+async def test_metadata_is_scoped_to_owner(db, cached):
+    service = _service(db, cached)
+    image = await service.image_repo.create_image(_image())
+
+    assert (await service.get_image_metadata(image.id, OWNER)).id == image.id
+    # Кэш общий для всех пользователей: запись уже есть, владелец чужой
+    assert await service.get_image_metadata(image.id, OTHER) is None
+    # Суперпользователь (owner_id=None) видит любое изображение
+    assert (await service.get_image_metadata(image.id, None)).id == image.id
+
+
+async def test_foreign_image_is_not_deleted(db):
+    service = _service(db)
+    image = await service.image_repo.create_image(_image())
+
+    assert await service.delete_image(image.id, OTHER) is False
+    assert image.id in db.images
+    assert service.storage.deleted == []
+
+    assert await service.delete_image(image.id, OWNER) is True
+    assert image.id not in db.images
+    assert service.storage.deleted == [image.minio_object_name]
+
+
+async def test_deleted_image_leaves_cache(db):
+    service = _service(db, cached=True)
+    image = await service.image_repo.create_image(_image())
+    assert await service.get_image_metadata(image.id) is not None
+
+    await service.delete_image(image.id)
+    assert await service.get_image_metadata(image.id) is None
+
+
+async def test_shared_object_is_deleted_with_last_reference(db):
+    service = _service(db)
+    repo = service.image_repo
+    stored = await repo.register_stored_object("a.jpg", "h" * 64, "", "image/jpeg", 1)
+    await repo.register_stored_object("b.jpg", "h" * 64, "", "image/jpeg", 1)
+    first = await repo.create_image(_image(object_name=stored.object_name))
+    second = await repo.create_image(_image(object_name=stored.object_name))
+
+    await service.delete_image(first.id)
+    assert service.storage.deleted == []
+    await service.delete_image(second.id)
+    assert service.storage.deleted == ["a.jpg"]
+
+
+def _count_processing(service: ImageService) -> List[str]:
+    processed = []
+
+    async def process_and_store(file_data, compression_params=None):
+        processed.append(file_data.read().decode())
+        return StoredUpload(f"{uuid.uuid4().hex}.jpg", 1, "image/jpeg", [])
+
+    service.process_and_store = process_and_store
+    return processed
+
+
+async def test_batch_reuses_stored_objects_without_processing(db):
+    service = _service(db)
+    existing = await service.image_repo.register_stored_object(
+        "a.jpg", "a" * 64, "", "image/jpeg", 1
+    )
+    processed = _count_processing(service)
+
+    batch = service.start_batch(owner_id=OWNER)
+    for data in ("a", "b", "a"):
+        batch.add(BytesIO(data.encode()), f"{data}.jpg", data * 64)
+    results = await batch.finish()
+
+    assert processed == ["b"]
+    assert [result["status"] for result in results] == ["ok"] * 3
+    assert results[0]["minio_object_name"] == "a.jpg"
+    assert results[2]["minio_object_name"] == "a.jpg"
+    assert existing.ref_count == 3
+    assert service.storage.deleted == []
+
+
+async def test_batch_processes_object_deleted_after_lookup(db):
+    service = _service(db)
+    await service.image_repo.register_stored_object(
+        "a.jpg", "a" * 64, "", "image/jpeg", 1
+    )
+    processed = _count_processing(service)
+
+    batch = service.start_batch(owner_id=OWNER)
+    batch.add(BytesIO(b"a"), "a.jpg", "a" * 64)
+    await asyncio.gather(*batch.jobs.values())
+    del db.stored[("a" * 64, "")]
+    results = await batch.finish()
+
+    assert processed == ["a"]
+    assert results[0]["status"] == "ok"
+    assert results[0]["minio_object_name"] != "a.jpg"
+
+
+async def _create(sessionmaker, image: ImageCreate):
+    async with sessionmaker() as session:
+        return await ImageRepository(session).create_image(image)
+
+
+async def test_repository_scopes_lookup_by_owner(db_sessionmaker, create_user):
+    owner = await create_user("owner")
+    other = await create_user("other")
+    image = await _create(db_sessionmaker, _image(owner.id))
+
+    async with db_sessionmaker() as session:
+        repo = ImageRepository(session)
+        assert (await repo.get_image_by_id(image.id, owner.id)).id == image.id
+        assert await repo.get_image_by_id(image.id, other.id) is None
+        assert (await repo.get_image_by_id(image.id)).id == image.id
+        assert [i.id for i in await repo.get_images_by_ids([image.id], other.id)] == []
+
+
+async def test_repository_reference_counting(db_sessionmaker, create_user):
+    owner = await create_user("owner")
+    source_hash = "h" * 64
+    async with db_sessionmaker() as session:
+        repo = ImageRepository(session)
+        stored = await repo.register_stored_object(
+            "a.jpg", source_hash, "", "image/jpeg", 1
+        )
+        # Параллельная загрузка тех же байт получает существующий объект
+        again = await repo.register_stored_object(
+            "b.jpg", source_hash, "", "image/jpeg", 1
+        )
+        await repo.create_renditions(
+            [
+                {
+                    "master_object_name": "a.jpg",
+                    "preset": "thumb",
+                    "content_type": "image/webp",
+                    "object_name": "renditions/a/thumb.webp",
+                    "width": 10,
+                    "height": 10,
+                    "size": 10,
+                }
+            ]
+        )
+        await session.commit()
+    assert again.object_name == stored.object_name == "a.jpg"
+    assert again.ref_count == 2
+
+    first = await _create(db_sessionmaker, _image(owner.id, "a.jpg", source_hash))
+    second = await _create(db_sessionmaker, _image(owner.id, "a.jpg", source_hash))
+
+    async with db_sessionmaker() as session:
+        repo = ImageRepository(session)
+        assert await repo.delete_image(await repo.get_image_by_id(first.id)) == 1
+        assert len(await repo.get_renditions("a.jpg")) == 1
+        assert await repo.delete_image(await repo.get_image_by_id(second.id)) == 0
+        assert await session.scalar(select(StoredObjectModel)) is None
+        assert await session.scalar(select(RenditionModel)) is None
+
+
+async def test_legacy_image_without_stored_object_counts_rows(
+    db_sessionmaker, create_user
+):
+    owner = await create_user("owner")
+    first = await _create(db_sessionmaker, _image(owner.id, "old.jpg"))
+    second = await _create(db_sessionmaker, _image(owner.id, "old.jpg"))
+
+    async with db_sessionmaker() as session:
+        repo = ImageRepository(session)
+        assert await repo.delete_image(await repo.get_image_by_id(first.id)) == 1
+        assert await repo.delete_image(await repo.get_image_by_id(second.id)) == 0
+
+
+async def test_repository_finds_stored_objects_in_one_query(db_sessionmaker):
+    async with db_sessionmaker() as session:
+        repo = ImageRepository(session)
+        await repo.register_stored_object("a.jpg", "a" * 64, "", "image/jpeg", 1)
+        await repo.register_stored_object("b.jpg", "b" * 64, "q", "image/jpeg", 1)
+        await session.commit()
+
+        found = await repo.find_stored_objects(["a" * 64, "b" * 64, "c" * 64], "")
+        assert {key: obj.object_name for key, obj in found.items()} == {
+            "a" * 64: "a.jpg"
+        }
+        acquired = await repo.acquire_stored_object("a" * 64, "", count=2)
+        assert acquired.ref_count == 3
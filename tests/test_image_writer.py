@@ -0,0 +1,117 @@
+import asyncio
+import uuid
+
+import pytest
+
+from benchmarks.db_standin import (
+    MemoryDatabase,
+    MemoryImageRepository,
+    MemorySessionMaker,
+)
+from schemas.image import ImageCreate
+import services.image_writer
+from services.image_writer import ImageWriter
+
+
+class FailingRepository(MemoryImageRepository):
+    # Строка "bad.jpg" ломает весь INSERT, как нарушение внешнего ключа
+    async def create_images(self, images) -> list:
+        if any(image.original_filename == "bad.jpg" for image in images):
+            raise RuntimeError("insert failed")
+        return await super().create_images(images)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(services.image_writer, "ImageRepository", FailingRepository)
+    return MemoryDatabase()
+
+
+def _image(filename="photo.jpg", source_hash=None) -> ImageCreate:
+    return ImageCreate(
+        original_filename=filename,
+        content_type="image/jpeg",
+        size=100,
+        minio_object_name=f"{uuid.uuid4().hex}.jpg",
+        source_hash=source_hash,
+    )
+
+
+def _renditions(image: ImageCreate) -> list:
+    return [
+        {
+            "master_object_name": image.minio_object_name,
+            "preset": "thumb",
+            "content_type": "image/webp",
+            "object_name": f"renditions/{image.minio_object_name}/thumb.webp",
+            "width": 10,
+            "height": 10,
+            "size": 10,
+        }
+    ]
+
+
+async def test_concurrent_writes_share_one_commit(db):
+    writer = ImageWriter(MemorySessionMaker(db), max_batch=8, max_delay=0.05).start()
+    images = [_image() for _ in range(5)]
+    saved = await asyncio.gather(*(writer.write(image) for image in images))
+    await writer.close()
+
+    assert db.commits == 1
+    assert [row.minio_object_name for row in saved] == [
+        image.minio_object_name for image in images
+    ]
+    assert len({row.id for row in saved}) == 5
+
+
+async def test_full_batch_does_not_wait_for_delay(db):
+    writer = ImageWriter(MemorySessionMaker(db), max_batch=4, max_delay=10).start()
+    saved = await asyncio.wait_for(
+        asyncio.gather(*(writer.write(_image()) for _ in range(4))), timeout=1
+    )
+    await writer.close()
+    assert len(saved) == 4
+    assert db.commits == 1
+
+
+async def test_same_source_in_batch_shares_stored_object(db):
+    writer = ImageWriter(MemorySessionMaker(db), max_batch=8, max_delay=0.05).start()
+    first, second = _image(source_hash="a" * 64), _image(source_hash="a" * 64)
+    saved = await asyncio.gather(
+        writer.write(first, _renditions(first)),
+        writer.write(second, _renditions(second)),
+    )
+    await writer.close()
+
+    # Вторая строка ссылается на объект первой, ее копия не нужна
+    assert {row.minio_object_name for row in saved} == {first.minio_object_name}
+    (stored,) = db.stored.values()
+    assert stored.ref_count == 2
+    assert list(db.renditions) == [first.minio_object_name]
+
+
+async def test_failed_row_does_not_fail_its_batch(db):
+    writer = ImageWriter(MemorySessionMaker(db), max_batch=8, max_delay=0.05).start()
+    results = await asyncio.gather(
+        writer.write(_image()),
+        writer.write(_image("bad.jpg")),
+        writer.write(_image()),
+        return_exceptions=True,
+    )
+    await writer.close()
+
+    assert isinstance(results[1], RuntimeError)
+    assert all(not isinstance(result, Exception) for result in results[::2])
+    assert len(db.images) == 2
+
+
+async def test_close_flushes_queue_and_later_writes_go_direct(db):
+    writer = ImageWriter(MemorySessionMaker(db), max_batch=8, max_delay=10).start()
+    pending = asyncio.ensure_future(writer.write(_image()))
+    await asyncio.sleep(0)
+    await writer.close()
+    assert (await pending).id is not None
+
+    saved = await writer.write(_image())
+    assert saved.id in db.images
+    assert db.commits == 2
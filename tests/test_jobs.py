@@ -0,0 +1,205 @@
+from typing import List
+
+import pytest
+from PIL import UnidentifiedImageError
+from sqlalchemy import update
+
+from benchmarks.db_standin import MemoryDatabase, MemorySessionMaker
+from config import settings
+from models.job import (
+    JobModel,
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_UPLOADING,
+)
+from repositories.job_repo import JobRepository
+from schemas.job import JobCreate
+import services.job_service
+from services.job_service import JobQueue
+
+
+class RecordingJobRepository:
+    """JobRepository без БД: запоминает вызовы JobQueue."""
+
+    calls: List[tuple] = []
+
+    def __init__(self, session):
+        self.session = session
+
+    async def finish_job(self, job, status, image_id=None, error=None):
+        self.calls.append(("finish", status, error))
+        return job
+
+    async def retry_job(self, job, delay, error=None):
+        self.calls.append(("retry", delay, error))
+        return job
+
+    async def release_job(self, job):
+        self.calls.append(("release",))
+        return job
+
+    async def expire_uploads(self):
+        self.calls.append(("expire",))
+        return [_job(0)]
+
+
+class RecordingStorage:
+    def __init__(self):
+        self.deleted: List[str] = []
+
+    async def delete_object(self, object_name: str) -> None:
+        self.deleted.append(object_name)
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    RecordingJobRepository.calls = []
+    monkeypatch.setattr(services.job_service, "JobRepository", RecordingJobRepository)
+    monkeypatch.setattr(settings, "JOB_RETRY_DELAY", 2.0)
+    monkeypatch.setattr(settings, "JOB_RETRY_MAX_DELAY", 30.0)
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 5)
+    return JobQueue(
+        MemorySessionMaker(MemoryDatabase()), RecordingStorage(), None, workers=0
+    )
+
+
+def _job(attempts: int) -> JobModel:
+    return JobModel(id=1, attempts=attempts, raw_object_name="uploads/raw")
+
+
+@pytest.mark.parametrize("attempts, delay", [(1, 2.0), (2, 4.0), (4, 16.0)])
+async def test_failed_attempt_is_retried_with_backoff(queue, attempts, delay):
+    await queue._fail(_job(attempts), OSError("storage unavailable"))
+    assert RecordingJobRepository.calls == [("retry", delay, "storage unavailable")]
+    assert queue.storage.deleted == []
+
+
+async def test_retry_delay_is_capped(queue, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 20)
+    await queue._fail(_job(10), OSError("timeout"))
+    assert RecordingJobRepository.calls == [("retry", 30.0, "timeout")]
+
+
+async def test_last_attempt_fails_job_and_drops_raw_upload(queue):
+    await queue._fail(_job(5), OSError("timeout"))
+    assert RecordingJobRepository.calls == [("finish", JOB_FAILED, "timeout")]
+    assert queue.storage.deleted == ["uploads/raw"]
+
+
+async def test_not_an_image_fails_without_retry(queue):
+    await queue._fail(_job(1), UnidentifiedImageError("cannot identify image"))
+    assert RecordingJobRepository.calls == [
+        ("finish", JOB_FAILED, "cannot identify image")
+    ]
+
+
+async def test_value_error_is_retried(queue):
+    await queue._fail(_job(1), ValueError("bad"))
+    assert RecordingJobRepository.calls[0][0] == "retry"
+
+
+async def test_successful_run_finishes_job(queue, monkeypatch):
+    async def process(job):
+        return 42
+
+    monkeypatch.setattr(queue, "_process", process)
+    await queue._run(_job(1))
+    assert RecordingJobRepository.calls == [("finish", JOB_DONE, None)]
+    assert queue.storage.deleted == ["uploads/raw"]
+    assert queue.running == 0
+
+
+async def test_expired_upload_drops_raw_object(queue):
+    await queue._expire_uploads()
+    assert RecordingJobRepository.calls == [("expire",)]
+    assert queue.storage.deleted == ["uploads/raw"]
+
+
+async def _create_job(sessionmaker, name: str = "a.jpg", **options) -> JobModel:
+    async with sessionmaker() as session:
+        return await JobRepository(session).create_job(
+            JobCreate(raw_object_name=f"uploads/{name}", original_filename=name),
+            **options,
+        )
+
+
+async def _claim(sessionmaker, lease: float = 300, max_attempts: int = 5):
+    async with sessionmaker() as session:
+        return await JobRepository(session).claim_job(lease, max_attempts)
+
+
+async def test_claim_leases_each_job_once(db_sessionmaker):
+    first = await _create_job(db_sessionmaker, "a.jpg")
+    second = await _create_job(db_sessionmaker, "b.jpg")
+
+    claimed = [await _claim(db_sessionmaker), await _claim(db_sessionmaker)]
+    assert {job.id for job in claimed} == {first.id, second.id}
+    assert all(job.status == JOB_RUNNING and job.attempts == 1 for job in claimed)
+    # Обе задачи в аренде
+    assert await _claim(db_sessionmaker) is None
+
+
+async def test_expired_lease_is_reclaimed_and_fences_old_worker(db_sessionmaker):
+    created = await _create_job(db_sessionmaker)
+    # Отрицательная аренда: уже истекла, как у упавшего воркера
+    stale = await _claim(db_sessionmaker, lease=-1)
+    current = await _claim(db_sessionmaker)
+    assert current.id == created.id
+    assert current.attempts == 2
+
+    async with db_sessionmaker() as session:
+        repo = JobRepository(session)
+        # Результат прежней аренды не перезаписывает текущую
+        assert await repo.finish_job(stale, JOB_DONE) is None
+        assert (await repo.finish_job(current, JOB_DONE)).status == JOB_DONE
+
+
+async def test_retried_job_waits_for_run_at(db_sessionmaker):
+    await _create_job(db_sessionmaker)
+    job = await _claim(db_sessionmaker)
+    async with db_sessionmaker() as session:
+        retried = await JobRepository(session).retry_job(job, 60, "timeout")
+    assert retried.status == JOB_QUEUED
+    assert await _claim(db_sessionmaker) is None
+
+
+async def test_exhausted_job_is_failed_not_reclaimed(db_sessionmaker):
+    created = await _create_job(db_sessionmaker)
+    async with db_sessionmaker() as session:
+        await session.execute(
+            update(JobModel).where(JobModel.id == created.id).values(attempts=4)
+        )
+        await session.commit()
+    # Последняя попытка, аренда которой истекла
+    last = await _claim(db_sessionmaker, lease=-1, max_attempts=5)
+    assert last.attempts == 5
+    assert await _claim(db_sessionmaker, max_attempts=5) is None
+
+    async with db_sessionmaker() as session:
+        failed = await JobRepository(session).fail_exhausted_jobs(5)
+        again = await JobRepository(session).fail_exhausted_jobs(5)
+    assert [job.id for job in failed] == [created.id]
+    assert failed[0].status == JOB_FAILED
+    assert again == []
+
+
+async def test_unconfirmed_upload_expires_after_deadline(db_sessionmaker):
+    expired = await _create_job(db_sessionmaker, "a.jpg", status=JOB_UPLOADING)
+    waiting = await _create_job(
+        db_sessionmaker, "b.jpg", status=JOB_UPLOADING, delay=600
+    )
+
+    async with db_sessionmaker() as session:
+        failed = await JobRepository(session).expire_uploads()
+        again = await JobRepository(session).expire_uploads()
+    assert [job.id for job in failed] == [expired.id]
+    assert failed[0].status == JOB_FAILED
+    assert again == []
+    # Неподтвержденная загрузка не попадает в очередь
+    assert await _claim(db_sessionmaker) is None
+
+    async with db_sessionmaker() as session:
+        job = await JobRepository(session).get_job_by_id(waiting.id)
+    assert job.status == JOB_UPLOADING
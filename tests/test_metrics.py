@@ -0,0 +1,40 @@
+import asyncio
+import json
+import os
+
+from utils.metrics import MetricsExporter, MetricsRegistry
+
+
+def _exporter(directory: str) -> MetricsExporter:
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests").inc(3)
+    return MetricsExporter(registry, directory)
+
+
+async def test_render_sums_other_processes(tmp_path):
+    exporter = _exporter(str(tmp_path))
+    other = MetricsRegistry()
+    other.counter("requests_total", "Requests").inc(2)
+    (tmp_path / "1.json").write_text(json.dumps(other.snapshot()))
+
+    assert "requests_total 5" in await exporter.render()
+
+
+async def test_render_while_writing_leaves_no_temp_files(tmp_path):
+    exporter = _exporter(str(tmp_path))
+
+    async def write():
+        for _ in range(50):
+            exporter.write()
+            await asyncio.sleep(0)
+
+    results = await asyncio.gather(write(), *(exporter.render() for _ in range(50)))
+
+    assert all("requests_total 3" in text for text in results[1:])
+    assert os.listdir(tmp_path) == [f"{os.getpid()}.json"]
+
+
+async def test_render_without_directory_reports_own_metrics(tmp_path):
+    exporter = _exporter(str(tmp_path / "missing"))
+
+    assert "requests_total 3" in await exporter.render()
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.image import ImageModel
+from repositories.image_repo import ImageRepository
+from utils.pagination import decode_cursor, encode_cursor
+
+BASE_TIME = datetime(2026, 1, 1, 12, 0, 0, 123456)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(BASE_TIME, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (BASE_TIME, 42)
+
+
+@pytest.mark.parametrize(
+    "cursor", ["", "not a cursor", encode_cursor(BASE_TIME, 1)[:-3], "MjAyNnx4"]
+)
+def test_invalid_cursor_is_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+async def _add_images(sessionmaker, owners, created_at):
+    async with sessionmaker() as session:
+        images = [
+            ImageModel(
+                original_filename=f"{index}.jpg",
+                content_type="image/jpeg",
+                size=1,
+                minio_object_name=f"{index}.jpg",
+                owner_id=owner_id,
+                created_at=created_at[index],
+            )
+            for index, owner_id in enumerate(owners)
+        ]
+        session.add_all(images)
+        await session.commit()
+        return images
+
+
+async def _pages(sessionmaker, limit, owner_id=None):
+    result, after = [], None
+    while True:
+        async with sessionmaker() as session:
+            page = await ImageRepository(session).list_images(limit, owner_id, after)
+        result.append([image.id for image in page])
+        if len(page) < limit:
+            return result
+        after = (page[-1].created_at, page[-1].id)
+
+
+async def test_keyset_pages_cover_every_row_once(db_sessionmaker, create_user):
+    owner = await create_user("owner")
+    other = await create_user("other")
+    # Одинаковое created_at у соседних строк: порядок задает id
+    created_at = [BASE_TIME + timedelta(seconds=index // 3) for index in range(7)]
+    owners = [owner.id, other.id, owner.id, owner.id, other.id, owner.id, owner.id]
+    images = await _add_images(db_sessionmaker, owners, created_at)
+
+    expected = [
+        image.id
+        for image in sorted(images, key=lambda i: (i.created_at, i.id), reverse=True)
+    ]
+    pages = await _pages(db_sessionmaker, limit=2)
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert sum(pages, []) == expected
+
+    owner_of = {image.id: image.owner_id for image in images}
+    owned = await _pages(db_sessionmaker, limit=2, owner_id=owner.id)
+    assert sum(owned, []) == [i for i in expected if owner_of[i] == owner.id]
@@ -0,0 +1,40 @@
+import pytest
+
+from schemas.image import RenditionParams
+from services.rendition_service import rendition_object_name
+from utils.formats import WEBP
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("150x150 crop", RenditionParams(w=150, h=150, fit="cover")),
+        ("600w q70", RenditionParams(w=600, q=70)),
+        ("400h", RenditionParams(h=400)),
+        ("2048W", RenditionParams(w=2048)),
+        ("300x200 fill q90", RenditionParams(w=300, h=200, fit="fill", q=90)),
+        ("", RenditionParams()),
+    ],
+)
+def test_from_spec(spec, expected):
+    assert RenditionParams.from_spec(spec) == expected
+
+
+@pytest.mark.parametrize(
+    "spec", ["150", "big", "q", "600w q0", "5000w", "1x", "x1", "150x150 stretch"]
+)
+def test_from_spec_rejects_invalid_parts(spec):
+    # ValidationError pydantic - тоже ValueError
+    with pytest.raises(ValueError):
+        RenditionParams.from_spec(spec)
+
+
+def test_object_name_is_deterministic():
+    params = RenditionParams.from_spec("600w q70")
+    assert params.object_suffix() == "600x0_q70_contain"
+    assert (
+        rendition_object_name("abc.jpg", params, WEBP)
+        == "renditions/abc/600x0_q70_contain.webp"
+    )
+    reordered = RenditionParams.from_spec("q70 600w")
+    assert reordered.object_suffix() == params.object_suffix()